@@ -0,0 +1,97 @@
+"""
+
+    benchmark_ann_index.py
+
+    Description:
+
+        This script measures the recall@K and query latency of
+        AnnIndex.search() against exact search over every article, for
+        synthetic clustered article embeddings and several numbers of probes.
+
+    Example Usage:
+
+        This script can be executed from the root of the repository with the
+        following command:
+
+        python benchmarks/benchmark_ann_index.py --articles 100000 --k 10
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("recommender")
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from ann_index import AnnIndex, dimensions
+
+###############################################################################
+
+
+def clustered_vectors(rng, centers: np.ndarray, count: int) -> np.ndarray:
+    """
+    Returns count unit length vectors scattered around the provided centers,
+    standing in for the embeddings of articles on a number of topics.
+    """
+
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors = vectors + rng.normal(scale=0.08, size=vectors.shape)
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+###############################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, nargs="+", default=[10**4, 10**5])
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(args.topics, dimensions))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+
+    print(f"topics: {args.topics}, queries: {args.queries}, k: {args.k}")
+    for articles in args.articles:
+        vectors = clustered_vectors(rng, centers, articles)
+        queries = clustered_vectors(rng, centers, args.queries)
+
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            index = AnnIndex(directory)
+            index.add(np.arange(1, articles + 1), vectors)
+            build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            exact, _ = index.exact_search(queries, args.k)
+            exact_latency = (time.perf_counter() - start) / args.queries
+
+            print(
+                f"{articles:>9} articles, {len(index.centroids)} lists: "
+                f"build {build:.2f} s, exact search "
+                f"{exact_latency * 1000:.3f} ms/query"
+            )
+
+            for probes in args.probes:
+                start = time.perf_counter()
+                ids, _ = index.search(queries, args.k, probes)
+                latency = (time.perf_counter() - start) / args.queries
+
+                recall = np.mean(
+                    [len(np.intersect1d(a, b)) / args.k for a, b in zip(ids, exact)]
+                )
+                print(
+                    f"    probes {probes:>3}: recall@{args.k} {recall:.3f}, "
+                    f"{latency * 1000:.3f} ms/query "
+                    f"({exact_latency / latency:.1f}x faster than exact)"
+                )
+        del vectors
@@ -0,0 +1,132 @@
+"""
+
+    benchmark_article_store.py
+
+    Description:
+
+        This script compares storing a large synthetic set of prepared
+        article data in the Parquet article store with storing it in a CSV
+        file, as the web scraper used to. It reports the time to write the
+        data, to read all of it, and to read two columns of the articles of a
+        single source published after a given date, along with the size of
+        the data on disk.
+
+    Example Usage:
+
+        This script can be executed from the root of the repository with the
+        following command:
+
+        python benchmarks/benchmark_article_store.py --rows 1000000
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/prepare")
+sys.path.append("web_scraper/store")
+
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import prepare
+from parquet_store import ArticleStore
+
+###############################################################################
+
+
+def synthetic_article_data(rows: int) -> pd.DataFrame:
+    sample = prepare.prepare_article_data(
+        pd.read_csv("tests/test_files/prepare_article_data_input.csv"),
+        reference_date=datetime.date(2022, 12, 31),
+    )
+    sample["source"] = np.where(sample.index < 7, "medium", "news")
+
+    rng = np.random.default_rng(0)
+    df = sample.iloc[rng.integers(0, len(sample), rows)].reset_index(drop=True)
+    df["url"] = df["url"] + "-" + df.index.astype(str)
+    df["date"] = pd.Timestamp("2022-01-01") + pd.to_timedelta(
+        rng.integers(0, 365, rows), unit="D"
+    )
+    df["date"] = df["date"].dt.date
+    return df
+
+
+###############################################################################
+
+
+def directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+###############################################################################
+
+
+def timed(function) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+###############################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    df = synthetic_article_data(args.rows)
+    since = datetime.date(2022, 12, 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_file = os.path.join(directory, "collected_data.csv")
+        store = ArticleStore(os.path.join(directory, "articles"))
+
+        csv_write, _ = timed(lambda: df.to_csv(csv_file, index=False))
+        csv_read, _ = timed(lambda: pd.read_csv(csv_file))
+
+        def csv_query():
+            data = pd.read_csv(csv_file, usecols=["url", "date", "source"])
+            data = data[
+                (data["source"] == "news")
+                & (pd.to_datetime(data["date"]).dt.date >= since)
+            ]
+            return data[["url", "date"]]
+
+        csv_select, csv_rows = timed(csv_query)
+
+        parquet_write, _ = timed(lambda: store.append(df, datetime.date(2022, 12, 31)))
+        parquet_read, _ = timed(lambda: store.read())
+        parquet_select, parquet_rows = timed(
+            lambda: store.read(
+                columns=["url", "date"],
+                filters=[("source", "=", "news"), ("date", ">=", since)],
+            )
+        )
+
+        assert len(csv_rows) == len(parquet_rows)
+
+        csv_size = os.path.getsize(csv_file)
+        parquet_size = directory_size(store.directory)
+
+    print(f"rows: {args.rows}")
+    print(f"{'':8} {'write':>8} {'read':>8} {'select':>8} {'size':>10}")
+    print(
+        f"{'csv':8} {csv_write:7.2f}s {csv_read:7.2f}s {csv_select:7.2f}s "
+        f"{csv_size / 1024**2:7.1f} MB"
+    )
+    print(
+        f"{'parquet':8} {parquet_write:7.2f}s {parquet_read:7.2f}s "
+        f"{parquet_select:7.2f}s {parquet_size / 1024**2:7.1f} MB"
+    )
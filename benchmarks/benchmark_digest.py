@@ -0,0 +1,116 @@
+"""
+
+    benchmark_digest.py
+
+    Description:
+
+        This script measures rendering and sending digest emails to a local
+        aiosmtpd server, comparing one DigestSender connection, with and
+        without PIPELINING, against a new SMTP connection per email as the
+        original email interface does.
+
+    Example Usage:
+
+        This script can be executed from the root of the repository with the
+        following command:
+
+        python benchmarks/benchmark_digest.py --subscribers 2000
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("original_codebase/Email_Interface")
+sys.path.append("recommender")
+
+import argparse
+import smtplib
+import socket
+import time
+
+import pandas as pd
+from aiosmtpd.controller import Controller
+
+import digest
+
+###############################################################################
+
+
+class SinkHandler:
+    def __init__(self, pipelining: bool):
+        self.pipelining = pipelining
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        session.host_name = hostname
+        if self.pipelining:
+            responses.insert(-1, "250-PIPELINING")
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        return "250 OK"
+
+
+###############################################################################
+
+
+def start_sink(pipelining: bool) -> Controller:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    controller = Controller(SinkHandler(pipelining), hostname="127.0.0.1", port=port)
+    controller.start()
+    return controller
+
+
+###############################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--articles", type=int, default=10)
+    args = parser.parse_args()
+
+    users = [f"user{i}@example.com" for i in range(args.subscribers)]
+    recommendations = pd.DataFrame(
+        {
+            "user": [user for user in users for _ in range(args.articles)],
+            "rank": list(range(1, args.articles + 1)) * len(users),
+            "title": "A title of an article about data science",
+            "url": "https://medium.com/some-article-1234",
+            "publication": "Towards Data Science",
+            "read_time": 6,
+        }
+    )
+
+    start = time.perf_counter()
+    messages = digest.render_digests(recommendations, users, "o@x.com", "Digest")
+    print(f"rendered {len(messages)} digests in {time.perf_counter() - start:.2f} s")
+
+    for pipelining in (False, True):
+        controller = start_sink(pipelining)
+        start = time.perf_counter()
+        with digest.DigestSender(
+            "127.0.0.1", controller.port, starttls=False, rate=10**6
+        ) as sender:
+            sender.send_all("o@x.com", messages, logger=None)
+        elapsed = time.perf_counter() - start
+        print(
+            f"one connection, pipelining {pipelining}: {elapsed:.2f} s "
+            f"({len(messages) / elapsed:,.0f} emails/s)"
+        )
+        controller.stop()
+
+    controller = start_sink(False)
+    start = time.perf_counter()
+    for recipient, message in messages:
+        with smtplib.SMTP("127.0.0.1", controller.port) as smtp:
+            smtp.sendmail("o@x.com", [recipient], message)
+    elapsed = time.perf_counter() - start
+    print(
+        f"connection per email: {elapsed:.2f} s "
+        f"({len(messages) / elapsed:,.0f} emails/s)"
+    )
+    controller.stop()
@@ -0,0 +1,74 @@
+"""
+
+    benchmark_fanout.py
+
+    Description:
+
+        This script measures the time and peak memory of fanout.fan_out() for
+        many users and several memory budgets, on synthetic dense candidate
+        features, such as article embeddings, and user preference vectors.
+        Peak memory is measured with tracemalloc, which tracks NumPy arrays.
+
+    Example Usage:
+
+        This script can be executed from the root of the repository with the
+        following command:
+
+        python benchmarks/benchmark_fanout.py --users 50000 --candidates 10000
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("recommender")
+sys.path.append("web_scraper/extract")
+sys.path.append("web_scraper/prepare")
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+import fanout
+
+###############################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--candidates", type=int, default=10000)
+    parser.add_argument("--dimensions", type=int, default=128)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--budgets", type=int, nargs="+", default=[32, 128, 512], help="MiB"
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(args.candidates, args.dimensions)).astype(np.float32)
+    preferences = rng.normal(size=(args.dimensions, args.users)).astype(np.float32)
+
+    unblocked = 16 * args.candidates * args.users / 1024**2
+    print(
+        f"users: {args.users}, candidates: {args.candidates}, "
+        f"dimensions: {args.dimensions}, scores of every user at once: "
+        f"{unblocked:,.0f} MiB"
+    )
+    for budget in args.budgets:
+        tracemalloc.start()
+        start = time.perf_counter()
+        fanout.fan_out(
+            features, preferences, k=args.k, memory_budget=budget * 1024**2
+        )
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        block = fanout.block_size(args.candidates, budget * 1024**2)
+        print(
+            f"budget {budget:>5} MiB: {block:>6} users per block, {elapsed:6.2f} s "
+            f"({args.users / elapsed:,.0f} users/s), peak {peak / 1024**2:,.0f} MiB"
+        )
@@ -0,0 +1,183 @@
+"""
+
+    benchmark_logging.py
+
+    Description:
+
+        This script measures the time log calls take per article as the number
+        of workers grows, with each worker logging a few JSON records per
+        article to the same log file. Each article also waits for a simulated
+        fetch, as the extractors spend most of their time on the network, so
+        the workers log at the same time as they would in a run. Synchronous
+        logging, where every call formats and writes its record while holding
+        the lock of the file handler, is compared with the queue of
+        async_logging, with thread workers and with process pool workers set
+        up with async_logging.configure_worker(). The time the listener then
+        takes to write the records still queued is reported as well.
+
+    Example Usage:
+
+        This script can be executed from the root of the repository with the
+        following command:
+
+        python benchmarks/benchmark_logging.py --articles 5000
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("logging")
+
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import async_logging
+
+###############################################################################
+
+logger = logging.getLogger("webScraper.benchmark")
+
+###############################################################################
+
+
+def log_articles(worker: int, articles: int, records: int, fetch: float) -> float:
+    """
+    Log records records for each of the articles of a worker, after waiting
+    fetch seconds, and return the number of seconds spent in the log calls.
+    """
+
+    elapsed = 0.0
+    for article in range(articles):
+        time.sleep(fetch)
+        url = f"https://example.com/{worker}/{article}"
+        for record in range(records):
+            start = time.perf_counter()
+            logger.info(
+                "Scraped %s in %.3f s.",
+                url,
+                0.1,
+                extra={"source": f"source-{worker}", "url": url, "stage": "parse"},
+            )
+            elapsed += time.perf_counter() - start
+    return elapsed
+
+
+###############################################################################
+
+
+def file_handler(directory: str, mode: str, workers: int) -> logging.Handler:
+    handler = logging.FileHandler(os.path.join(directory, f"{mode}-{workers}.log"))
+    handler.setFormatter(async_logging.JsonFormatter())
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return handler
+
+
+###############################################################################
+
+
+def run_threads(workers: int, articles: int, records: int, fetch: float) -> float:
+    per_worker = articles // workers
+    times = [0.0] * workers
+
+    def run(worker: int):
+        times[worker] = log_articles(worker, per_worker, records, fetch)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return sum(times)
+
+
+###############################################################################
+
+
+def run_processes(
+    executor, workers: int, articles: int, records: int, fetch: float
+) -> float:
+    per_worker = articles // workers
+    futures = [
+        executor.submit(log_articles, worker, per_worker, records, fetch)
+        for worker in range(workers)
+    ]
+    return sum(future.result() for future in futures)
+
+
+###############################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--records", type=int, default=3, help="per article")
+    parser.add_argument("--fetch", type=float, default=1.0, help="ms per article")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+    fetch = args.fetch / 1000
+
+    print(
+        f"{args.articles} articles, {args.records} records and a {args.fetch} ms "
+        "fetch per article, time spent in log calls per article"
+    )
+    print(f"{'workers':>8} {'mode':>18} {'us/article':>11} {'drain s':>8}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in args.workers:
+            articles = args.articles // workers * workers
+
+            # Every call formats and writes its record in the calling thread.
+            handler = file_handler(directory, "sync", workers)
+            elapsed = run_threads(workers, articles, args.records, fetch)
+            handler.close()
+            print(
+                f"{workers:>8} {'sync threads':>18} "
+                f"{elapsed / articles * 1e6:>11.1f} {0:>8.2f}"
+            )
+
+            # Calls only queue their records, the listener writes them.
+            handler = file_handler(directory, "queue", workers)
+            async_logging.start_queue_listener([logger.name])
+            elapsed = run_threads(workers, articles, args.records, fetch)
+            start = time.perf_counter()
+            async_logging.stop_queue_listener()
+            drain = time.perf_counter() - start
+            handler.close()
+            print(
+                f"{workers:>8} {'queue threads':>18} "
+                f"{elapsed / articles * 1e6:>11.1f} {drain:>8.2f}"
+            )
+
+            # Process pool workers put their records on the same queue.
+            handler = file_handler(directory, "processes", workers)
+            async_logging.start_queue_listener([logger.name])
+            queue = async_logging.get_worker_queue()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=async_logging.configure_worker,
+                initargs=(queue,),
+            ) as executor:
+                # Start the workers before the measured run.
+                run_processes(executor, workers, workers, 0, 0)
+                elapsed = run_processes(
+                    executor, workers, articles, args.records, fetch
+                )
+            start = time.perf_counter()
+            async_logging.stop_queue_listener()
+            drain = time.perf_counter() - start
+            handler.close()
+            print(
+                f"{workers:>8} {'queue processes':>18} "
+                f"{elapsed / articles * 1e6:>11.1f} {drain:>8.2f}"
+            )
@@ -0,0 +1,93 @@
+"""
+
+    benchmark_normalize_dates.py
+
+    Description:
+
+        This script compares the throughput of prepare.normalize_dates() with
+        the original implementation, which called modify_date_string() on
+        every row and let pandas infer the format of the result, on a large
+        synthetic dataset mixing the date formats of the extract modules.
+
+    Example Usage:
+
+        This script can be executed from the root of the repository with the
+        following command:
+
+        python benchmarks/benchmark_normalize_dates.py --rows 1000000
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/prepare")
+
+import argparse
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+
+import prepare
+
+###############################################################################
+
+
+def original_normalize_dates(df: pd.DataFrame) -> pd.DataFrame:
+    df["date"] = df["date"].apply(prepare.modify_date_string)
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    return df
+
+
+###############################################################################
+
+
+def synthetic_dates(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    days = pd.to_datetime("2022-01-01") + pd.to_timedelta(
+        rng.integers(0, 300, rows), unit="D"
+    )
+    seconds = pd.to_timedelta(rng.integers(0, 86400, rows), unit="s")
+    iso = (days + seconds).strftime("%Y-%m-%dT%H:%M:%S")
+    month_day = days.strftime("%b ") + days.day.astype(str)
+
+    medium = rng.random(rows) < 0.5
+    z_suffix = np.where(rng.random(rows) < 0.5, "Z", "")
+    dates = np.where(medium, month_day, iso + z_suffix)
+    return pd.DataFrame({"date": dates})
+
+
+###############################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    df = synthetic_dates(args.rows)
+    reference = datetime.date.today()
+
+    start = time.perf_counter()
+    expected = original_normalize_dates(df.copy())
+    original_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = prepare.normalize_dates(df.copy(), reference_date=reference)
+    vectorized_time = time.perf_counter() - start
+
+    # The original implementation gives every date without a year the
+    # current year, so only the dates with a year can be compared.
+    has_year = ~df["date"].str.fullmatch(r"[a-zA-Z]{3}\s[0-9]{1,2}")
+    assert result["date"][has_year].equals(expected["date"][has_year])
+
+    print(f"rows: {args.rows}")
+    print(
+        f"original:   {original_time:.2f} s ({args.rows / original_time:,.0f} rows/s)"
+    )
+    print(
+        f"vectorized: {vectorized_time:.2f} s "
+        f"({args.rows / vectorized_time:,.0f} rows/s)"
+    )
@@ -0,0 +1,62 @@
+"""
+
+    benchmark_parsing.py
+
+    Description:
+
+        This script compares the time each parser engine of the medium.py
+        module takes to extract the article data and the latest post links
+        from the saved Medium pages in tests/test_files.
+
+    Example Usage:
+
+        This script can be executed from the root of the repository with the
+        following command:
+
+        python benchmarks/benchmark_parsing.py --repeat 50
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/extract")
+
+import argparse
+import timeit
+
+import medium
+
+###############################################################################
+
+engines = ["html.parser", "strainer", "lxml"]
+
+###############################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with open("tests/test_files/medium_article.html", "r") as file:
+        article_html = file.read()
+    with open("tests/test_files/medium_latest.html", "r") as file:
+        latest_html = file.read()
+
+    print(f"{'engine':>12} {'article (ms)':>13} {'latest (ms)':>12}")
+    for engine in engines:
+        article_time = timeit.timeit(
+            lambda: medium.parse_article_data(article_html, "", "", engine),
+            number=args.repeat,
+        )
+        latest_time = timeit.timeit(
+            lambda: medium.parse_latest_posts_links(
+                latest_html, "Towards Data Science", engine
+            ),
+            number=args.repeat,
+        )
+        print(
+            f"{engine:>12} {article_time / args.repeat * 1000:>13.2f} "
+            f"{latest_time / args.repeat * 1000:>12.2f}"
+        )
@@ -0,0 +1,90 @@
+"""
+
+    benchmark_prepare_read_time.py
+
+    Description:
+
+        This script compares the time prepare.prepare_read_time() takes with
+        the time a row by row implementation, which parses or estimates the
+        read time of each article with DataFrame.apply, takes on a large
+        synthetic dataset.
+
+    Example Usage:
+
+        This script can be executed from the root of the repository with the
+        following command:
+
+        python benchmarks/benchmark_prepare_read_time.py --rows 1000000
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/prepare")
+
+import argparse
+import math
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+import prepare
+
+###############################################################################
+
+
+def row_read_time(row: pd.Series) -> int:
+    if isinstance(row["read_time"], str):
+        return int(re.search(r"(\d+)", row["read_time"]).group(1))
+
+    words = 0.0
+    for column in prepare.text_columns:
+        text = row[column] if isinstance(row[column], str) else ""
+        words += len(text.split())
+        truncated = re.search(r"\[\+(\d+) chars\]", text)
+        if truncated:
+            words += int(truncated.group(1)) / prepare.characters_per_word
+
+    return max(1, math.ceil(words / prepare.words_per_minute))
+
+
+###############################################################################
+
+
+def synthetic_article_data(rows: int) -> pd.DataFrame:
+    sample = pd.read_csv("tests/test_files/prepare_article_data_input.csv")
+    picks = np.random.default_rng(0).integers(0, len(sample), rows)
+    return (
+        sample[prepare.text_columns + ["read_time"]].iloc[picks].reset_index(drop=True)
+    )
+
+
+###############################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    df = synthetic_article_data(args.rows)
+
+    start = time.perf_counter()
+    expected = df.apply(row_read_time, axis=1).astype("int16")
+    row_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = prepare.prepare_read_time(df.copy())["read_time"]
+    vectorized_time = time.perf_counter() - start
+
+    assert result.equals(expected)
+
+    print(f"rows: {args.rows}")
+    print(f"row by row: {row_time:.2f} s ({args.rows / row_time:,.0f} rows/s)")
+    print(
+        f"vectorized: {vectorized_time:.2f} s "
+        f"({args.rows / vectorized_time:,.0f} rows/s)"
+    )
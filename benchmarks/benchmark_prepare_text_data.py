@@ -0,0 +1,87 @@
+"""
+
+    benchmark_prepare_text_data.py
+
+    Description:
+
+        This script compares the time prepare.prepare_text_data() takes with
+        the time the original implementation, which applied each preparation
+        step to each column separately, takes on a large synthetic dataset.
+
+    Example Usage:
+
+        This script can be executed from the root of the repository with the
+        following command:
+
+        python benchmarks/benchmark_prepare_text_data.py --rows 1000000
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/prepare")
+
+import argparse
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+import prepare
+
+###############################################################################
+
+
+def original_prepare_text_data(df: pd.DataFrame) -> pd.DataFrame:
+    normalize = (
+        lambda column: unicodedata.normalize("NFKD", column)
+        .encode("ascii", "ignore")
+        .decode("utf-8", "ignore")
+    )
+    for column in prepare.text_columns:
+        df[column] = df[column].fillna("")
+        df[column] = df[column].apply(str.lower)
+        df[column] = df[column].apply(normalize)
+        df[column] = (
+            df[column]
+            .apply(prepare.replace_dash)
+            .apply(prepare.replace_newline)
+            .apply(prepare.remove_special_characters)
+        )
+    return df
+
+
+###############################################################################
+
+
+def synthetic_text_data(rows: int) -> pd.DataFrame:
+    sample = pd.read_csv("tests/test_files/prepare_article_data_input.csv")
+    picks = np.random.default_rng(0).integers(0, len(sample), rows)
+    return sample[prepare.text_columns].iloc[picks].reset_index(drop=True)
+
+
+###############################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    df = synthetic_text_data(args.rows)
+
+    start = time.perf_counter()
+    expected = original_prepare_text_data(df.copy())
+    original_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = prepare.prepare_text_data(df.copy())
+    fused_time = time.perf_counter() - start
+
+    assert result.equals(expected)
+
+    print(f"rows: {args.rows}")
+    print(f"original: {original_time:.2f} s ({args.rows / original_time:,.0f} rows/s)")
+    print(f"fused:    {fused_time:.2f} s ({args.rows / fused_time:,.0f} rows/s)")
@@ -0,0 +1,98 @@
+"""
+
+    benchmark_records.py
+
+    Description:
+
+        This script compares the time it takes to collect synthetic article
+        data by growing a dataframe with pd.concat for every article, as the
+        extract modules used to, with the time it takes to collect the same
+        data with the ArticleRecords builder from the records.py module.
+
+        Growing a dataframe with pd.concat is quadratic in the number of
+        articles, so it is only run up to the size given by --max-concat.
+
+    Example Usage:
+
+        This script can be executed from the root of the repository with the
+        following command:
+
+        python benchmarks/benchmark_records.py --sizes 100 1000 10000 100000
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/extract")
+
+import argparse
+import time
+
+import pandas as pd
+
+from records import ArticleRecords
+
+###############################################################################
+
+
+def synthetic_article(i: int) -> dict:
+    return {
+        "author": [f"Author {i % 500}"],
+        "publication": [f"Publication {i % 20}"],
+        "title": [f"Synthetic article number {i}"],
+        "subtitle": [f"The subtitle of article {i}"],
+        "article_intro": ["Lorem ipsum dolor sit amet. " * 8],
+        "date": ["Jul 6"],
+        "read_time": [f"{i % 15 + 1} min read"],
+        "url": [f"https://example.com/article-{i}"],
+    }
+
+
+###############################################################################
+
+
+def collect_with_concat(articles: list[dict]) -> pd.DataFrame:
+    article_data = pd.DataFrame()
+    for article in articles:
+        temp = pd.DataFrame(article)
+        article_data = pd.concat([article_data, temp]).reset_index(drop=True)
+    return article_data
+
+
+###############################################################################
+
+
+def collect_with_records(articles: list[dict]) -> pd.DataFrame:
+    article_data = ArticleRecords()
+    for article in articles:
+        article_data.extend(article)
+    return article_data.to_dataframe()
+
+
+###############################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000]
+    )
+    parser.add_argument("--max-concat", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'articles':>10} {'pd.concat (s)':>15} {'records (s)':>13}")
+    for size in args.sizes:
+        articles = [synthetic_article(i) for i in range(size)]
+
+        start = time.perf_counter()
+        collect_with_records(articles)
+        records_time = time.perf_counter() - start
+
+        concat_time = float("nan")
+        if size <= args.max_concat:
+            start = time.perf_counter()
+            collect_with_concat(articles)
+            concat_time = time.perf_counter() - start
+
+        print(f"{size:>10} {concat_time:>15.3f} {records_time:>13.3f}")
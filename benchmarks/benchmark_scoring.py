@@ -0,0 +1,112 @@
+"""
+
+    benchmark_scoring.py
+
+    Description:
+
+        This script measures the throughput of scoring.score_articles() on
+        the embeddings of synthetic TF-IDF features of 10k articles for 50k
+        users, and compares selecting the best articles of each user with
+        np.argpartition against a full sort of the scores. The size of the
+        model is printed with the number of users.
+
+    Example Usage:
+
+        This script can be executed from the root of the repository with the
+        following command:
+
+        python benchmarks/benchmark_scoring.py --users 50000 --k 10
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("recommender")
+sys.path.append("web_scraper/extract")
+sys.path.append("web_scraper/prepare")
+
+import argparse
+import time
+
+import numpy as np
+import scipy.sparse as sparse
+
+import scoring
+from ann_index import dimensions, embed
+from features import feature_columns, n_features
+from model import LinearModel
+
+###############################################################################
+
+
+def synthetic_features(articles: int, terms: int, columns: int, rng):
+    """
+    Returns unit length sparse features with terms non-zero columns per
+    article.
+    """
+
+    indices = rng.integers(0, columns, articles * terms, dtype=np.int32)
+    data = np.full(articles * terms, 1 / np.sqrt(terms), dtype=np.float32)
+    indptr = np.arange(0, articles * terms + 1, terms, dtype=np.int64)
+    return sparse.csr_matrix((data, indices, indptr), shape=(articles, columns))
+
+
+###############################################################################
+
+
+def full_sort_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-np.ascontiguousarray(scores.T), axis=1)[:, :k].T
+
+
+###############################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, nargs="+", default=[10**4])
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--terms", type=int, default=60)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    columns = len(feature_columns) * n_features
+    model = LinearModel(
+        rng.normal(size=(dimensions, args.users)).astype(np.float32),
+        np.zeros(args.users),
+        [f"user-{i}" for i in range(args.users)],
+    )
+
+    print(
+        f"users: {args.users}, model weights: {model.weights.nbytes / 1024**2:,.1f} "
+        f"MiB, terms per article: {args.terms}, k: {args.k}"
+    )
+    for articles in args.articles:
+        features = synthetic_features(articles, args.terms, columns, rng)
+
+        start = time.perf_counter()
+        embeddings = embed(features)
+        positions, _ = scoring.score_articles(
+            model, embeddings, args.k, args.batch_size
+        )
+        total = time.perf_counter() - start
+
+        scores = model.score(embeddings[: args.batch_size])
+        start = time.perf_counter()
+        scoring.top_k(scores, args.k)
+        partition = time.perf_counter() - start
+
+        start = time.perf_counter()
+        full_sort_top_k(scores, args.k)
+        full_sort = time.perf_counter() - start
+
+        print(
+            f"{articles:>9} articles: {total:6.2f} s "
+            f"({articles / total:,.0f} articles/s), top-k of "
+            f"{len(scores):,} scores: "
+            f"argpartition {partition * 1000:.1f} ms, "
+            f"full sort {full_sort * 1000:.1f} ms"
+        )
+        del features, embeddings, scores
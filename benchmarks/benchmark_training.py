@@ -0,0 +1,78 @@
+"""
+
+    benchmark_training.py
+
+    Description:
+
+        This script compares the time of updating the model with a day of
+        feedback labels using training.partial_fit() against retraining it
+        from scratch with training.fit() on every label collected so far, on
+        the embeddings of synthetic TF-IDF features, for 50k users.
+
+    Example Usage:
+
+        This script can be executed from the root of the repository with the
+        following command:
+
+        python benchmarks/benchmark_training.py --users 50000 --daily 1000
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("recommender")
+sys.path.append("web_scraper/extract")
+sys.path.append("web_scraper/prepare")
+
+import argparse
+import time
+
+import numpy as np
+
+import training
+from ann_index import embed
+from benchmark_scoring import synthetic_features
+from features import feature_columns, n_features
+
+###############################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--labels", type=int, nargs="+", default=[10**4, 10**5, 3 * 10**5]
+    )
+    parser.add_argument("--daily", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--terms", type=int, default=60)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    columns = len(feature_columns) * n_features
+    users = [f"user-{i}" for i in range(args.users)]
+
+    print(f"users: {args.users}, daily labels: {args.daily}")
+    for count in args.labels:
+        embeddings = embed(synthetic_features(count, args.terms, columns, rng))
+        positions = rng.integers(0, args.users, count)
+        labels = rng.integers(0, 2, count)
+
+        start = time.perf_counter()
+        model = training.fit(users, embeddings, positions, labels)
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        training.partial_fit(
+            model,
+            embeddings[: args.daily],
+            positions[: args.daily],
+            labels[: args.daily],
+        )
+        update = time.perf_counter() - start
+
+        print(
+            f"{count:>9} labels: full retrain {full:7.2f} s, "
+            f"update {update * 1000:7.1f} ms ({full / update:,.0f}x faster)"
+        )
+        del embeddings, model
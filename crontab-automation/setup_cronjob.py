@@ -46,7 +46,9 @@ except GetoptError:
 
 # These are the commands that will be executed by crontab for running the
 # article recommender app and the web scraper.
-article_recommender_command = "execute article recommender (actual command pending)"
+article_recommender_command = (
+    "cd ~/Repositories/article-recommender && python -m recommender"
+)
 web_scraper_command = (
     "~/Repositories/article-recommender/shell-scripts/run-web-scraper.sh"
 )
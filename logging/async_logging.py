@@ -0,0 +1,239 @@
+"""
+
+    async_logging.py
+
+    Description:
+
+        This module contains the asynchronous logging mode used by
+        configure_logger(). Instead of every log call formatting its record
+        and writing it to the log file while holding the lock of the file
+        handler, log calls only put the record on a queue. A single listener
+        thread takes the records off the queue, formats them as JSON and
+        writes them with the configured handlers, so threads that log at the
+        same time never wait on each other's file I/O.
+
+        The workers of a process pool log to a multiprocessing queue once
+        they are set up with configure_worker(), and their records are
+        written by a listener of the main process with the same handlers.
+
+        Each JSON record carries the source, url and stage fields when they
+        are passed to the log call, e.g.
+
+            logger.warning(message, extra={"source": name, "stage": "extract"})
+
+    Variables:
+
+        fields
+
+    Classes:
+
+        JsonFormatter
+        StructuredQueueHandler
+
+    Functions:
+
+        start_queue_listener(names, formatter)
+        stop_queue_listener()
+        get_worker_queue()
+        configure_worker(worker_queue, level)
+
+"""
+
+###############################################################################
+
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+
+###############################################################################
+
+# The fields of a record, passed with extra, that are added to its JSON.
+fields = ("source", "url", "stage")
+
+# The handlers the queued records are written with, the listeners writing
+# them and the queue of the process pool workers, set by
+# start_queue_listener() and get_worker_queue().
+_handlers = []
+_listeners = []
+_worker_queue = None
+
+###############################################################################
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as a single line JSON object with the time, level,
+    logger, process, thread and message of the record, the source, url and
+    stage fields when they are set, and the traceback of the exception if
+    there is one.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        document = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.processName,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+
+        for field in fields:
+            value = getattr(record, field, None)
+            if value is not None:
+                document[field] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            document["exception"] = record.exc_text
+
+        return json.dumps(document, default=str)
+
+
+###############################################################################
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    A queue handler that only merges the message and arguments of a record
+    before it is queued, leaving the formatting to the handlers of the
+    listener. The traceback of an exception is kept as text, so the listener
+    can still format it separately from the message.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.stack_info = None
+
+        return record
+
+
+###############################################################################
+
+
+def start_queue_listener(names: list[str], formatter: logging.Formatter = None):
+    """
+    Move the handlers of the provided loggers behind a queue. Each logger
+    gets a queue handler in place of its handlers, and a listener thread
+    writes the queued records with the original handlers, each handler once.
+    The listener is stopped, writing the records still queued, when the
+    interpreter exits.
+
+    Parameters
+    ----------
+    names: list[str]
+        The names of the loggers, such as those of a logging config.
+
+    formatter: Formatter, optional
+        The formatter set on the original handlers, defaults to a
+        JsonFormatter.
+    """
+
+    global _handlers
+
+    stop_queue_listener()
+    formatter = formatter or JsonFormatter()
+
+    loggers = [logging.getLogger(name) for name in names]
+
+    _handlers = []
+    for logger in loggers:
+        for handler in logger.handlers:
+            if handler not in _handlers:
+                _handlers.append(handler)
+
+    for handler in _handlers:
+        handler.setFormatter(formatter)
+
+    # The threads of the main process use a queue without locks or pickling,
+    # which is cheaper to put records on than a multiprocessing queue.
+    records = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(records)
+    for logger in loggers:
+        if logger.handlers:
+            logger.handlers = [queue_handler]
+
+    _start_listener(records)
+    atexit.register(stop_queue_listener)
+
+
+###############################################################################
+
+
+def _start_listener(records):
+    listener = logging.handlers.QueueListener(
+        records, *_handlers, respect_handler_level=True
+    )
+    listener.start()
+    _listeners.append(listener)
+
+
+###############################################################################
+
+
+def stop_queue_listener():
+    """
+    Stop the listeners once every queued record has been written.
+    """
+
+    global _worker_queue
+
+    while _listeners:
+        _listeners.pop().stop()
+    _worker_queue = None
+
+
+###############################################################################
+
+
+def get_worker_queue() -> multiprocessing.Queue:
+    """
+    Returns the queue the workers of process pools put their records on, to
+    pass to configure_worker(). The queue and its listener, which writes the
+    records with the same handlers, are created the first time it is
+    requested. Returns None if the loggers are not in the asynchronous mode.
+    """
+
+    global _worker_queue
+
+    if _worker_queue is None and _listeners:
+        # The spawn start method is the one the process pools use.
+        _worker_queue = multiprocessing.get_context("spawn").Queue(-1)
+        _start_listener(_worker_queue)
+
+    return _worker_queue
+
+
+###############################################################################
+
+
+def configure_worker(worker_queue: multiprocessing.Queue, level: int = logging.INFO):
+    """
+    Send every record logged in the current process to the provided queue.
+    Used as the initializer of the workers of a process pool, so that their
+    records are written by the listener of the main process.
+
+    Parameters
+    ----------
+    worker_queue: Queue
+        The queue returned by get_worker_queue() in the main process.
+
+    level: int, optional
+        The level of the records sent.
+    """
+
+    root = logging.getLogger()
+    root.handlers = [StructuredQueueHandler(worker_queue)]
+    root.setLevel(level)
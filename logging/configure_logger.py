@@ -9,13 +9,16 @@
         the configuration arguments. If the config.json file is somehow missing
         an email is sent to the repo owner with the error message.
 
+        In the asynchronous mode the configured handlers write JSON records
+        from a queue in a background thread, see the async_logging module.
+
     Variables:
 
         base_error_message
 
     Functions:
 
-        configure_logger(config_file_name = 'config.json')
+        configure_logger(config_file_name = 'config.json', asynchronous = False)
 
 """
 
@@ -29,6 +32,7 @@ import json
 import logging.config
 import os
 
+import async_logging
 from env import email_address
 
 ###############################################################################
@@ -40,7 +44,7 @@ base_error_message = """
 ###############################################################################
 
 
-def configure_logger(config_file_name="config.json") -> bool:
+def configure_logger(config_file_name="config.json", asynchronous=False) -> bool:
     """
     Configure all loggers according to the arguments set in the config file
     file. Upon success this function returns True and will return False
@@ -52,6 +56,11 @@ def configure_logger(config_file_name="config.json") -> bool:
     config_file_name: str, optional
         The name of the config file. The file should be a .json file.
 
+    asynchronous: bool, optional
+        Whether log calls only queue their records, which are formatted as
+        JSON and written by a background thread. The queue can be shared
+        with process pool workers, see async_logging.configure_worker().
+
     Returns
     -------
     bool: Returns True if the function succeeded in configuring all loggers
@@ -82,6 +91,9 @@ def configure_logger(config_file_name="config.json") -> bool:
             config_dict = json.load(config_file)
             logging.config.dictConfig(config_dict)
 
+        if asynchronous:
+            async_logging.start_queue_listener(list(config_dict.get("loggers", {})))
+
         return True
 
     # If the config file was not found.
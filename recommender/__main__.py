@@ -0,0 +1,278 @@
+"""
+
+    __main__.py
+
+    Description:
+
+        This is the main entry point for the article recommender. The model is
+        first updated with the feedback labels received since the last update,
+        if there are any, and the latest model is loaded once. The features of
+        the day's candidates, the articles added to the feature store on the
+        day, are computed once and scored for every user, in blocks of users
+        that fit in a fixed memory budget, and the best articles of each user
+        are written to the recommendations file of the day. Each subscriber is
+        then sent a digest email of their recommendations. A run that finds no
+        articles added since the last run leaves the day's recommendations as
+        they are and sends no digests.
+
+        Users with a reading history are also recommended the new articles
+        most similar to the articles they have read, found with the
+        approximate nearest neighbor index the web scraper adds every article
+        to. Subscribers without either, including every subscriber before the
+        first feedback trains a model, are recommended the newest articles.
+
+    Example Usage:
+
+        This script can be executed from a terminal with the following command:
+
+        python -m recommender
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("logging")
+sys.path.append("modules")
+sys.path.append("original_codebase/Email_Interface")
+sys.path.append("recommender")
+sys.path.append("web_scraper/extract")
+sys.path.append("web_scraper/prepare")
+sys.path.append("web_scraper/store")
+
+import datetime
+import logging
+import os
+import time
+import traceback
+
+import pandas as pd
+
+import digest
+import fanout
+import scoring
+import training
+from database import ArticleDatabase
+from features import FeatureStore
+from preferences import PreferenceStore
+from ann_index import AnnIndex
+from seen_index import canonicalize_url, hash_urls
+from watermarks import HighWaterMarks
+
+from configure_logger import configure_logger
+from env import email_address, email_password, smtp_server
+
+###############################################################################
+
+# The directory the versioned models the articles are scored with are stored
+# in, and the file every feedback label is collected in.
+model_directory = "data/model"
+labels_file = "data/labels.csv"
+
+# The stores written by the web scraper. The preference store holds the
+# feedback labels users sent in by email.
+feature_store_directory = "data/features"
+preferences_file = "data/preferences.db"
+database_file = "data/articles.db"
+
+# The approximate nearest neighbor index of the article embeddings, written
+# by the web scraper, and the number of index lists searched per read article.
+ann_index_directory = "data/ann-index"
+ann_index_probes = 8
+
+# The articles each user has read, a CSV file with user and url columns.
+reading_history_file = "data/reading-history.csv"
+
+# The high-water marks, shared with the web scraper. The recommender records
+# the last feature store shard it scored under watermark_key.
+watermarks_file = "data/watermarks.json"
+watermark_key = "recommender:shard"
+
+# The directory the recommendations of each day are written to, and the
+# number of articles recommended to each user.
+recommendations_directory = "data/recommendations"
+articles_per_user = 10
+
+# The directory the features of each day's candidate articles are cached in,
+# and the number of bytes the scores of a block of users may take.
+candidates_directory = "data/candidates"
+fanout_memory_budget = 256 * 1024**2
+
+# The SMTP port and the subject of the digest emails.
+smtp_port = 587
+digest_subject = "Your article recommendations"
+
+# The columns of the recommended articles written with the recommendations.
+article_columns = ["title", "subtitle", "publication", "read_time", "date"]
+
+###############################################################################
+
+if __name__ == "__main__":
+    try:
+
+        # Configure the logger using the configure_logger module. If the
+        # configuration was successful use the articleRecommender logger for
+        # this script.
+        logger_configured_successfully = configure_logger()
+        logger = None
+        if logger_configured_successfully:
+            logger = logging.getLogger("articleRecommender")
+
+        # Update the model with the feedback received since the last update,
+        # or retrain it if the preferences of the users have drifted. The
+        # registry records the last label applied, so each label is applied
+        # once however many times the recommender runs. Without a usable
+        # model, the model is trained on the labels collected so far.
+        feature_store = FeatureStore(feature_store_directory)
+        registry = training.ModelRegistry(model_directory)
+        preferences = PreferenceStore(preferences_file)
+        feedback = preferences.feedback_after(registry.state["feedback_row"])
+        subscribers = preferences.subscribers()
+        preferences.close()
+        model = registry.load()
+        if len(feedback) or (model is None and os.path.exists(labels_file)):
+            model = training.update_model(
+                registry, feature_store, feedback, labels_file, logger
+            )
+
+        # Select the shards added to the feature store since the last run.
+        watermarks = HighWaterMarks(watermarks_file)
+        last_shard = watermarks.get(watermark_key, "")
+        shards = [
+            shard
+            for shard in feature_store.shards()
+            if os.path.basename(shard) > last_shard
+        ]
+
+        # Later runs of the day usually find no new shards. The recommendations
+        # of the day were already written and the digests sent by the run that
+        # scored the day's shards, so they are left as they are.
+        if not shards:
+            if logger_configured_successfully:
+                logger.info("No new articles since the last run, nothing to score.")
+
+        else:
+            # Compute the features of the day's candidates once. They are
+            # scored for the users in blocks that fit in the memory budget,
+            # one matrix product per block, and the best articles of each
+            # user are selected.
+            features, ids, urls = fanout.load_candidates(
+                feature_store,
+                shards,
+                os.path.join(candidates_directory, f"{datetime.date.today()}.npz"),
+            )
+
+            # Find the new articles most similar to the articles each user has
+            # read in the index, instead of comparing them with every article.
+            similar = None
+            if os.path.exists(reading_history_file):
+                history = pd.read_csv(reading_history_file)
+                history["id"] = hash_urls(
+                    history["url"].astype(str).map(canonicalize_url)
+                )
+
+                start = time.perf_counter()
+                similar = scoring.similar_articles(
+                    AnnIndex(ann_index_directory),
+                    history,
+                    ids,
+                    articles_per_user,
+                    ann_index_probes,
+                )
+                elapsed = time.perf_counter() - start
+
+                message = (
+                    f"Found similar articles for {history['user'].nunique()} users "
+                    f"in {elapsed:.2f} s."
+                )
+                if logger_configured_successfully:
+                    logger.info(message)
+
+                similar["url"] = similar["id"].map(dict(zip(ids, urls)))
+
+            # Subscribers without recommendations from the model or their
+            # reading history, such as every subscriber before the first
+            # feedback trained a model, are recommended the newest articles.
+            database = ArticleDatabase(database_file)
+            dates = database.articles_by_url(urls, ["date"])
+            recommendations = fanout.recommend(
+                model,
+                features,
+                urls,
+                subscribers,
+                similar,
+                pd.Series(urls).map(dict(zip(dates["url"], dates["date"]))),
+                articles_per_user,
+                fanout_memory_budget,
+                logger,
+            )
+
+            # Add the details of the recommended articles from the database.
+            articles = database.articles_by_url(recommendations["url"], article_columns)
+            database.close()
+
+            recommendations = recommendations.merge(articles, on="url", how="left")
+            recommendations = recommendations.sort_values(["user", "reason", "rank"])
+
+            os.makedirs(recommendations_directory, exist_ok=True)
+            recommendations.to_csv(
+                os.path.join(
+                    recommendations_directory,
+                    f"{datetime.date.today().isoformat()}.csv",
+                ),
+                index=False,
+            )
+
+            watermarks.update(watermark_key, os.path.basename(shards[-1]))
+            watermarks.save()
+
+            # Render the digest of every subscriber, then send them all over
+            # one SMTP connection.
+            messages = digest.render_digests(
+                recommendations.drop_duplicates(["user", "url"]),
+                subscribers,
+                email_address,
+                digest_subject,
+                datetime.date.today().isoformat(),
+            )
+            with digest.DigestSender(
+                smtp_server, smtp_port, email_address, email_password
+            ) as sender:
+                failed = sender.send_all(email_address, messages, logger)
+
+            if failed and logger_configured_successfully:
+                logger.warning(f"Digest emails rejected for: {', '.join(failed)}")
+
+        # If the logger  was configured successfully log that execution of the
+        # article recommender script completed.
+        if logger_configured_successfully:
+            logger.info(
+                """Article recommender completed execution.
+
+            -------------------------------------------
+
+            """
+            )
+
+    # If an unhandled and unexpected error occurred.
+    except Exception as error:
+        message = """
+            An unexpected and unhandled error occurred in the Article
+            Recommender. This error caused execution of the script to hault.
+            The error has been logged and is also shown here.
+
+        """
+        error_message = "".join(
+            traceback.format_exception(None, error, error.__traceback__)
+        )
+
+        # Log the traceback of the error message.
+        if logger_configured_successfully:
+            logger.error(error_message)
+
+        # Send an email to the app owner containing the error message.
+        os.system(
+            f'echo {message + error_message} | mail -s "Article Recommender \
+                Error" {email_address}'
+        )
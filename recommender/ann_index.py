@@ -0,0 +1,441 @@
+"""
+
+    ann_index.py
+
+    Description:
+
+        This module contains the approximate nearest neighbor index used to
+        find the articles most similar to the articles a user has read.
+
+        Articles are embedded by projecting their sparse TF-IDF features onto
+        a few dimensions with a sparse random projection, which approximately
+        preserves the cosine similarity between articles, and normalizing the
+        result.
+
+        The embeddings are kept in an inverted file (IVF) index. The
+        embeddings are clustered with spherical k-means and each embedding is
+        stored in the list of its nearest centroid. A query is compared with
+        the centroids first and only with the embeddings in the lists of the
+        probes nearest centroids, instead of every article in the history. The
+        number of probes trades recall for latency.
+
+        New articles are added incrementally, each run writing a chunk with
+        the embeddings and list assignments of its articles. The centroids are
+        trained again once the index has grown to several times the size it
+        was trained at, so the lists stay balanced as the history grows.
+
+    Variables:
+
+        dimensions
+        projections_per_feature
+        retrain_growth
+
+    Classes:
+
+        AnnIndex
+
+    Functions:
+
+        projection_matrix(columns, dimensions)
+        embed(features, dimensions)
+        spherical_kmeans(vectors, clusters, iterations, seed)
+
+"""
+
+###############################################################################
+
+import functools
+import glob
+import os
+import time
+import uuid
+
+import numpy as np
+import scipy.sparse as sparse
+
+###############################################################################
+
+# The number of dimensions of the article embeddings.
+dimensions = 128
+
+# The number of embedding dimensions each feature column is projected onto.
+projections_per_feature = 4
+
+# The factor the index has to grow by, since the centroids were last trained,
+# before they are trained again.
+retrain_growth = 4
+
+###############################################################################
+
+
+@functools.lru_cache(maxsize=4)
+def projection_matrix(columns: int, dimensions: int = dimensions):
+    """
+    Returns the sparse random projection of columns feature columns onto
+    dimensions dimensions. Each column is projected onto
+    projections_per_feature random dimensions with random signs. The matrix
+    is seeded, so the same matrix is returned in every run.
+    """
+
+    rng = np.random.default_rng(1134)
+    rows = np.repeat(np.arange(columns), projections_per_feature)
+    targets = rng.integers(0, dimensions, len(rows))
+    signs = rng.choice(np.array([-1.0, 1.0], dtype=np.float32), len(rows))
+
+    return sparse.csr_matrix(
+        (signs / np.sqrt(projections_per_feature), (rows, targets)),
+        shape=(columns, dimensions),
+        dtype=np.float32,
+    )
+
+
+###############################################################################
+
+
+def embed(features, dimensions: int = dimensions) -> np.ndarray:
+    """
+    Returns the unit length embedding of each article, given the sparse
+    TF-IDF features of the articles.
+    """
+
+    vectors = np.asarray(
+        (features @ projection_matrix(features.shape[1], dimensions)).todense(),
+        dtype=np.float32,
+    )
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+###############################################################################
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, clusters: int, iterations: int = 10, seed: int = 0
+) -> np.ndarray:
+    """
+    Returns unit length centroids of clusters clusters of the provided unit
+    length vectors, each vector belonging to the centroid it has the highest
+    cosine similarity with.
+    """
+
+    rng = np.random.default_rng(seed)
+    clusters = min(clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        norms = np.linalg.norm(sums, axis=1)
+
+        # Centroids that lost all their vectors are moved to random vectors.
+        empty = norms == 0
+        sums[empty] = vectors[rng.choice(len(vectors), empty.sum())]
+        norms[empty] = 1
+        centroids = (sums / norms[:, None]).astype(np.float32)
+
+    return centroids
+
+
+###############################################################################
+
+
+class AnnIndex:
+    """
+    A persistent inverted file index of article embeddings.
+
+    Parameters
+    ----------
+    directory: str
+        The directory the index is stored in. It is created if it does not
+        exist.
+
+    minimum_training_size: int, optional
+        The number of embeddings the index must hold before centroids are
+        trained. Smaller indexes are searched exhaustively.
+    """
+
+    def __init__(self, directory: str, minimum_training_size: int = 1024):
+        self.directory = directory
+        self.minimum_training_size = minimum_training_size
+        self.centroids_file = os.path.join(directory, "centroids.npz")
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.centroids = None
+        self.trained_size = 0
+        if os.path.exists(self.centroids_file):
+            with np.load(self.centroids_file) as data:
+                self.centroids = data["centroids"]
+                self.trained_size = int(data["trained_size"])
+
+        chunks = [np.load(chunk) for chunk in self.chunks()]
+        self._build(
+            np.concatenate([c["ids"] for c in chunks] or [np.empty(0, np.uint64)]),
+            np.concatenate(
+                [c["vectors"] for c in chunks]
+                or [np.empty((0, dimensions), np.float32)]
+            ),
+            np.concatenate([c["lists"] for c in chunks] or [np.empty(0, np.int32)]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def chunks(self) -> list[str]:
+        """
+        Returns the paths of the chunks in the order they were added.
+        """
+
+        return sorted(glob.glob(os.path.join(self.directory, "chunk-*.npz")))
+
+    def _build(self, ids: np.ndarray, vectors: np.ndarray, lists: np.ndarray):
+        # The embeddings are kept sorted by list so the members of each list
+        # are a contiguous slice.
+        order = np.argsort(lists, kind="stable")
+        self.ids = ids[order]
+        self.vectors = np.ascontiguousarray(vectors[order])
+        self.lists = lists[order]
+
+        # An index without centroids keeps every embedding in a single list.
+        count = 1 if self.centroids is None else len(self.centroids)
+        self.offsets = np.searchsorted(self.lists, np.arange(count + 1))
+
+    def _assign(self, vectors: np.ndarray, batch_size: int = 16384) -> np.ndarray:
+        lists = np.zeros(len(vectors), dtype=np.int32)
+        if self.centroids is None:
+            return lists
+
+        # Batches bound the memory used by the similarities to the centroids.
+        for start in range(0, len(vectors), batch_size):
+            stop = start + batch_size
+            lists[start:stop] = np.argmax(
+                vectors[start:stop] @ self.centroids.T, axis=1
+            )
+        return lists
+
+    def _write_chunk(self, ids: np.ndarray, vectors: np.ndarray, lists: np.ndarray):
+        # Chunks are named by the time they were added so they sort in order.
+        name = f"chunk-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.npz"
+        path = os.path.join(self.directory, name)
+        temporary_file = path + ".tmp.npz"
+        np.savez(temporary_file, ids=ids, vectors=vectors, lists=lists)
+        os.replace(temporary_file, path)
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        """
+        Add articles to the index and write them to disk. If the index has
+        grown enough the centroids are trained again and every embedding is
+        reassigned.
+
+        Parameters
+        ----------
+        ids: ndarray
+            The 64-bit id of each article, such as the hash of its URL.
+
+        vectors: ndarray
+            The unit length embedding of each article.
+        """
+
+        if not len(ids):
+            return
+
+        ids = np.asarray(ids, dtype=np.uint64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        size = len(self) + len(ids)
+
+        # An empty index takes the dimensions of the first embeddings added.
+        if not len(self):
+            self.vectors = self.vectors.reshape(0, vectors.shape[1])
+
+        if size >= self.minimum_training_size and (
+            self.centroids is None or size >= retrain_growth * self.trained_size
+        ):
+            self.train(
+                np.concatenate([self.ids, ids]), np.vstack([self.vectors, vectors])
+            )
+            return
+
+        lists = self._assign(vectors)
+        self._write_chunk(ids, vectors, lists)
+        self._build(
+            np.concatenate([self.ids, ids]),
+            np.vstack([self.vectors, vectors]),
+            np.concatenate([self.lists, lists]),
+        )
+
+    def train(self, ids: np.ndarray, vectors: np.ndarray, sample: int = 65536):
+        """
+        Train the centroids on the provided embeddings, about the square root
+        of their number, and replace the contents of the index with them.
+        """
+
+        rng = np.random.default_rng(0)
+        clusters = max(1, int(np.sqrt(len(vectors))))
+        training = vectors
+        if len(vectors) > sample:
+            training = vectors[rng.choice(len(vectors), sample, replace=False)]
+
+        self.centroids = spherical_kmeans(training, clusters)
+        self.trained_size = len(vectors)
+
+        lists = self._assign(vectors)
+        old_chunks = self.chunks()
+        self._write_chunk(ids, vectors, lists)
+        for chunk in old_chunks:
+            os.remove(chunk)
+
+        temporary_file = self.centroids_file + ".tmp.npz"
+        np.savez(
+            temporary_file, centroids=self.centroids, trained_size=self.trained_size
+        )
+        os.replace(temporary_file, self.centroids_file)
+
+        self._build(ids, vectors, lists)
+
+    def vectors_of(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Returns the embeddings of the articles with the provided ids that are
+        in the index.
+        """
+
+        return self.vectors[np.isin(self.ids, np.asarray(ids, dtype=np.uint64))]
+
+    def search(
+        self, queries: np.ndarray, k: int = 10, probes: int = 8
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the ids and cosine similarities of the k articles most similar
+        to each query, searching only the lists of the probes centroids
+        nearest to the query.
+
+        Parameters
+        ----------
+        queries: ndarray
+            The unit length query embeddings, one row per query.
+
+        k: int, optional
+            The number of articles returned per query.
+
+        probes: int, optional
+            The number of lists searched per query.
+
+        Returns
+        -------
+        tuple[ndarray, ndarray]:
+            The ids and similarities of the articles found for each query,
+            arrays with one row per query and k columns, best first. Rows are
+            padded with id 0 and similarity -inf when fewer articles are found.
+        """
+
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        found_ids = np.zeros((len(queries), k), dtype=np.uint64)
+        found_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+
+        if self.centroids is None:
+            nearest = np.zeros((len(queries), 1), dtype=np.int64)
+        else:
+            probes = min(probes, len(self.centroids))
+            similarity = queries @ self.centroids.T
+            nearest = np.argpartition(-similarity, probes - 1, axis=1)[:, :probes]
+
+        for row, (query, lists) in enumerate(zip(queries, nearest)):
+            members = np.concatenate(
+                [np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists]
+            )
+            if not len(members):
+                continue
+
+            scores = self.vectors[members] @ query
+            count = min(k, len(members))
+            best = np.argpartition(-scores, count - 1)[:count]
+            best = best[np.argsort(-scores[best], kind="stable")]
+
+            found_ids[row, :count] = self.ids[members[best]]
+            found_scores[row, :count] = scores[best]
+
+        return found_ids, found_scores
+
+    def exact_search(
+        self, queries: np.ndarray, k: int = 10, batch_size: int = 64
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the ids and cosine similarities of the k articles most similar
+        to each query, comparing each query with every article, batch_size
+        queries at a time. Used as the reference for the recall of search().
+        """
+
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, len(self))
+        found_ids = np.empty((len(queries), k), dtype=np.uint64)
+        found_scores = np.empty((len(queries), k), dtype=np.float32)
+
+        for start in range(0, len(queries), batch_size):
+            stop = start + batch_size
+            scores = queries[start:stop] @ self.vectors.T
+            best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            selected = np.take_along_axis(scores, best, axis=1)
+            order = np.argsort(-selected, axis=1, kind="stable")
+
+            found_ids[start:stop] = self.ids[np.take_along_axis(best, order, axis=1)]
+            found_scores[start:stop] = np.take_along_axis(selected, order, axis=1)
+
+        return found_ids, found_scores
+
+    def more_like(
+        self,
+        read_ids: np.ndarray,
+        k: int = 10,
+        probes: int = 8,
+        candidates: np.ndarray = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the ids and similarities of the k articles most similar to
+        the articles a user has read, best first. Each read article is used
+        as a query and each article found keeps its highest similarity. The
+        read articles themselves are left out.
+
+        Parameters
+        ----------
+        read_ids: ndarray
+            The ids of the articles the user has read.
+
+        k: int, optional
+            The number of articles returned.
+
+        probes: int, optional
+            The number of lists searched per read article.
+
+        candidates: ndarray, optional
+            If provided, only articles with these ids are returned, such as
+            the articles collected since the last recommendations.
+
+        Returns
+        -------
+        tuple[ndarray, ndarray]:
+            The ids and similarities of the articles found.
+        """
+
+        queries = self.vectors_of(read_ids)
+        if not len(queries):
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.float32)
+
+        # Ask for more articles than needed, as some are filtered out below.
+        depth = k + len(read_ids) + (0 if candidates is None else 4 * k)
+        ids, scores = self.search(queries, depth, probes)
+        ids, scores = ids.ravel(), scores.ravel()
+
+        keep = np.isfinite(scores) & ~np.isin(ids, read_ids)
+        if candidates is not None:
+            keep &= np.isin(ids, candidates)
+        ids, scores = ids[keep], scores[keep]
+
+        # Keep the highest similarity of each article.
+        order = np.argsort(-scores, kind="stable")
+        ids, first = np.unique(ids[order], return_index=True)
+        scores = scores[order][first]
+
+        best = np.argsort(-scores, kind="stable")[:k]
+        return ids[best], scores[best]
@@ -0,0 +1,499 @@
+"""
+
+    digest.py
+
+    Description:
+
+        This module contains the delivery of the daily digest emails. Each
+        subscriber gets their own email listing their recommended articles.
+
+        Every email is rendered before the first one is sent, from templates
+        compiled once when the module is loaded, with each article link
+        formatted by format_html_element from the original email interface.
+        The whole email is rendered from a template as well, as building it
+        with the email package costs more than sending it.
+        The emails are then sent over a single SMTP connection instead of a
+        new connection per email. If the server supports PIPELINING the MAIL,
+        RCPT and DATA commands of an email are sent together, saving two round
+        trips per email. Non-ASCII display names and domains are encoded so
+        that any server accepts them, while an address with a non-ASCII local
+        part is only sent to servers that support SMTPUTF8. Sending is rate
+        limited to stay under the limits of
+        the mail server, and the connection is renewed after a number of
+        emails, as servers close connections that send too many.
+
+    Variables:
+
+        digest_template
+        article_template
+        message_template
+        rate_limit
+        messages_per_connection
+
+    Classes:
+
+        DigestSender
+
+    Functions:
+
+        render_articles(articles)
+        render_digest(articles, date)
+        encode_body(body)
+        encode_address(address)
+        build_message(sender, recipient, subject, html_body, text_body)
+        render_digests(recommendations, recipients, sender, subject)
+
+"""
+
+###############################################################################
+
+import base64
+import email.header
+import email.utils
+import html
+import logging
+import re
+import smtplib
+import string
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from Configure_Email import format_html_element
+
+###############################################################################
+
+# The templates of the digest, of each article in it and of the whole email,
+# compiled once. The email bodies are base64 encoded, and a base64 line never
+# starts with "--", so the boundary cannot appear in them.
+digest_template = string.Template(
+    """<html>
+<body>
+<h2>Your articles for $date</h2>
+<ul>
+$articles
+</ul>
+</body>
+</html>
+"""
+)
+article_template = string.Template("<li>$link<br>$details</li>")
+message_template = string.Template(
+    "From: $sender\r\n"
+    "To: $recipient\r\n"
+    "Subject: $subject\r\n"
+    "Date: $date\r\n"
+    "Message-ID: $message_id\r\n"
+    "MIME-Version: 1.0\r\n"
+    'Content-Type: multipart/alternative; boundary="$boundary"\r\n'
+    "\r\n"
+    "--$boundary\r\n"
+    'Content-Type: text/plain; charset="utf-8"\r\n'
+    "Content-Transfer-Encoding: base64\r\n"
+    "\r\n"
+    "$text"
+    "--$boundary\r\n"
+    'Content-Type: text/html; charset="utf-8"\r\n'
+    "Content-Transfer-Encoding: base64\r\n"
+    "\r\n"
+    "$html"
+    "--$boundary--\r\n"
+)
+
+# The maximum number of emails sent per second, and the number of emails sent
+# over a connection before it is renewed.
+rate_limit = 10.0
+messages_per_connection = 500
+
+###############################################################################
+
+
+def render_articles(articles: pd.DataFrame) -> list[str]:
+    """
+    Returns the HTML list item of each of the provided articles, with a title
+    and url column and optionally publication and read_time columns. Each
+    link is formatted by format_html_element.
+    """
+
+    rows = len(articles)
+    publications = articles.get("publication", pd.Series([None] * rows))
+    read_times = articles.get("read_time", pd.Series([None] * rows))
+
+    items = []
+    for title, url, publication, read_time in zip(
+        articles["title"].tolist(),
+        articles["url"].tolist(),
+        publications.tolist(),
+        read_times.tolist(),
+    ):
+        link = format_html_element(
+            {"link": html.escape(str(url)), "title": html.escape(str(title))}
+        )
+
+        details = []
+        if pd.notna(publication):
+            details.append(html.escape(str(publication)))
+        if pd.notna(read_time):
+            details.append(f"{int(read_time)} min read")
+
+        items.append(
+            article_template.substitute(link=link, details=" · ".join(details))
+        )
+
+    return items
+
+
+###############################################################################
+
+
+def render_digest(articles: pd.DataFrame, date: str = "today") -> str:
+    """
+    Returns the HTML of the digest of the provided articles.
+    """
+
+    return digest_template.substitute(
+        date=html.escape(date), articles="\n".join(render_articles(articles))
+    )
+
+
+###############################################################################
+
+
+def encode_body(body: str) -> str:
+    """
+    Returns the provided text base64 encoded, in lines ending with CRLF.
+    """
+
+    return base64.encodebytes(body.encode("utf-8")).decode().replace("\n", "\r\n")
+
+
+###############################################################################
+
+
+def encode_address(address: str) -> tuple[str, str]:
+    """
+    Returns the provided address, optionally with a display name, as a
+    header value and as an envelope address. A non-ASCII display name is
+    encoded as a MIME encoded word and a non-ASCII domain with IDNA. A
+    non-ASCII local part cannot be encoded and is kept as UTF-8.
+    """
+
+    name, address = email.utils.parseaddr(address)
+    local, at, domain = address.rpartition("@")
+    if not domain.isascii():
+        try:
+            domain = domain.encode("idna").decode("ascii")
+        except UnicodeError:
+            pass
+    address = f"{local}{at}{domain}"
+
+    if address.isascii():
+        return email.utils.formataddr((name, address), charset="utf-8"), address
+
+    # formataddr only accepts ASCII addresses, so the display name is
+    # formatted on its own and the address added after it.
+    if name:
+        header = email.utils.formataddr((name, ""), charset="utf-8")
+        return f"{header[:-1]}{address}>", address
+    return address, address
+
+
+###############################################################################
+
+
+def build_message(
+    sender: str, recipient: str, subject: str, html_body: str, text_body: str
+) -> bytes:
+    """
+    Returns a multipart email with the provided HTML and plain text bodies,
+    encoded for SMTP, built from message_template instead of the email
+    package, which takes milliseconds per email. The email is ASCII unless
+    an address has a non-ASCII local part, which requires SMTPUTF8.
+    """
+
+    sender, envelope_sender = encode_address(sender)
+    recipient, _ = encode_address(recipient)
+    boundary = f"=_digest_{uuid.uuid4().hex}"
+    return message_template.substitute(
+        sender=sender,
+        recipient=recipient,
+        subject=email.header.Header(subject, "utf-8").encode(),
+        date=email.utils.formatdate(localtime=True),
+        message_id=email.utils.make_msgid(domain=envelope_sender.rpartition("@")[2]),
+        boundary=boundary,
+        text=encode_body(text_body),
+        html=encode_body(html_body),
+    ).encode("utf-8")
+
+
+###############################################################################
+
+
+def render_digests(
+    recommendations: pd.DataFrame,
+    recipients: list[str],
+    sender: str,
+    subject: str,
+    date: str = "today",
+) -> list[tuple[str, bytes]]:
+    """
+    Returns the digest email of each recipient with recommendations, given
+    the recommendations with user, rank, title and url columns.
+    """
+
+    recommendations = recommendations[recommendations["user"].isin(recipients)]
+    recommendations = recommendations.sort_values(["user", "rank"], kind="stable")
+
+    items = render_articles(recommendations)
+    texts = [
+        f"{title}\n{url}\n"
+        for title, url in zip(
+            recommendations["title"].tolist(), recommendations["url"].tolist()
+        )
+    ]
+
+    # The articles of each user are a contiguous run of rows.
+    users = recommendations["user"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]]) if len(users) else []
+    stops = list(starts[1:]) + [len(users)]
+
+    date = html.escape(date)
+    return [
+        (
+            users[start],
+            build_message(
+                sender,
+                users[start],
+                subject,
+                digest_template.substitute(
+                    date=date, articles="\n".join(items[start:stop])
+                ),
+                "\n".join(texts[start:stop]),
+            ),
+        )
+        for start, stop in zip(starts, stops)
+    ]
+
+
+###############################################################################
+
+
+class DigestSender:
+    """
+    Sends emails over one SMTP connection, at most rate emails per second.
+    Used as a context manager, the connection is closed on exit.
+
+    Parameters
+    ----------
+    host: str
+        The SMTP server.
+
+    port: int, optional
+        The port of the SMTP server.
+
+    username: str, optional
+        The username to log in with. If not provided no login is made.
+
+    password: str, optional
+        The password to log in with.
+
+    starttls: bool, optional
+        Whether to upgrade the connection with STARTTLS.
+
+    rate: float, optional
+        The maximum number of emails sent per second.
+
+    messages_per_connection: int, optional
+        The number of emails sent before the connection is renewed.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        username: str = None,
+        password: str = None,
+        starttls: bool = True,
+        rate: float = rate_limit,
+        messages_per_connection: int = messages_per_connection,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.interval = 1 / rate
+        self.messages_per_connection = messages_per_connection
+
+        self.smtp = None
+        self.sent_on_connection = 0
+        self.next_send = 0.0
+
+    def __enter__(self) -> "DigestSender":
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def connect(self):
+        """
+        Open a new connection to the SMTP server, closing the current one.
+        """
+
+        self.close()
+        self.smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        self.smtp.ehlo()
+        if self.starttls:
+            self.smtp.starttls()
+            self.smtp.ehlo()
+        if self.username:
+            self.smtp.login(self.username, self.password)
+        self.sent_on_connection = 0
+
+    def close(self):
+        """
+        Close the connection to the SMTP server, if one is open.
+        """
+
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except smtplib.SMTPException:
+                self.smtp.close()
+            self.smtp = None
+
+    def _wait(self):
+        now = time.monotonic()
+        if now < self.next_send:
+            time.sleep(self.next_send - now)
+        self.next_send = max(now, self.next_send) + self.interval
+
+    def _pipelined_send(
+        self, sender: str, recipient: str, message: bytes, options: list[str]
+    ):
+        smtp = self.smtp
+        options = "".join(f" {option}" for option in options)
+        commands = f"MAIL FROM:<{sender}>{options}\r\nRCPT TO:<{recipient}>\r\nDATA\r\n"
+        smtp.send(commands.encode("utf-8"))
+        replies = [smtp.getreply() for _ in range(3)]
+
+        if replies[2][0] == 354 and (replies[0][0] != 250 or replies[1][0] >= 300):
+            # The server accepted DATA although the envelope failed, so an
+            # empty message is sent to end the transaction.
+            smtp.send(b".\r\n")
+            smtp.getreply()
+        for code, response in replies[:2]:
+            if code >= 300:
+                smtp.rset()
+                raise smtplib.SMTPResponseException(code, response)
+        if replies[2][0] != 354:
+            smtp.rset()
+            raise smtplib.SMTPDataError(*replies[2])
+
+        # Lines starting with a period are escaped with another period.
+        if not message.endswith(b"\r\n"):
+            message += b"\r\n"
+        smtp.send(re.sub(rb"(?m)^\.", b"..", message) + b".\r\n")
+
+        code, response = smtp.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+
+    def send(self, sender: str, recipient: str, message: bytes):
+        """
+        Send an email, waiting as long as needed to respect the rate limit.
+        If the server closed the connection it is opened again and the email
+        is sent once more. An envelope address with a non-ASCII local part
+        raises SMTPNotSupportedError if the server does not support SMTPUTF8.
+        """
+
+        self._wait()
+        if self.smtp is None or self.sent_on_connection >= self.messages_per_connection:
+            self.connect()
+
+        _, sender = encode_address(sender)
+        _, recipient = encode_address(recipient)
+        options = []
+        if not (sender + recipient).isascii():
+            if not self.smtp.has_extn("smtputf8"):
+                raise smtplib.SMTPNotSupportedError(
+                    f"{recipient} requires SMTPUTF8, which the server does not support"
+                )
+            options = ["SMTPUTF8"]
+
+        for attempt in range(2):
+            try:
+                if self.smtp.has_extn("pipelining"):
+                    self._pipelined_send(sender, recipient, message, options)
+                else:
+                    self.smtp.sendmail(sender, [recipient], message, options)
+                break
+            except smtplib.SMTPServerDisconnected:
+                self.smtp = None
+                if attempt:
+                    raise
+                self.connect()
+
+        self.sent_on_connection += 1
+
+    def send_all(
+        self,
+        sender: str,
+        messages: list[tuple[str, bytes]],
+        logger: logging.Logger = None,
+    ) -> list[str]:
+        """
+        Send each pre-rendered email to its recipient. An email the server
+        rejects or that cannot be sent to it is logged and skipped, and the
+        rest are still sent.
+
+        Parameters
+        ----------
+        sender: str
+            The envelope sender of the emails.
+
+        messages: list[tuple[str, bytes]]
+            The recipient and content of each email, as returned by
+            render_digests().
+
+        logger: Logger, optional
+            The logger the skipped emails, the number of emails sent and the
+            time taken are logged to. If no logger is provided they are
+            printed.
+
+        Returns
+        -------
+        list[str]:
+            The recipients whose email was rejected.
+        """
+
+        start = time.perf_counter()
+        failed = []
+        for recipient, message in messages:
+            try:
+                self.send(sender, recipient, message)
+            except (
+                smtplib.SMTPRecipientsRefused,
+                smtplib.SMTPResponseException,
+                smtplib.SMTPNotSupportedError,
+                UnicodeError,
+            ) as error:
+                failed.append(recipient)
+                if logger is not None:
+                    logger.warning(f"Digest email to {recipient} skipped: {error}")
+                else:
+                    print(f"Digest email to {recipient} skipped: {error}")
+
+        elapsed = time.perf_counter() - start
+        message = (
+            f"Sent {len(messages) - len(failed)} digest emails in {elapsed:.2f} s, "
+            f"{len(failed)} rejected."
+        )
+        if logger is not None:
+            logger.info(message)
+        else:
+            print(message)
+
+        return failed
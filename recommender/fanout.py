@@ -0,0 +1,341 @@
+"""
+
+    fanout.py
+
+    Description:
+
+        This module contains the fan-out of the day's candidate articles to
+        every user. The features of the candidates are computed once per day
+        and cached, and every user is scored against the same candidates.
+
+        The users are processed in blocks. The scores of a block come from a
+        single matrix product of the candidate features and the preference
+        vectors of the users in the block, such as the embeddings of the
+        candidates and the weight columns of the model, and only the best articles of each user are kept before the
+        next block is scored. The number of users per block is chosen so the
+        score matrix of a block fits in memory_budget bytes, so the memory a
+        run needs does not grow with the number of users.
+
+        scoring.score_articles() batches the articles instead, which suits
+        many articles and few users. The fan-out suits the daily candidates,
+        a bounded number of articles, for any number of users.
+
+        recommend() combines the candidates selected by the model with the
+        articles similar to each user's reading history. Subscribers left
+        without recommendations, such as every subscriber before a model was
+        trained, are recommended the newest candidates.
+
+    Variables:
+
+        memory_budget
+
+    Functions:
+
+        block_size(candidates, memory_budget)
+        fan_out(features, preferences, bias, k, memory_budget)
+        recommend(model, features, urls, subscribers, similar, dates, ...)
+        load_candidates(feature_store, shards, cache_file)
+
+"""
+
+###############################################################################
+
+import glob
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+
+from ann_index import embed
+from features import FeatureStore
+from model import LinearModel
+from scoring import top_k
+
+###############################################################################
+
+# The number of bytes the scores of a block of users may take.
+memory_budget = 256 * 1024**2
+
+###############################################################################
+
+
+def block_size(candidates: int, memory_budget: int = memory_budget) -> int:
+    """
+    Returns the number of users whose scores for the provided number of
+    candidates fit in memory_budget bytes. Each score takes 16 bytes while
+    the best articles are selected: the float32 score, its negated copy and
+    the int64 position of the partition.
+    """
+
+    return max(1, memory_budget // (16 * max(candidates, 1)))
+
+
+###############################################################################
+
+
+def fan_out(
+    features,
+    preferences: np.ndarray,
+    bias: np.ndarray = None,
+    k: int = 10,
+    memory_budget: int = memory_budget,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Select the k best candidates of each user, scoring the users in blocks
+    that fit in memory_budget bytes.
+
+    Parameters
+    ----------
+    features: csr_matrix or ndarray
+        The features of the candidates, one row per candidate.
+
+    preferences: ndarray
+        The preference vectors of the users, an array with one row per
+        feature and one column per user.
+
+    bias: ndarray, optional
+        The bias added to the scores of each user.
+
+    k: int, optional
+        The number of candidates selected per user.
+
+    memory_budget: int, optional
+        The number of bytes the scores of a block of users may take.
+
+    Returns
+    -------
+    tuple[ndarray, ndarray]:
+        The positions of the selected candidates in features and their
+        scores, both arrays with up to k rows and one column per user, best
+        first.
+    """
+
+    candidates, users = features.shape[0], preferences.shape[1]
+    k = min(k, candidates)
+    positions = np.empty((k, users), dtype=np.int64)
+    scores = np.empty((k, users), dtype=np.float32)
+
+    block = block_size(candidates, memory_budget)
+    for start in range(0, users, block):
+        stop = min(start + block, users)
+
+        block_scores = features @ preferences[:, start:stop]
+        if sparse.issparse(block_scores):
+            block_scores = block_scores.toarray()
+        block_scores = np.asarray(block_scores, dtype=np.float32)
+        if bias is not None:
+            block_scores += bias[start:stop]
+
+        positions[:, start:stop], scores[:, start:stop] = top_k(block_scores, k)
+
+    return positions, scores
+
+
+###############################################################################
+
+
+def recommend(
+    model: LinearModel,
+    features,
+    urls: np.ndarray,
+    subscribers: list[str],
+    similar: pd.DataFrame = None,
+    dates=None,
+    k: int = 10,
+    memory_budget: int = memory_budget,
+    logger: logging.Logger = None,
+) -> pd.DataFrame:
+    """
+    Returns the recommendations of the day's candidates.
+
+    Parameters
+    ----------
+    model: LinearModel
+        The model the candidates are scored with, or None if no model was
+        trained yet, in which case no candidates are selected by a model.
+
+    features: csr_matrix
+        The TF-IDF features of the candidates, one row per candidate, which
+        are embedded to be scored with the model.
+
+    urls: ndarray
+        The URL of each candidate.
+
+    subscribers: list[str]
+        The users receiving digests. Subscribers without any other
+        recommendation are recommended the k newest candidates.
+
+    similar: DataFrame, optional
+        The candidates similar to the reading history of each user, with
+        user, rank, score and url columns, as found by
+        scoring.similar_articles().
+
+    dates: array-like, optional
+        The publication date of each candidate. If not provided candidates
+        added later are taken to be newer.
+
+    k: int, optional
+        The number of candidates selected per user.
+
+    memory_budget: int, optional
+        The number of bytes the scores of a block of users may take.
+
+    logger: Logger, optional
+        The logger the scoring time is logged to. If no logger is provided it
+        is printed.
+
+    Returns
+    -------
+    DataFrame:
+        The user, rank, score, url and reason of each recommendation. The
+        reason is model, similar or recent.
+    """
+
+    def log(message: str):
+        if logger is not None:
+            logger.info(message)
+        else:
+            print(message)
+
+    columns = ["user", "rank", "score", "url", "reason"]
+    recommendations = []
+
+    if model is not None:
+        start = time.perf_counter()
+        positions, scores = fan_out(
+            embed(features), model.weights, model.bias, k, memory_budget
+        )
+        log(
+            f"Scored {features.shape[0]} articles for {len(model.users)} users in "
+            f"{time.perf_counter() - start:.2f} s with model version "
+            f"{model.version}."
+        )
+
+        recommendations.append(
+            pd.DataFrame(
+                {
+                    "user": np.tile(model.users, len(positions)),
+                    "rank": np.repeat(
+                        np.arange(1, len(positions) + 1), len(model.users)
+                    ),
+                    "score": scores.ravel(),
+                    "url": urls[positions.ravel()],
+                    "reason": "model",
+                }
+            )
+        )
+    else:
+        log("No model was trained yet, the candidates are not scored.")
+
+    if similar is not None and len(similar):
+        recommendations.append(similar[columns[:-1]].assign(reason="similar"))
+
+    recommended = set().union(*(frame["user"] for frame in recommendations))
+    users = [user for user in dict.fromkeys(subscribers) if user not in recommended]
+    if users and len(urls):
+        if dates is None:
+            newest = np.arange(len(urls))[::-1][:k]
+        else:
+            newest = (
+                pd.Series(pd.to_datetime(np.asarray(dates), errors="coerce"))
+                .sort_values(ascending=False, kind="stable", na_position="last")
+                .index[:k]
+                .to_numpy()
+            )
+
+        recommendations.append(
+            pd.DataFrame(
+                {
+                    "user": np.repeat(users, len(newest)),
+                    "rank": np.tile(np.arange(1, len(newest) + 1), len(users)),
+                    "score": np.nan,
+                    "url": np.tile(np.asarray(urls)[newest], len(users)),
+                    "reason": "recent",
+                }
+            )
+        )
+
+    return (
+        pd.concat(recommendations, ignore_index=True)
+        if recommendations
+        else pd.DataFrame(columns=columns)
+    )
+
+
+###############################################################################
+
+
+def load_candidates(
+    feature_store: FeatureStore, shards: list[str], cache_file: str
+) -> tuple:
+    """
+    Returns the TF-IDF features, ids and canonical URLs of the day's
+    candidates, the articles of every shard added on the day. They are
+    cached in cache_file, named after the date, along with the names of
+    their shards. A run with new shards adds them to the day's candidates and
+    computes them again, and a run without new shards reads the cached
+    candidates instead.
+
+    Parameters
+    ----------
+    feature_store: FeatureStore
+        The feature store holding the shards.
+
+    shards: list[str]
+        The shards added since the last run, which may be empty.
+
+    cache_file: str
+        The .npz file the day's candidates are cached in, such as one named
+        after the date. Other .npz files in its directory, the caches of
+        earlier days, are removed.
+
+    Returns
+    -------
+    tuple[csr_matrix, ndarray, ndarray]:
+        The features, ids and URLs of the candidates.
+    """
+
+    names = {os.path.basename(shard) for shard in shards}
+
+    if os.path.exists(cache_file):
+        with np.load(cache_file) as data:
+            cached_names = set(data["shards"].tolist())
+            if names <= cached_names:
+                features = sparse.csr_matrix(
+                    (data["data"], data["indices"], data["indptr"]),
+                    shape=tuple(data["shape"]),
+                )
+                return features, data["ids"], data["urls"]
+        names |= cached_names
+
+    names = np.array(sorted(names), dtype=str)
+    shards = [os.path.join(feature_store.directory, name) for name in names]
+    features, ids = feature_store.load(shards)
+    urls = feature_store.urls(shards)
+
+    directory = os.path.dirname(cache_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # The candidates of earlier days are not needed anymore.
+    for old_file in glob.glob(os.path.join(directory or ".", "*.npz")):
+        if os.path.abspath(old_file) != os.path.abspath(cache_file):
+            os.remove(old_file)
+
+    temporary_file = cache_file + ".tmp.npz"
+    np.savez(
+        temporary_file,
+        shards=names,
+        data=features.data,
+        indices=features.indices,
+        indptr=features.indptr,
+        shape=np.array(features.shape),
+        ids=ids,
+        urls=urls,
+    )
+    os.replace(temporary_file, cache_file)
+
+    return features, ids, urls
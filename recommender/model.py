@@ -0,0 +1,102 @@
+"""
+
+    model.py
+
+    Description:
+
+        This module contains the model the article recommender scores articles
+        with. The model holds one linear scorer per user over the embeddings
+        of the articles, the unit length projections of their TF-IDF features
+        returned by ann_index.embed(), stored together as a weight matrix with
+        a column per user, so the articles of a run are scored for every user
+        with a single matrix product.
+
+        The embeddings have 128 dimensions, so each user takes 512 bytes of
+        weights, about 25 MB for 50k users, instead of a weight for each of
+        the hundreds of thousands of TF-IDF columns.
+
+    Classes:
+
+        LinearModel
+
+"""
+
+###############################################################################
+
+import os
+
+import numpy as np
+
+###############################################################################
+
+
+class LinearModel:
+    """
+    A linear scorer per user.
+
+    Parameters
+    ----------
+    weights: ndarray
+        The weights of each embedding dimension for each user, an array with
+        one row per dimension and one column per user.
+
+    bias: ndarray
+        The bias of each user.
+
+    users: list[str]
+        The email address of each user, in the order of the weight columns.
+
+    version: int, optional
+        The version of the model, increased each time the model is trained.
+    """
+
+    def __init__(
+        self, weights: np.ndarray, bias: np.ndarray, users: list[str], version: int = 0
+    ):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.users = list(users)
+        self.version = version
+
+    @classmethod
+    def load(cls, path: str) -> "LinearModel":
+        """
+        Returns the model stored in the provided .npz file.
+        """
+
+        with np.load(path) as data:
+            return cls(
+                data["weights"],
+                data["bias"],
+                data["users"].tolist(),
+                int(data["version"]),
+            )
+
+    def save(self, path: str):
+        """
+        Write the model to the provided .npz file.
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # np.savez appends .npz to names that do not already end with it.
+        temporary_file = path + ".tmp.npz"
+        np.savez(
+            temporary_file,
+            weights=self.weights,
+            bias=self.bias,
+            users=np.array(self.users),
+            version=self.version,
+        )
+        os.replace(temporary_file, path)
+
+    def score(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Returns the score of each article for each user, an array with one row
+        per article and one column per user, given the embeddings of the
+        articles.
+        """
+
+        return np.asarray(embeddings @ self.weights) + self.bias
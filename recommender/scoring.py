@@ -0,0 +1,188 @@
+"""
+
+    scoring.py
+
+    Description:
+
+        This module contains the batch scoring of new articles. All articles
+        are scored for all users with one matrix product of their embeddings
+        per batch of articles, and the K best articles of each user are selected with
+        np.argpartition, which runs in linear time, instead of sorting every
+        score. Batches bound the memory used by the dense score matrix, and
+        the best articles of each batch are merged with the best articles of
+        the batches before it.
+
+        Articles similar to the articles each user has read are found with the
+        approximate nearest neighbor index, which only compares them with a
+        few lists of articles instead of the whole history.
+
+    Functions:
+
+        top_k(scores, k)
+        score_articles(model, embeddings, k, batch_size)
+        similar_articles(index, history, candidates, k, probes)
+
+"""
+
+###############################################################################
+
+import numpy as np
+import pandas as pd
+
+from ann_index import AnnIndex
+from model import LinearModel
+
+###############################################################################
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the positions and scores of the k highest scores in each column of
+    the provided scores, best first.
+
+    Parameters
+    ----------
+    scores: ndarray
+        The scores, an array with one row per article and one column per
+        user.
+
+    k: int
+        The number of articles selected per user. If there are fewer articles
+        all of them are selected.
+
+    Returns
+    -------
+    tuple[ndarray, ndarray]:
+        The positions of the selected articles and their scores, both arrays
+        with k rows and one column per user.
+    """
+
+    k = min(k, len(scores))
+    if k == 0:
+        return (
+            np.empty((0, scores.shape[1]), dtype=np.int64),
+            np.empty((0, scores.shape[1]), dtype=scores.dtype),
+        )
+
+    # The scores of each user are made contiguous, which partitions about
+    # twice as fast as partitioning the strided columns, and only the k
+    # selected scores of each user are sorted.
+    negated = np.ascontiguousarray(-scores.T)
+    positions = np.argpartition(negated, k - 1, axis=1)[:, :k]
+    selected = np.take_along_axis(negated, positions, axis=1)
+    order = np.argsort(selected, axis=1, kind="stable")
+
+    return (
+        np.take_along_axis(positions, order, axis=1).T,
+        -np.take_along_axis(selected, order, axis=1).T,
+    )
+
+
+###############################################################################
+
+
+def score_articles(
+    model: LinearModel, embeddings: np.ndarray, k: int = 10, batch_size: int = 100000
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Score every article for every user of the model and select the k best
+    articles of each user.
+
+    Parameters
+    ----------
+    model: LinearModel
+        The model the articles are scored with.
+
+    embeddings: ndarray
+        The embeddings of the articles, one row per article, as returned by
+        ann_index.embed().
+
+    k: int, optional
+        The number of articles selected per user.
+
+    batch_size: int, optional
+        The number of articles scored at a time.
+
+    Returns
+    -------
+    tuple[ndarray, ndarray]:
+        The positions of the selected articles in embeddings and their scores,
+        both arrays with up to k rows and one column per user, best first.
+    """
+
+    users = len(model.users)
+    best_positions = np.empty((0, users), dtype=np.int64)
+    best_scores = np.empty((0, users), dtype=np.float32)
+
+    for start in range(0, len(embeddings), batch_size):
+        stop = start + batch_size
+        scores = model.score(embeddings[start:stop])
+        positions, scores = top_k(scores, k)
+
+        # Merge the best articles of this batch with the best so far.
+        candidates = np.vstack([best_scores, scores])
+        merged, best_scores = top_k(candidates, k)
+        best_positions = np.take_along_axis(
+            np.vstack([best_positions, positions + start]), merged, axis=0
+        )
+
+    return best_positions, best_scores
+
+
+###############################################################################
+
+
+def similar_articles(
+    index: AnnIndex,
+    history: pd.DataFrame,
+    candidates: np.ndarray,
+    k: int = 10,
+    probes: int = 8,
+) -> pd.DataFrame:
+    """
+    Select the k candidate articles most similar to the articles each user
+    has read.
+
+    Parameters
+    ----------
+    index: AnnIndex
+        The index of the embeddings of every article.
+
+    history: DataFrame
+        The articles each user has read, with a user column and an id column
+        holding the id of each article in the index.
+
+    candidates: ndarray
+        The ids of the articles that can be recommended.
+
+    k: int, optional
+        The number of articles selected per user.
+
+    probes: int, optional
+        The number of index lists searched per read article.
+
+    Returns
+    -------
+    DataFrame:
+        The user, rank, score and id of each selected article.
+    """
+
+    selected = []
+    for user, read in history.groupby("user", sort=True)["id"]:
+        ids, scores = index.more_like(read.to_numpy(np.uint64), k, probes, candidates)
+        selected.append(
+            pd.DataFrame(
+                {
+                    "user": user,
+                    "rank": np.arange(1, len(ids) + 1),
+                    "score": scores,
+                    "id": ids,
+                }
+            )
+        )
+
+    return (
+        pd.concat(selected, ignore_index=True)
+        if selected
+        else pd.DataFrame(columns=["user", "rank", "score", "id"])
+    )
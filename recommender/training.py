@@ -0,0 +1,482 @@
+"""
+
+    training.py
+
+    Description:
+
+        This module contains the training of the article recommender model.
+        Each user is scored by a logistic regression over the embeddings of
+        the articles, the projections of the TF-IDF features of the feature
+        store returned by ann_index.embed(), trained with stochastic gradient
+        descent on the feedback labels of the users.
+
+        The feedback of each day updates the current model in place with a
+        few gradient steps, like partial_fit, instead of refitting it on every
+        label collected so far. The loss of the current model on each day's
+        labels is measured before the update. If it rises more than
+        drift_threshold above its average since the last full retrain, the
+        preferences have drifted away from what the model learned, and the
+        model is instead retrained from scratch on every label.
+
+        Each trained model is stored as a new versioned snapshot and the
+        latest snapshot is copied to the model file the recommender loads.
+        The row of the last feedback label applied is kept with the models,
+        so the recommender running several times a day applies each label
+        once.
+
+    Variables:
+
+        learning_rate
+        regularization
+        batch_size
+        epochs
+        drift_threshold
+        drift_window
+        snapshots_kept
+
+    Classes:
+
+        ModelRegistry
+
+    Functions:
+
+        sigmoid(x)
+        user_positions(model, users)
+        predict(model, embeddings, users)
+        log_loss(model, embeddings, users, labels)
+        partial_fit(model, embeddings, users, labels, learning_rate, ...)
+        fit(users, embeddings, positions, labels, epochs, seed)
+        update_model(registry, feature_store, feedback, labels_file, logger)
+
+"""
+
+###############################################################################
+
+import glob
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from ann_index import dimensions, embed
+from features import FeatureStore
+from model import LinearModel
+from seen_index import canonicalize_url, hash_urls
+
+###############################################################################
+
+# The step size, the L2 regularization strength and the number of labels per
+# gradient step of stochastic gradient descent.
+learning_rate = 1.0
+regularization = 1e-4
+batch_size = 64
+
+# The number of passes over the labels of a full retrain.
+epochs = 10
+
+# The relative increase of the loss on a day's labels over the average loss
+# of the days since the last full retrain that triggers a full retrain, and
+# the number of days averaged.
+drift_threshold = 0.25
+drift_window = 7
+
+# The number of model snapshots kept, enough to roll back over the days of
+# the drift window.
+snapshots_kept = 7
+
+###############################################################################
+
+
+def sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-np.clip(x, -30, 30)))
+
+
+###############################################################################
+
+
+def user_positions(model: LinearModel, users: pd.Series) -> np.ndarray:
+    """
+    Returns the weight column of each provided user. Users the model has not
+    seen before are added to the model with zero weights.
+    """
+
+    new_users = [user for user in pd.unique(users) if user not in model.users]
+    if new_users:
+        model.weights = np.hstack(
+            [model.weights, np.zeros((len(model.weights), len(new_users)), np.float32)]
+        )
+        model.bias = np.concatenate([model.bias, np.zeros(len(new_users), np.float32)])
+        model.users += new_users
+
+    column = {user: position for position, user in enumerate(model.users)}
+    return np.array([column[user] for user in users], dtype=np.int64)
+
+
+###############################################################################
+
+
+def predict(
+    model: LinearModel, embeddings: np.ndarray, users: np.ndarray
+) -> np.ndarray:
+    """
+    Returns the probability that each user is interested in the article in
+    the same row of embeddings. Only the weights of each row's own user are
+    used, instead of scoring every article for every user.
+    """
+
+    scores = np.einsum("ij,ij->i", embeddings, model.weights.T[users])
+
+    return sigmoid(scores + model.bias[users])
+
+
+###############################################################################
+
+
+def log_loss(
+    model: LinearModel, embeddings: np.ndarray, users: np.ndarray, labels
+) -> float:
+    """
+    Returns the mean logistic loss of the model on the provided labels.
+    """
+
+    probabilities = np.clip(predict(model, embeddings, users), 1e-7, 1 - 1e-7)
+    labels = np.asarray(labels, dtype=np.float64)
+
+    return float(
+        -np.mean(
+            labels * np.log(probabilities) + (1 - labels) * np.log(1 - probabilities)
+        )
+    )
+
+
+###############################################################################
+
+
+def partial_fit(
+    model: LinearModel,
+    embeddings: np.ndarray,
+    users: np.ndarray,
+    labels,
+    learning_rate: float = learning_rate,
+    regularization: float = regularization,
+    batch_size: int = batch_size,
+):
+    """
+    Update the model in place with one pass of stochastic gradient descent
+    over the provided labels.
+
+    Parameters
+    ----------
+    model: LinearModel
+        The model to update.
+
+    embeddings: ndarray
+        The embeddings of the labeled articles, one row per label.
+
+    users: ndarray
+        The weight column of the user of each label, as returned by
+        user_positions().
+
+    labels: array-like
+        1 if the user was interested in the article and 0 if not.
+
+    learning_rate: float, optional
+        The step size of each update.
+
+    regularization: float, optional
+        The L2 regularization strength. Only the weights of the users with
+        labels in a batch are shrunk.
+
+    batch_size: int, optional
+        The number of labels per update.
+    """
+
+    labels = np.asarray(labels, dtype=np.float64)
+
+    for start in range(0, len(embeddings), batch_size):
+        stop = start + batch_size
+        batch = embeddings[start:stop]
+        batch_users = users[start:stop]
+
+        errors = (predict(model, batch, batch_users) - labels[start:stop]) / len(
+            batch_users
+        )
+        gradient = errors[:, None] * batch + regularization * (
+            model.weights.T[batch_users]
+        )
+
+        # The transpose is a view, so each row added to is a user's weights.
+        np.add.at(
+            model.weights.T, batch_users, (-learning_rate * gradient).astype(np.float32)
+        )
+        np.add.at(model.bias, batch_users, (-learning_rate * errors).astype(np.float32))
+
+
+###############################################################################
+
+
+def fit(
+    users: list[str],
+    embeddings: np.ndarray,
+    positions: np.ndarray,
+    labels,
+    epochs: int = epochs,
+    seed: int = 0,
+) -> LinearModel:
+    """
+    Returns a model trained from scratch on the provided labels, with epochs
+    passes of stochastic gradient descent over the labels in random order.
+    """
+
+    model = LinearModel(
+        np.zeros((embeddings.shape[1], len(users)), dtype=np.float32),
+        np.zeros(len(users), dtype=np.float32),
+        users,
+    )
+    labels = np.asarray(labels, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+
+    for _ in range(epochs):
+        order = rng.permutation(len(embeddings))
+        partial_fit(model, embeddings[order], positions[order], labels[order])
+
+    return model
+
+
+###############################################################################
+
+
+class ModelRegistry:
+    """
+    The versioned snapshots of the trained models and the state of the
+    drift detection, kept in a directory.
+
+    Parameters
+    ----------
+    directory: str
+        The directory the models are stored in. The latest model is stored as
+        model.npz, and every model as snapshots/model-v<version>.npz.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.model_file = os.path.join(directory, "model.npz")
+        self.snapshot_directory = os.path.join(directory, "snapshots")
+        self.state_file = os.path.join(directory, "training.json")
+
+        os.makedirs(self.snapshot_directory, exist_ok=True)
+
+        # The version of the latest model, the loss of the model on each
+        # day's labels since the last full retrain and the row of the last
+        # feedback label applied.
+        self.state = {"version": 0, "losses": [], "feedback_row": 0}
+        if os.path.exists(self.state_file):
+            with open(self.state_file, "r") as file:
+                self.state.update(json.load(file))
+
+    def snapshots(self) -> list[str]:
+        """
+        Returns the paths of the snapshots, oldest first.
+        """
+
+        return sorted(glob.glob(os.path.join(self.snapshot_directory, "model-v*.npz")))
+
+    def load(self, version: int = None) -> LinearModel:
+        """
+        Returns the model with the provided version, defaults to the latest
+        model, or None if no model was trained yet. Models trained on the
+        TF-IDF features instead of their embeddings are not returned either,
+        so they are retrained.
+        """
+
+        if version is not None:
+            model = LinearModel.load(self._snapshot_file(version))
+        elif os.path.exists(self.model_file):
+            model = LinearModel.load(self.model_file)
+        else:
+            return None
+
+        return model if len(model.weights) == dimensions else None
+
+    def _snapshot_file(self, version: int) -> str:
+        return os.path.join(self.snapshot_directory, f"model-v{version:06d}.npz")
+
+    def drift(self, loss: float) -> float:
+        """
+        Returns the relative increase of the provided loss over the average
+        loss of the last drift_window days, or 0 if there is no loss to
+        compare with.
+        """
+
+        losses = self.state["losses"][-drift_window:]
+        if not losses:
+            return 0.0
+
+        baseline = np.mean(losses)
+        return float((loss - baseline) / max(baseline, 1e-9))
+
+    def publish(
+        self,
+        model: LinearModel,
+        loss: float = None,
+        full_retrain=False,
+        feedback_row: int = None,
+    ):
+        """
+        Store the model as a new snapshot with the next version and make it
+        the latest model. The loss of the model on the day's labels, measured
+        before the update, is recorded for drift detection. A full retrain
+        starts a new series of losses. The row of the last feedback label the
+        model learned from is recorded if provided.
+        """
+
+        model.version = self.state["version"] + 1
+        model.save(self._snapshot_file(model.version))
+        model.save(self.model_file)
+
+        losses = [] if full_retrain else self.state["losses"]
+        if loss is not None and not full_retrain:
+            losses = losses + [loss]
+        self.state["version"] = model.version
+        self.state["losses"] = losses[-drift_window:]
+        self.mark_applied(feedback_row)
+
+        for snapshot in self.snapshots()[:-snapshots_kept]:
+            os.remove(snapshot)
+
+    def mark_applied(self, feedback_row: int = None):
+        """
+        Record the row of the last feedback label applied, if provided, and
+        save the state.
+        """
+
+        if feedback_row is not None:
+            self.state["feedback_row"] = max(self.state["feedback_row"], feedback_row)
+
+        temporary_file = self.state_file + ".tmp"
+        with open(temporary_file, "w") as file:
+            json.dump(self.state, file)
+        os.replace(temporary_file, self.state_file)
+
+
+###############################################################################
+
+
+def update_model(
+    registry: ModelRegistry,
+    feature_store: FeatureStore,
+    feedback: pd.DataFrame,
+    labels_file: str,
+    logger: logging.Logger = None,
+) -> LinearModel:
+    """
+    Update the latest model with the day's feedback, or retrain it on every
+    label if no model was trained yet or the preferences have drifted, and
+    publish the result as a new version.
+
+    Parameters
+    ----------
+    registry: ModelRegistry
+        The registry of the trained models.
+
+    feature_store: FeatureStore
+        The feature store holding the features of the labeled articles.
+
+    feedback: DataFrame
+        The new feedback, with user, url and label columns and optionally a
+        row column, the increasing row of each label in the preference store.
+        Labels with a row up to the last one applied are skipped, so feedback
+        passed again by a later run is not learned twice.
+
+    labels_file: str
+        The CSV file every label is appended to, read by full retrains.
+
+    logger: Logger, optional
+        The logger the training times are logged to. If no logger is provided
+        they are printed.
+
+    Returns
+    -------
+    LinearModel:
+        The published model.
+    """
+
+    def log(message: str):
+        if logger is not None:
+            logger.info(message)
+        else:
+            print(message)
+
+    feedback_row = None
+    if "row" in feedback:
+        feedback = feedback[feedback["row"] > registry.state["feedback_row"]]
+        if len(feedback):
+            feedback_row = int(feedback["row"].max())
+
+    # Feedback already applied by an earlier run leaves the model as it is.
+    model = registry.load()
+    if model is not None and not len(feedback):
+        return model
+
+    feedback = feedback[["user", "url", "label"]]
+    feedback.to_csv(
+        labels_file, mode="a", header=not os.path.exists(labels_file), index=False
+    )
+
+    features, found = feature_store.select(
+        hash_urls(feedback["url"].astype(str).map(canonicalize_url))
+    )
+    embeddings = embed(features)
+    feedback = feedback[found]
+
+    # Measure the loss of the model on the new labels before it learns from
+    # them, which shows how well it still predicts the users' preferences.
+    drift = 0.0
+    if model is not None:
+        if not len(feedback):
+            registry.mark_applied(feedback_row)
+            return model
+
+        loss = log_loss(
+            model,
+            embeddings,
+            user_positions(model, feedback["user"]),
+            feedback["label"],
+        )
+        drift = registry.drift(loss)
+        log(f"Loss on {len(feedback)} new labels: {loss:.4f} (drift {drift:+.1%}).")
+
+    if model is None or drift > drift_threshold:
+        start = time.perf_counter()
+
+        labels = pd.read_csv(labels_file).drop_duplicates(["user", "url"], keep="last")
+        features, found = feature_store.select(
+            hash_urls(labels["url"].astype(str).map(canonicalize_url))
+        )
+        labels = labels[found]
+
+        users = list(pd.unique(labels["user"]))
+        positions = labels["user"].map({user: i for i, user in enumerate(users)})
+        model = fit(users, embed(features), positions.to_numpy(), labels["label"])
+        registry.publish(model, full_retrain=True, feedback_row=feedback_row)
+
+        log(
+            f"Retrained model version {model.version} on {len(labels)} labels in "
+            f"{time.perf_counter() - start:.2f} s."
+        )
+        return model
+
+    start = time.perf_counter()
+    partial_fit(
+        model, embeddings, user_positions(model, feedback["user"]), feedback["label"]
+    )
+    registry.publish(model, loss, feedback_row=feedback_row)
+
+    log(
+        f"Updated model to version {model.version} with {len(feedback)} labels in "
+        f"{time.perf_counter() - start:.2f} s."
+    )
+    return model
@@ -93,6 +93,7 @@ def prepare_read_time_input() -> pd.DataFrame:
 @pytest.fixture
 def prepare_read_time_output() -> pd.DataFrame:
     df = pd.read_csv("tests/test_files/prepare_read_time_output.csv")
+    df["read_time"] = df["read_time"].astype("int16")
     return df
 
 
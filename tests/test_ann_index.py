@@ -0,0 +1,173 @@
+"""
+
+    test_ann_index.py
+
+    Description:
+
+        This module contains all unit tests for the ann_index.py module in the
+        recommender package.
+
+    Functions:
+
+        clustered_vectors(rng, centers, count)
+        test_embed()
+        test_search(tmp_path)
+        test_add(tmp_path)
+        test_similar_articles(tmp_path)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("recommender/")
+sys.path.append("web_scraper/extract/")
+sys.path.append("web_scraper/prepare/")
+
+import numpy as np
+import pandas as pd
+
+import ann_index
+import scoring
+from ann_index import AnnIndex
+from features import vectorize
+
+###############################################################################
+
+
+def clustered_vectors(rng, centers: np.ndarray, count: int) -> np.ndarray:
+    """
+    Returns count unit length vectors scattered around the provided centers.
+    """
+
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors = vectors + rng.normal(scale=0.1, size=vectors.shape)
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+###############################################################################
+
+
+def test_embed():
+    """
+    Run unit tests on ann_index.embed(). The embeddings must have unit length
+    and articles sharing most of their words must be closer than unrelated
+    articles.
+    """
+
+    df = pd.DataFrame(
+        {
+            "title": [
+                "how to train a neural network in python",
+                "how to train a neural network with python",
+                "the best hiking trails in the alps",
+            ],
+            "subtitle": ["", "", ""],
+            "article_intro": ["", "", ""],
+        }
+    )
+    vectors = ann_index.embed(vectorize(df))
+
+    assert vectors.shape == (3, ann_index.dimensions)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1)
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+
+###############################################################################
+
+
+def test_search(tmp_path):
+    """
+    Run unit tests on AnnIndex.search(). Searching every list must return the
+    exact nearest neighbors, and searching a few lists most of them.
+    """
+
+    rng = np.random.default_rng(0)
+    centers = clustered_vectors(rng, rng.normal(size=(50, 32)), 50)
+    vectors = clustered_vectors(rng, centers, 5000)
+    queries = clustered_vectors(rng, centers, 50)
+
+    index = AnnIndex(str(tmp_path))
+    index.add(np.arange(1, 5001), vectors)
+    exact, exact_scores = index.exact_search(queries, 10)
+
+    ids, scores = index.search(queries, 10, probes=len(index.centroids))
+    assert (ids == exact).all()
+    assert np.allclose(scores, exact_scores)
+
+    ids, _ = index.search(queries, 10, probes=8)
+    recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(ids, exact)])
+    assert recall > 0.8
+
+
+###############################################################################
+
+
+def test_add(tmp_path):
+    """
+    Run unit tests on AnnIndex.add(). Articles added over several runs must
+    be found after the index is loaded again, and the centroids must be
+    trained once the index is large enough and again once it has grown.
+    """
+
+    rng = np.random.default_rng(1)
+    centers = clustered_vectors(rng, rng.normal(size=(20, 32)), 20)
+
+    index = AnnIndex(str(tmp_path), minimum_training_size=100)
+    index.add(np.arange(1, 51), clustered_vectors(rng, centers, 50))
+    assert index.centroids is None
+
+    index.add(np.arange(51, 201), clustered_vectors(rng, centers, 150))
+    assert index.trained_size == 200
+    assert len(index.chunks()) == 1
+
+    index.add(np.arange(201, 301), clustered_vectors(rng, centers, 100))
+    assert index.trained_size == 200
+    assert len(index.chunks()) == 2
+
+    loaded = AnnIndex(str(tmp_path), minimum_training_size=100)
+    assert len(loaded) == 300
+    assert (loaded.centroids == index.centroids).all()
+
+    vectors = loaded.vectors_of([250])
+    ids, scores = loaded.search(vectors, 1)
+    assert ids[0, 0] == 250
+    assert np.isclose(scores[0, 0], 1)
+
+    loaded.add(np.arange(301, 801), clustered_vectors(rng, centers, 500))
+    assert loaded.trained_size == 800
+    assert len(loaded.chunks()) == 1
+
+
+###############################################################################
+
+
+def test_similar_articles(tmp_path):
+    """
+    Run unit tests on scoring.similar_articles(). Only candidate articles
+    the users have not read may be selected, best first.
+    """
+
+    rng = np.random.default_rng(2)
+    centers = clustered_vectors(rng, rng.normal(size=(10, 32)), 10)
+    vectors = clustered_vectors(rng, centers, 2000)
+
+    index = AnnIndex(str(tmp_path))
+    index.add(np.arange(1, 2001), vectors)
+
+    history = pd.DataFrame(
+        {"user": ["a", "a", "b"], "id": np.array([1, 2, 3], dtype=np.uint64)}
+    )
+    candidates = np.arange(1001, 2001, dtype=np.uint64)
+    similar = scoring.similar_articles(index, history, candidates, k=5, probes=64)
+
+    assert sorted(similar["user"].unique()) == ["a", "b"]
+    assert similar["id"].isin(candidates).all()
+    for _, articles in similar.groupby("user"):
+        assert list(articles["rank"]) == [1, 2, 3, 4, 5]
+        assert articles["score"].is_monotonic_decreasing
+
+    # The best article of user b is the candidate closest to the article read.
+    best = similar.loc[similar["user"] == "b", "id"].iloc[0]
+    assert best == 1001 + np.argmax(vectors[1000:] @ vectors[2])
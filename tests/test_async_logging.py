@@ -0,0 +1,143 @@
+"""
+
+    test_async_logging.py
+
+    Description:
+
+        This module contains all unit tests for the async_logging.py module in
+        the logging directory.
+
+    Functions:
+
+        test_json_formatter()
+        test_queue_listener()
+        test_configure_worker()
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("logging/")
+
+import io
+import json
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import async_logging
+
+###############################################################################
+
+
+def stream_logger(name: str) -> tuple[logging.Logger, io.StringIO]:
+    stream = io.StringIO()
+    logger = logging.getLogger(name)
+    logger.handlers = [logging.StreamHandler(stream)]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger, stream
+
+
+###############################################################################
+
+
+def test_json_formatter():
+    """
+    Run unit tests on async_logging.JsonFormatter. The fields passed with
+    extra and the traceback of the exception must be part of the JSON.
+    """
+
+    logger, stream = stream_logger("test.json")
+    logger.handlers[0].setFormatter(async_logging.JsonFormatter())
+
+    try:
+        raise ValueError("bad page")
+    except ValueError:
+        logger.exception("Could not parse %s", "page", extra={"url": "https://a.com/1"})
+
+    record = json.loads(stream.getvalue())
+
+    assert record["level"] == "ERROR"
+    assert record["logger"] == "test.json"
+    assert record["message"] == "Could not parse page"
+    assert record["url"] == "https://a.com/1"
+    assert "source" not in record
+    assert "ValueError: bad page" in record["exception"]
+
+
+###############################################################################
+
+
+def test_queue_listener():
+    """
+    Run unit tests on async_logging.start_queue_listener(). The records of
+    every thread must be written as JSON by the listener, with their fields,
+    once the listener is stopped.
+    """
+
+    logger, stream = stream_logger("test.queue")
+    async_logging.start_queue_listener(["test.queue"])
+
+    assert isinstance(logger.handlers[0], async_logging.StructuredQueueHandler)
+
+    def log(source: str):
+        for stage in ["fetch", "parse"]:
+            logger.info("done", extra={"source": source, "stage": stage})
+
+    threads = [threading.Thread(target=log, args=(str(i),)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    async_logging.stop_queue_listener()
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    assert async_logging.get_worker_queue() is None
+    assert len(records) == 8
+    assert {(r["source"], r["stage"]) for r in records} == {
+        (str(i), stage) for i in range(4) for stage in ["fetch", "parse"]
+    }
+
+
+###############################################################################
+
+
+def test_configure_worker():
+    """
+    Run unit tests on async_logging.configure_worker(). The records logged in
+    the workers of a process pool must be written by the listener of the
+    main process.
+    """
+
+    logger, stream = stream_logger("test.worker")
+    async_logging.start_queue_listener(["test.worker"])
+    queue = async_logging.get_worker_queue()
+
+    with ProcessPoolExecutor(
+        max_workers=2,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=async_logging.configure_worker,
+        initargs=(queue,),
+    ) as executor:
+        worker_logger = logging.getLogger("test.worker.parse")
+        futures = [
+            executor.submit(
+                worker_logger.info, "parsed", extra={"url": f"https://a.com/{i}"}
+            )
+            for i in range(4)
+        ]
+        for future in futures:
+            future.result()
+
+    async_logging.stop_queue_listener()
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    assert sorted(record["url"] for record in records) == [
+        f"https://a.com/{i}" for i in range(4)
+    ]
+    assert all(record["process"] != "MainProcess" for record in records)
@@ -0,0 +1,127 @@
+"""
+
+    test_database.py
+
+    Description:
+
+        This module contains all unit tests for the database.py module in the
+        web_scraper package. The tests use in memory databases.
+
+    Functions:
+
+        test_upsert(prepare_article_data_output)
+        test_articles_since(prepare_article_data_output)
+        test_articles_by_url(prepare_article_data_output)
+        test_wal_mode(tmp_path)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/extract/")
+sys.path.append("web_scraper/prepare/")
+sys.path.append("web_scraper/store/")
+
+import datetime
+import database
+import prepare
+
+###############################################################################
+
+
+def test_upsert(prepare_article_data_output):
+    """
+    Run unit tests on database.ArticleDatabase.upsert(). Articles collected
+    again under a different form of the same URL must update the stored
+    article, keeping the date it was first scraped on.
+    """
+
+    df = prepare_article_data_output
+    db = database.ArticleDatabase()
+
+    assert db.upsert(df, scrape_date=datetime.date(2022, 8, 11), batch_size=5) == 12
+    assert len(db) == 12
+
+    again = df.iloc[:2].copy()
+    again["url"] = again["url"] + "?source=rss----5517fd7b58a6---4"
+    again["title"] = "updated"
+    db.upsert(again, scrape_date=datetime.date(2022, 8, 12))
+
+    rows = db.connection.execute(
+        "SELECT title, scrape_date, read_time FROM articles WHERE url = ?",
+        (df["url"][0],),
+    ).fetchall()
+
+    assert len(db) == 12
+    assert rows == [("updated", "2022-08-11", 5)]
+
+
+###############################################################################
+
+
+def test_articles_since(prepare_article_data_output):
+    """
+    Run unit tests on database.ArticleDatabase.articles_since(). Only the
+    articles of the selected topics published since the date must be
+    returned, newest first, and the query must use an index.
+    """
+
+    df = prepare.normalize_dates(prepare_article_data_output)
+    df["topic"] = ["programming"] * 4 + ["data science"] * 8
+    db = database.ArticleDatabase()
+    db.upsert(df)
+
+    since = datetime.date(2022, 8, 1)
+    result = db.articles_since(since, topics=["data science"], columns=["url", "date"])
+    expected = df[(df["topic"] == "data science") & (df["date"] >= since)]
+
+    assert sorted(result["url"]) == sorted(
+        expected["url"].map(database.canonicalize_url)
+    )
+    assert result["date"].is_monotonic_decreasing
+
+    query, parameters = db.articles_since_query(since, topics=["data science"])
+    plan = db.connection.execute(f"EXPLAIN QUERY PLAN {query}", parameters).fetchall()
+    assert any("USING INDEX" in row[-1] for row in plan)
+
+
+###############################################################################
+
+
+def test_articles_by_url(prepare_article_data_output):
+    """
+    Run unit tests on database.ArticleDatabase.articles_by_url(). Articles
+    must be found by any form of their URL, in batches, and URLs that are not
+    stored must be left out.
+    """
+
+    df = prepare_article_data_output
+    db = database.ArticleDatabase()
+    db.upsert(df)
+
+    urls = [url + "?utm_source=digest" for url in df["url"][:5]]
+    result = db.articles_by_url(
+        urls + ["https://example.com/missing"], columns=["title"], batch_size=2
+    )
+
+    assert list(result.columns) == ["url", "title"]
+    assert sorted(result["title"]) == sorted(df["title"][:5])
+    assert len(db.articles_by_url([])) == 0
+
+
+###############################################################################
+
+
+def test_wal_mode(tmp_path):
+    """
+    Run unit tests on database.ArticleDatabase. A database stored in a file
+    must be opened in WAL mode.
+    """
+
+    db = database.ArticleDatabase(str(tmp_path / "articles.db"))
+    mode = db.connection.execute("PRAGMA journal_mode").fetchone()[0]
+    db.close()
+
+    assert mode == "wal"
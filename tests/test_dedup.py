@@ -0,0 +1,80 @@
+"""
+
+    test_dedup.py
+
+    Description:
+
+        This module contains all unit tests for the dedup.py module in the
+        web_scraper package.
+
+    Functions:
+
+        test_deduplicate(prepare_article_data_output)
+        test_duplicate_index(prepare_article_data_output, tmp_path)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/extract/")
+sys.path.append("web_scraper/prepare/")
+
+import dedup
+import pandas as pd
+
+###############################################################################
+
+
+def test_deduplicate(prepare_article_data_output):
+    """
+    Run unit tests on dedup.deduplicate(). Copies of an article under a URL
+    with tracking parameters, under another URL with the same content, or
+    with a single word of its intro changed must be removed, and every other
+    article kept in order.
+    """
+
+    df = prepare_article_data_output
+    article = df.iloc[[1]]
+
+    tracked = article.assign(url=article["url"] + "?utm_source=newsletter")
+    syndicated = article.assign(url="https://example.com/syndicated")
+    edited = article.assign(
+        url="https://example.com/edited",
+        article_intro=article["article_intro"].str.replace("clunky", "clumsy"),
+    )
+
+    result = dedup.deduplicate(pd.concat([df, tracked, syndicated, edited]))
+
+    assert result.equals(df)
+
+
+###############################################################################
+
+
+def test_duplicate_index(prepare_article_data_output, tmp_path):
+    """
+    Run unit tests on dedup.DuplicateIndex. Articles kept in an earlier run
+    must be recognized as duplicates once the index is saved and loaded
+    again, while new articles are kept.
+    """
+
+    df = prepare_article_data_output
+    path = str(tmp_path / "duplicates.npz")
+
+    index = dedup.DuplicateIndex(path)
+    assert len(dedup.deduplicate(df.iloc[:8], index)) == 8
+    index.save()
+
+    index = dedup.DuplicateIndex(path)
+    assert len(index) == 8
+
+    edited = df.iloc[[2]].assign(
+        url="https://example.com/edited",
+        article_intro=df["article_intro"][2] + " today",
+    )
+    result = dedup.deduplicate(pd.concat([edited, df]), index)
+
+    assert result["url"].tolist() == df["url"][8:].tolist()
+    assert len(index) == 12
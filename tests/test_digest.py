@@ -0,0 +1,286 @@
+"""
+
+    test_digest.py
+
+    Description:
+
+        This module contains all unit tests for the digest.py module in the
+        recommender package. The emails are sent to a local aiosmtpd server.
+
+    Classes:
+
+        SinkHandler
+
+    Functions:
+
+        free_port()
+        smtp_sink(request)
+        test_render_digests()
+        test_send_all(smtp_sink)
+        test_send_all_non_ascii(smtp_sink)
+        test_send_all_smtputf8(pipelining)
+        test_rate_limit(smtp_sink)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("original_codebase/Email_Interface/")
+sys.path.append("recommender/")
+
+import email
+import email.policy
+import socket
+import time
+
+import pandas as pd
+import pytest
+
+import digest
+
+###############################################################################
+
+
+class SinkHandler:
+    """
+    An aiosmtpd handler that keeps every email it receives and rejects the
+    recipient rejected@example.com. It advertises PIPELINING if asked to.
+    The server started by the smtp_sink fixture does not support SMTPUTF8.
+    """
+
+    def __init__(self, pipelining: bool):
+        self.pipelining = pipelining
+        self.connections = 0
+        self.received = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        session.host_name = hostname
+        self.connections += 1
+        if self.pipelining:
+            responses.insert(-1, "250-PIPELINING")
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, options):
+        if address == "rejected@example.com":
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.append((envelope.rcpt_tos[0], envelope.content))
+        return "250 OK"
+
+
+###############################################################################
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+###############################################################################
+
+
+@pytest.fixture(params=[True, False], ids=["pipelining", "no-pipelining"])
+def smtp_sink(request):
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+
+    handler = SinkHandler(request.param)
+    controller = controller_module.Controller(
+        handler, hostname="127.0.0.1", port=free_port(), enable_SMTPUTF8=False
+    )
+    controller.start()
+    yield handler, controller.port
+    controller.stop()
+
+
+###############################################################################
+
+
+def recommendations(users: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "user": [f"user{i}@example.com" for i in range(users) for _ in range(2)],
+            "rank": [2, 1] * users,
+            "title": ["Second", "Pandas & <NumPy>"] * users,
+            "url": ["https://a.com/2", "https://a.com/1?a=1&b=2"] * users,
+            "publication": ["Towards Data Science", None] * users,
+            "read_time": [4, 7] * users,
+        }
+    )
+
+
+###############################################################################
+
+
+def test_render_digests():
+    """
+    Run unit tests on digest.render_digests(). Each recipient must get one
+    email with their articles in rank order, as escaped links formatted by
+    format_html_element, and a plain text version.
+    """
+
+    messages = digest.render_digests(
+        recommendations(3),
+        ["user0@example.com", "user2@example.com", "user9@example.com"],
+        "owner@example.com",
+        "Your articles",
+        "2022-07-01",
+    )
+
+    assert [recipient for recipient, _ in messages] == [
+        "user0@example.com",
+        "user2@example.com",
+    ]
+
+    message = email.message_from_bytes(messages[0][1], policy=email.policy.default)
+    assert message["To"] == "user0@example.com"
+    assert message["Subject"] == "Your articles"
+
+    html = message.get_body(preferencelist=("html",)).get_content()
+    assert "Your articles for 2022-07-01" in html
+    assert (
+        '<a href="https://a.com/1?a=1&amp;b=2">Pandas &amp; &lt;NumPy&gt;</a>' in html
+    )
+    assert "Towards Data Science · 4 min read" in html
+    assert html.index("a.com/1") < html.index("a.com/2")
+
+    text = (
+        message.get_body(preferencelist=("plain",)).get_content().replace("\r\n", "\n")
+    )
+    assert "Pandas & <NumPy>\nhttps://a.com/1?a=1&b=2" in text
+
+
+###############################################################################
+
+
+def test_send_all(smtp_sink):
+    """
+    Run unit tests on digest.DigestSender.send_all(). Every email must be
+    delivered to its own recipient over as few connections as allowed, and
+    a rejected recipient must not stop the rest.
+    """
+
+    handler, port = smtp_sink
+    messages = digest.render_digests(
+        recommendations(45),
+        [f"user{i}@example.com" for i in range(45)],
+        "o@x.com",
+        "Hi",
+    )
+    messages.insert(10, ("rejected@example.com", messages[0][1]))
+
+    with digest.DigestSender(
+        "127.0.0.1", port, starttls=False, rate=1000, messages_per_connection=20
+    ) as sender:
+        failed = sender.send_all("owner@example.com", messages)
+
+    assert failed == ["rejected@example.com"]
+    assert handler.connections == 3
+    assert sorted(recipient for recipient, _ in handler.received) == sorted(
+        f"user{i}@example.com" for i in range(45)
+    )
+    for recipient, content in handler.received:
+        assert f"To: {recipient}".encode() in content
+
+
+###############################################################################
+
+
+def test_send_all_non_ascii(smtp_sink):
+    """
+    Run unit tests on digest.DigestSender.send_all() with non-ASCII
+    addresses. Display names and domains must be encoded, and an address
+    with a non-ASCII local part must be skipped by a server without
+    SMTPUTF8 while the rest are still sent.
+    """
+
+    handler, port = smtp_sink
+    messages = digest.render_digests(
+        recommendations(3).replace(
+            {
+                "user0@example.com": "Zoë Brontë <zoe@exämple.com>",
+                "user1@example.com": "zoë@example.com",
+            }
+        ),
+        ["Zoë Brontë <zoe@exämple.com>", "zoë@example.com", "user2@example.com"],
+        "Zoë's Digest <o@x.com>",
+        "Hi",
+    )
+
+    with digest.DigestSender("127.0.0.1", port, starttls=False, rate=1000) as sender:
+        failed = sender.send_all("Zoë's Digest <o@x.com>", messages)
+
+    assert failed == ["zoë@example.com"]
+    assert [recipient for recipient, _ in handler.received] == [
+        "zoe@xn--exmple-cua.com",
+        "user2@example.com",
+    ]
+
+    content = handler.received[0][1]
+    content.decode("ascii")
+    message = email.message_from_bytes(content, policy=email.policy.default)
+    assert message["From"] == "Zoë's Digest <o@x.com>"
+    assert message["To"] == "Zoë Brontë <zoe@xn--exmple-cua.com>"
+
+
+###############################################################################
+
+
+@pytest.mark.parametrize("pipelining", [True, False])
+def test_send_all_smtputf8(pipelining):
+    """
+    Run unit tests on digest.DigestSender.send_all() with a server that
+    supports SMTPUTF8. An address with a non-ASCII local part must be sent
+    to with the SMTPUTF8 option.
+    """
+
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+
+    handler = SinkHandler(pipelining)
+    controller = controller_module.Controller(
+        handler, hostname="127.0.0.1", port=free_port(), enable_SMTPUTF8=True
+    )
+    controller.start()
+    messages = digest.render_digests(
+        recommendations(1).replace({"user0@example.com": "zoë@example.com"}),
+        ["zoë@example.com"],
+        "o@x.com",
+        "Hi",
+    )
+    try:
+        with digest.DigestSender(
+            "127.0.0.1", controller.port, starttls=False, rate=1000
+        ) as sender:
+            failed = sender.send_all("owner@example.com", messages)
+    finally:
+        controller.stop()
+
+    assert failed == []
+    assert [recipient for recipient, _ in handler.received] == ["zoë@example.com"]
+    assert "To: zoë@example.com".encode() in handler.received[0][1]
+
+
+###############################################################################
+
+
+def test_rate_limit(smtp_sink):
+    """
+    Run unit tests on digest.DigestSender.send(). Emails must not be sent
+    faster than the rate limit.
+    """
+
+    _, port = smtp_sink
+    messages = digest.render_digests(
+        recommendations(6), [f"user{i}@example.com" for i in range(6)], "o@x.com", "Hi"
+    )
+
+    start = time.monotonic()
+    with digest.DigestSender("127.0.0.1", port, starttls=False, rate=20) as sender:
+        sender.send_all("owner@example.com", messages)
+
+    assert time.monotonic() - start >= 5 / 20
@@ -0,0 +1,326 @@
+"""
+
+    test_email_ingest.py
+
+    Description:
+
+        This module contains all unit tests for the email_ingest.py module in
+        the web_scraper package and the preferences.py module it writes to.
+
+    Classes:
+
+        FakeImap
+
+    Functions:
+
+        make_message(sender, body, authentication)
+        test_message_commands()
+        test_sender_verified()
+        test_latest_commands()
+        mailbox(tmp_path)
+        test_ingest(mailbox, tmp_path)
+        test_ingest_rollback(mailbox, tmp_path, monkeypatch)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/extract/")
+sys.path.append("web_scraper/ingest/")
+sys.path.append("web_scraper/store/")
+
+import datetime
+import email.message
+import email.policy
+import re
+
+import pandas as pd
+import pytest
+
+import email_ingest
+from preferences import PreferenceStore
+from watermarks import HighWaterMarks
+
+###############################################################################
+
+
+class FakeImap:
+    """
+    A stand-in for an imaplib connection to a mailbox holding the provided
+    messages, keyed by UID. The commands it receives are recorded.
+    """
+
+    def __init__(self, messages: dict, validity: int = 7):
+        self.messages = messages
+        self.validity = validity
+        self.commands = []
+
+    def select(self, mailbox: str = "INBOX", readonly: bool = False):
+        self.commands.append(("SELECT", mailbox))
+        return "OK", [str(len(self.messages)).encode()]
+
+    def response(self, code: str):
+        return code, [str(self.validity).encode()]
+
+    def uid(self, command: str, *arguments):
+        self.commands.append((command, *arguments))
+
+        if command == "SEARCH":
+            first = int(re.search(r"UID (\d+):\*", arguments[1]).group(1))
+            uids = [uid for uid in sorted(self.messages) if uid >= first]
+            # Like a real server, n:* includes the highest UID.
+            if not uids and self.messages:
+                uids = [max(self.messages)]
+            return "OK", [" ".join(map(str, uids)).encode()]
+
+        data = []
+        for uid in map(int, arguments[0].split(",")):
+            header = f"{uid} (UID {uid} BODY[] {{{len(self.messages[uid])}}}"
+            data += [(header.encode(), self.messages[uid]), b")"]
+        return "OK", data
+
+
+###############################################################################
+
+
+def make_message(sender: str, body: str, authentication: list[str] = ()) -> bytes:
+    message = email.message.EmailMessage()
+    for results in authentication:
+        message["Authentication-Results"] = results
+    message["From"] = f"Reader <{sender}>"
+    message["To"] = "owner@example.com"
+    message["Subject"] = "Settings"
+    message.set_content(body)
+    return message.as_bytes()
+
+
+###############################################################################
+
+
+def test_message_commands():
+    """
+    Run unit tests on email_ingest.message_commands(). Commands must be
+    parsed from their own lines, case insensitively, while quoted lines and
+    the signature are ignored.
+    """
+
+    message = make_message(
+        "Reader@Example.com",
+        "Hi,\nSubscribe\ntopic ADD python\n> like https://a.com/quoted\n"
+        "like https://a.com/post\n-- \nlike https://a.com/signature\n",
+    )
+    commands = email_ingest.message_commands(3, message)
+
+    assert commands == [
+        email_ingest.Command(3, "reader@example.com", "subscribe", ()),
+        email_ingest.Command(3, "reader@example.com", "topic", ("ADD", "python")),
+        email_ingest.Command(3, "reader@example.com", "like", ("https://a.com/post",)),
+    ]
+
+
+###############################################################################
+
+
+def test_sender_verified():
+    """
+    Run unit tests on email_ingest.sender_verified(). Only the first
+    Authentication-Results header, added by the receiving server, must be
+    read, and it must report a passing DMARC check or DKIM signature for the
+    exact domain of the sender.
+    """
+
+    def verified(*authentication, authserv_id=None):
+        message = email.message_from_bytes(
+            make_message("owner@example.com", "hi", authentication),
+            policy=email.policy.default,
+        )
+        return email_ingest.sender_verified(message, "owner@example.com", authserv_id)
+
+    passed = "mx.example.net; dmarc=pass (p=REJECT) header.from=example.com"
+    signed = "mx.example.net; dkim=pass header.i=@example.com header.s=s1"
+
+    assert not verified()
+    assert verified(passed)
+    assert verified(signed)
+    assert verified("mx.example.net; dkim=pass header.d=example.com; spf=fail")
+    assert not verified("mx.example.net; dkim=fail header.d=example.com")
+    assert not verified("mx.example.net; dkim=pass header.d=example.com.evil.org")
+    assert not verified("mx.example.net; dmarc=fail header.from=example.com")
+    assert not verified("mx.example.net; spf=pass smtp.mailfrom=example.com")
+
+    # A header written by the sender comes after the one of the server.
+    assert not verified("mx.example.net; dkim=none", passed)
+
+    assert verified(passed, authserv_id="mx.example.net")
+    assert not verified(passed, authserv_id="mx.google.com")
+
+
+###############################################################################
+
+
+def test_latest_commands():
+    """
+    Run unit tests on email_ingest.latest_commands(). Only the last command
+    of each user for each setting must be kept, and invalid commands must
+    be dropped.
+    """
+
+    Command = email_ingest.Command
+    groups = email_ingest.latest_commands(
+        [
+            Command(1, "a@x.com", "subscribe", ()),
+            Command(2, "a@x.com", "unsubscribe", ()),
+            Command(2, "b@x.com", "subscribe", ()),
+            Command(3, "a@x.com", "like", ("https://a.com/1?utm_source=mail",)),
+            Command(4, "a@x.com", "dislike", ("https://a.com/1",)),
+            Command(4, "a@x.com", "topic", ("add",)),
+            Command(5, "a@x.com", "source", ("remove", "https://a.com")),
+        ]
+    )
+
+    assert [(c.uid, c.sender) for c in groups["subscription"]] == [
+        (2, "a@x.com"),
+        (2, "b@x.com"),
+    ]
+    assert [(c.uid, c.name) for c in groups["feedback"]] == [(4, "dislike")]
+    assert groups["topic"] == []
+    assert len(groups["source"]) == 1
+
+
+###############################################################################
+
+
+@pytest.fixture
+def mailbox(tmp_path):
+    sites_file = str(tmp_path / "site-and-api-data.csv")
+    pd.DataFrame(
+        {
+            "class": ["medium", "news"],
+            "name": ["Medium", "News API"],
+            "topic": ["python", "technology"],
+            "url": ["https://medium.com/tag/python", "https://newsapi.org"],
+        }
+    ).to_csv(sites_file, index=False)
+
+    verified = ["mx.example.net; dkim=pass header.d=x.com"]
+    imap = FakeImap(
+        {
+            4: make_message("a@x.com", "subscribe\ntopic add python", verified),
+            9: make_message("b@x.com", "subscribe\nlike https://a.com/1", verified),
+            12: make_message(
+                "owner@example.com",
+                "source add medium Medium data-science "
+                "https://medium.com/tag/data-science\n"
+                "source remove https://newsapi.org",
+                ["mx.example.net; dkim=pass header.d=example.com"],
+            ),
+            13: make_message(
+                "owner@example.com",
+                "source remove https://medium.com/tag/data-science",
+            ),
+            14: make_message(
+                "a@x.com",
+                "unsubscribe\ndislike https://a.com/1",
+                ["mx.example.net; dkim=pass header.d=evil.org"],
+            ),
+            15: make_message(
+                "b@x.com", "source remove https://medium.com/tag/python", verified
+            ),
+        }
+    )
+    return imap, sites_file
+
+
+###############################################################################
+
+
+def test_ingest(mailbox, tmp_path):
+    """
+    Run unit tests on email_ingest.ingest(). The commands of every new
+    message must be applied to the preference store and the website
+    dataset, with one FETCH for all messages. Commands from a forged From
+    address, whose sender was not verified, and source commands of other
+    senders or of an unverified owner must be ignored, and a second run must
+    not fetch any message.
+    Changed feedback labels must be returned again after the earlier ones.
+    """
+
+    imap, sites_file = mailbox
+    store = PreferenceStore(str(tmp_path / "preferences.db"))
+    watermarks = HighWaterMarks(str(tmp_path / "watermarks.json"))
+
+    applied = email_ingest.ingest(
+        imap, store, sites_file, watermarks, "owner@example.com"
+    )
+
+    assert applied == 6
+    assert [c[0] for c in imap.commands] == ["SELECT", "SEARCH", "FETCH"]
+    assert imap.commands[2][1] == "4,9,12,13,14,15"
+    assert watermarks.get("imap:INBOX:7") == 15
+
+    assert store.subscribers() == ["a@x.com", "b@x.com"]
+    assert store.topics().values.tolist() == [["a@x.com", "python"]]
+    assert store.feedback(datetime.date.today()).values.tolist() == [
+        ["b@x.com", "https://a.com/1", 1]
+    ]
+    assert store.feedback_after(0).values.tolist() == [
+        ["b@x.com", "https://a.com/1", 1, 1]
+    ]
+
+    # A changed label is returned again, after every earlier label.
+    store.set_feedback([("b@x.com", "https://a.com/1", 0)])
+    assert store.feedback_after(1).values.tolist() == [
+        ["b@x.com", "https://a.com/1", 0, 2]
+    ]
+
+    sites = pd.read_csv(sites_file)
+    assert sites["url"].tolist() == [
+        "https://medium.com/tag/python",
+        "https://medium.com/tag/data-science",
+    ]
+    assert sites.columns.tolist() == ["class", "name", "topic", "url"]
+
+    # Only messages above the high-water mark are fetched.
+    imap.commands = []
+    assert (
+        email_ingest.ingest(imap, store, sites_file, watermarks, "owner@example.com")
+        == 0
+    )
+    assert [c[0] for c in imap.commands] == ["SELECT", "SEARCH"]
+
+    imap.messages[16] = make_message("a@x.com", "unsubscribe")
+    imap.messages[17] = make_message(
+        "b@x.com", "unsubscribe", ["mx.example.net; dkim=pass header.d=x.com"]
+    )
+    email_ingest.ingest(imap, store, sites_file, watermarks, "owner@example.com")
+    assert imap.commands[-1][1] == "16,17"
+    assert store.subscribers() == ["a@x.com"]
+
+
+###############################################################################
+
+
+def test_ingest_rollback(mailbox, tmp_path, monkeypatch):
+    """
+    Run unit tests on email_ingest.ingest(). If writing the website dataset
+    fails, the preference changes must be rolled back, the dataset left as
+    it was and the high-water mark not raised.
+    """
+
+    imap, sites_file = mailbox
+    store = PreferenceStore(str(tmp_path / "preferences.db"))
+    watermarks = HighWaterMarks(str(tmp_path / "watermarks.json"))
+    before = pd.read_csv(sites_file)
+
+    def failing_write_csv(df, path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(email_ingest, "write_csv", failing_write_csv)
+    with pytest.raises(OSError):
+        email_ingest.ingest(imap, store, sites_file, watermarks, "owner@example.com")
+
+    assert store.subscribers() == []
+    assert pd.read_csv(sites_file).equals(before)
+    assert watermarks.get("imap:INBOX:7") is None
@@ -0,0 +1,166 @@
+"""
+
+    test_fanout.py
+
+    Description:
+
+        This module contains all unit tests for the fanout.py module in the
+        recommender package.
+
+    Functions:
+
+        test_fan_out()
+        test_load_candidates(prepare_article_data_output, tmp_path)
+        test_recommend_without_model(prepare_article_data_output, tmp_path)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("recommender/")
+sys.path.append("web_scraper/extract/")
+sys.path.append("web_scraper/prepare/")
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+
+import fanout
+import scoring
+import training
+from features import FeatureStore
+from model import LinearModel
+
+###############################################################################
+
+
+def test_fan_out():
+    """
+    Run unit tests on fanout.fan_out(). Scoring the users in blocks must
+    select the same articles as scoring every user at once, for sparse and
+    dense candidate features.
+    """
+
+    rng = np.random.default_rng(0)
+    features = sparse.random(300, 50, density=0.1, format="csr", random_state=1)
+    preferences = rng.normal(size=(50, 37)).astype(np.float32)
+    bias = rng.normal(size=37).astype(np.float32)
+
+    expected_positions, expected_scores = scoring.top_k(
+        np.asarray(features @ preferences) + bias, 5
+    )
+
+    # A budget of 20 users per block splits the users into two blocks.
+    assert fanout.block_size(300, 16 * 300 * 20) == 20
+    for candidates in (features, features.toarray()):
+        positions, scores = fanout.fan_out(
+            candidates, preferences, bias, k=5, memory_budget=16 * 300 * 20
+        )
+
+        assert (positions == expected_positions).all()
+        assert np.allclose(scores, expected_scores)
+
+    positions, scores = fanout.fan_out(features[:3], preferences, k=5)
+    assert positions.shape == scores.shape == (3, 37)
+
+
+###############################################################################
+
+
+def test_load_candidates(prepare_article_data_output, tmp_path):
+    """
+    Run unit tests on fanout.load_candidates(). The candidates must match the
+    feature store, be read from the cache when there are no new shards and
+    include every shard of the day when new shards are added.
+    """
+
+    df = prepare_article_data_output
+    store = FeatureStore(str(tmp_path / "features"), n_features=2**12)
+    first = store.add(df.iloc[:6])
+    cache_directory = tmp_path / "candidates"
+    (cache_directory).mkdir()
+    (cache_directory / "2022-06-30.npz").write_bytes(b"")
+
+    cache_file = str(cache_directory / "2022-07-01.npz")
+    features, ids, urls = fanout.load_candidates(store, [first], cache_file)
+    expected, expected_ids = store.load([first])
+
+    assert (features != expected).nnz == 0
+    assert (ids == expected_ids).all()
+    assert (urls == store.urls([first])).all()
+    assert [path.name for path in cache_directory.iterdir()] == ["2022-07-01.npz"]
+
+    # A new shard is added to the day's candidates.
+    second = store.add(df.iloc[6:])
+    features, ids, urls = fanout.load_candidates(store, [second], cache_file)
+    expected, expected_ids = store.load([first, second])
+    assert (features != expected).nnz == 0
+    assert (ids == expected_ids).all()
+    assert (urls == store.urls([first, second])).all()
+
+    # Without new shards the cached candidates are returned, even if the
+    # shards themselves are gone.
+    for path in (tmp_path / "features").glob("shard-*"):
+        path.rename(str(path) + ".moved")
+    cached, cached_ids, _ = fanout.load_candidates(store, [], cache_file)
+    assert (cached != expected).nnz == 0 and (cached_ids == expected_ids).all()
+
+
+###############################################################################
+
+
+def test_recommend_without_model(prepare_article_data_output, tmp_path):
+    """
+    Run unit tests on fanout.recommend(). Before a model was trained the
+    subscribers with a reading history must be recommended similar articles
+    and the other subscribers the newest candidates. Once a model is trained
+    only the subscribers the model does not know fall back to the newest
+    candidates.
+    """
+
+    df = prepare_article_data_output
+    store = FeatureStore(str(tmp_path / "features"), n_features=2**12)
+    shard = store.add(df)
+    features, ids, urls = fanout.load_candidates(
+        store, [shard], str(tmp_path / "candidates" / "2022-07-01.npz")
+    )
+    dates = pd.Series(pd.date_range("2022-06-01", periods=len(urls), freq="D"))
+    dates = dates.sample(frac=1, random_state=0).reset_index(drop=True)
+    newest = urls[np.argsort(-dates.to_numpy().astype(np.int64))[:3]].tolist()
+
+    # A run with an empty model registry.
+    registry = training.ModelRegistry(str(tmp_path / "model"))
+    model = registry.load()
+    assert model is None
+
+    similar = pd.DataFrame(
+        {"user": "reader@example.com", "rank": [1], "score": [0.9], "url": urls[:1]}
+    )
+    subscribers = ["reader@example.com", "new@example.com", "other@example.com"]
+    recommendations = fanout.recommend(
+        model, features, urls, subscribers, similar, dates, k=3
+    )
+
+    by_user = recommendations.groupby("user")
+    assert set(by_user.groups) == set(subscribers)
+    assert by_user.get_group("reader@example.com")["reason"].tolist() == ["similar"]
+    for user in ("new@example.com", "other@example.com"):
+        recent = by_user.get_group(user)
+        assert (recent["reason"] == "recent").all()
+        assert recent["url"].tolist() == newest
+        assert recent["rank"].tolist() == [1, 2, 3]
+
+    # Without dates the candidates added last are the newest.
+    recommendations = fanout.recommend(model, features, urls, ["new@example.com"], k=2)
+    assert recommendations["url"].tolist() == urls[::-1][:2].tolist()
+
+    # With a model, only subscribers unknown to the model get the newest.
+    model = LinearModel(np.ones((128, 1)), np.zeros(1), ["known@example.com"])
+    recommendations = fanout.recommend(
+        model, features, urls, ["known@example.com", "new@example.com"], None, dates, 3
+    )
+    reasons = recommendations.groupby("user")["reason"].unique()
+    assert reasons["known@example.com"].tolist() == ["model"]
+    assert reasons["new@example.com"].tolist() == ["recent"]
@@ -0,0 +1,84 @@
+"""
+
+    test_features.py
+
+    Description:
+
+        This module contains all unit tests for the features.py module in the
+        web_scraper package.
+
+    Functions:
+
+        test_hash_term_frequencies()
+        test_feature_store(prepare_article_data_output, tmp_path)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/extract/")
+sys.path.append("web_scraper/prepare/")
+
+import features
+import numpy as np
+import pandas as pd
+import pytest
+
+###############################################################################
+
+
+def test_hash_term_frequencies():
+    """
+    Run unit tests on features.hash_term_frequencies(). Each unigram and
+    bigram must be counted with sublinear term frequency, and texts without
+    words must give empty rows.
+    """
+
+    counts = features.hash_term_frequencies(
+        pd.Series(["data science data", "", None]), n_features=2**20
+    )
+
+    assert counts.shape == (3, 2**20)
+    assert np.allclose(sorted(counts[0].data), [1, 1, 1, 1 + np.log(2)])
+    assert counts[1].nnz == counts[2].nnz == 0
+
+
+###############################################################################
+
+
+def test_feature_store(prepare_article_data_output, tmp_path):
+    """
+    Run unit tests on features.FeatureStore. Articles added over two runs must
+    give the same document frequencies as adding them at once, the loaded
+    TF-IDF vectors must have unit length, and selecting articles by id must
+    give the same vectors as loading every article.
+    """
+
+    df = prepare_article_data_output
+    directory = str(tmp_path / "features")
+
+    store = features.FeatureStore(directory, n_features=2**12)
+    store.add(df.iloc[:5])
+    store.add(df.iloc[5:])
+
+    store = features.FeatureStore(directory, n_features=2**12)
+    vectors, ids = store.load()
+    expected = features.vectorize(df, n_features=2**12)
+
+    assert len(store) == 12 and len(store.shards()) == 2
+    assert (
+        store.document_frequency == np.bincount(expected.indices, minlength=3 * 2**12)
+    ).all()
+    assert vectors.shape == (12, 3 * 2**12)
+    assert np.allclose(np.asarray(vectors.multiply(vectors).sum(axis=1)), 1)
+    assert (ids == features.hash_urls(df["url"])).all()
+    assert store.urls().tolist() == df["url"].map(features.canonicalize_url).tolist()
+
+    selected, found = store.select(np.array([ids[7], 1, ids[2]], dtype=np.uint64))
+    assert found.tolist() == [True, False, True]
+    assert np.allclose(selected.toarray(), vectors[[7, 2]].toarray())
+
+    with pytest.raises(ValueError):
+        features.FeatureStore(directory, n_features=2**13)
@@ -0,0 +1,154 @@
+"""
+
+    test_http_cache.py
+
+    Description:
+
+        This module contains all unit tests for the http_cache.py module in the
+        web_scraper package. The tests run against a local HTTP server that
+        supports conditional requests with ETags.
+
+    Fixtures:
+
+        server()
+
+    Functions:
+
+        test_conditional_get(server, tmp_path)
+        test_eviction(server, tmp_path)
+        test_reconcile(server, tmp_path)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/extract/")
+
+import os
+import threading
+import pytest
+import http_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+###############################################################################
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Responds to every path with a 100 byte body and an ETag derived from the
+    path, or with a 304 if the request carries the matching If-None-Match.
+    """
+
+    def do_GET(self):
+        etag = f'"{self.path}"'
+        self.server.requests.append(self.path)
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        body = self.path.encode("utf-8").ljust(100, b".")
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+###############################################################################
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+###############################################################################
+
+
+def test_conditional_get(server, tmp_path):
+    """
+    Run unit tests on http_cache.HttpCache. The second request for a page must
+    be a conditional request answered from disk, and the cache must still be
+    valid after being saved and re-opened.
+    """
+
+    cache = http_cache.HttpCache(str(tmp_path))
+    first = cache.get_text(f"{server}/page")
+    second = cache.get_text(f"{server}/page")
+
+    assert first == second and first.startswith("/page")
+    assert (cache.hits, cache.misses, cache.bytes_saved) == (1, 1, 100)
+
+    cache.save()
+    cache = http_cache.HttpCache(str(tmp_path))
+
+    assert cache.get_text(f"{server}/page") == first
+    assert cache.hits == 1
+    assert "1 hits, 0 misses" in cache.report()
+
+
+###############################################################################
+
+
+def test_eviction(server, tmp_path):
+    """
+    Run unit tests on http_cache.HttpCache. Once the cached bodies exceed
+    max_bytes the least recently used page must be evicted.
+    """
+
+    cache = http_cache.HttpCache(str(tmp_path), max_bytes=250)
+    cache.get_text(f"{server}/a")
+    cache.get_text(f"{server}/b")
+
+    # Using /a makes /b the least recently used page.
+    cache.get_text(f"{server}/a")
+    cache.get_text(f"{server}/c")
+
+    assert set(cache.index) == {f"{server}/a", f"{server}/c"}
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+###############################################################################
+
+
+def test_reconcile(server, tmp_path):
+    """
+    Run unit tests on http_cache.HttpCache. Bodies written by a run that did
+    not save the index must be removed when the cache is opened again, along
+    with the index entries whose body is missing.
+    """
+
+    cache = http_cache.HttpCache(str(tmp_path))
+    cache.get_text(f"{server}/a")
+    cache.get_text(f"{server}/b")
+    cache.save()
+
+    # The run stops before saving the index, after caching /c and with a
+    # body still being written.
+    cache.get_text(f"{server}/c")
+    (tmp_path / "body.1.tmp").write_bytes(b"partial")
+    os.remove(cache._body_path(f"{server}/b"))
+
+    cache = http_cache.HttpCache(str(tmp_path))
+
+    assert set(cache.index) == {f"{server}/a"}
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        ["index.json", os.path.basename(cache._body_path(f"{server}/a"))]
+    )
+    assert cache.get_text(f"{server}/a").startswith("/a")
+    assert cache.hits == 1
@@ -0,0 +1,177 @@
+"""
+
+    test_http_client.py
+
+    Description:
+
+        This module contains all unit tests for the http_client.py module in
+        the web_scraper package. The tests run against a local HTTP server so
+        that they do not depend on any external website.
+
+    Fixtures:
+
+        server()
+
+    Functions:
+
+        test_retry_on_status(server)
+        test_no_retry_on_client_error(server)
+        test_metrics(server)
+        test_retry_after()
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/extract/")
+
+import threading
+import time
+import pytest
+import requests
+import http_client
+import metrics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+###############################################################################
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Responds to /flaky/<n> with a 503 and a Retry-After header until the
+    path was requested n times, and to any other path with a 404.
+    """
+
+    def do_GET(self):
+        counts = self.server.counts
+        counts[self.path] = counts.get(self.path, 0) + 1
+
+        if self.path.startswith("/flaky/"):
+            failures = int(self.path.split("/")[-1])
+            if counts[self.path] <= failures:
+                self.send_response(503)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            body = b"ok"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+###############################################################################
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.counts = {}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+###############################################################################
+
+
+def test_retry_on_status(server):
+    """
+    Run unit tests on http_client.create_session(). A request that receives
+    a retryable status code must be retried until it succeeds or runs out of
+    retries, and the Retry-After header must be used as the delay.
+    """
+
+    session = http_client.create_session(retries=3, delay=10)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    start = time.monotonic()
+    response = session.get(f"{base_url}/flaky/2")
+
+    # Retry-After: 0 overrides the 10 second backoff delay.
+    assert time.monotonic() - start < 5
+    assert response.status_code == 200
+    assert response.text == "ok"
+    assert server.counts["/flaky/2"] == 3
+
+    response = session.get(f"{base_url}/flaky/10")
+
+    assert response.status_code == 503
+    assert server.counts["/flaky/10"] == 4
+
+
+###############################################################################
+
+
+def test_no_retry_on_client_error(server):
+    """
+    Run unit tests on http_client.create_session(). A request that receives a
+    status code that is not retryable must not be retried.
+    """
+
+    session = http_client.create_session(retries=3, delay=0)
+    response = session.get(f"http://127.0.0.1:{server.server_port}/missing")
+
+    assert response.status_code == 404
+    assert server.counts["/missing"] == 1
+
+
+###############################################################################
+
+
+def test_metrics(server):
+    """
+    Run unit tests on http_client.RetryAdapter. Every attempt must be timed
+    and counted with the labels of the thread, along with the retries and
+    the bytes downloaded.
+    """
+
+    metrics.registry.reset()
+    session = http_client.create_session(retries=3, delay=0)
+
+    with metrics.labels(source="test"):
+        session.get(f"http://127.0.0.1:{server.server_port}/flaky/1")
+
+    labels = (("source", "test"),)
+    counters = metrics.registry.counters
+    assert counters[("http_retries_total", labels)] == 1
+    assert counters[("http_bytes_downloaded_total", labels)] == 2
+    assert counters[("http_responses_total", labels + (("status", "200"),))] == 1
+    assert counters[("http_responses_total", labels + (("status", "503"),))] == 1
+    assert metrics.registry.histograms[("http_fetch_seconds", labels)].count == 2
+
+
+###############################################################################
+
+
+def test_retry_after():
+    """
+    Run unit tests on http_client.retry_after(). The header can contain a
+    number of seconds or an HTTP date.
+    """
+
+    response = requests.Response()
+    assert http_client.retry_after(response) is None
+
+    response.headers["Retry-After"] = "12"
+    assert http_client.retry_after(response) == 12
+
+    response.headers["Retry-After"] = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert http_client.retry_after(response) == 0
+
+    response.headers["Retry-After"] = "soon"
+    assert http_client.retry_after(response) is None
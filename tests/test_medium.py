@@ -12,12 +12,17 @@
         expected_output_get_article_data
         input_get_latest_posts_links
         input_get_latest_article_data
+        parser_engines
 
     Functions:
 
         test_get_article_data(url, publication, expected_output)
         test_get_latest_posts_links()
         test_get_latest_article_data()
+        test_get_latest_article_data_concurrent(monkeypatch)
+        test_get_latest_article_data_skips_seen(monkeypatch, tmp_path)
+        test_parse_article_data(engine)
+        test_parse_latest_posts_links(engine)
 
 """
 
@@ -29,6 +34,7 @@ sys.path.append("web_scraper/extract/")
 
 import pytest
 import medium
+import seen_index
 import re
 import requests
 import pandas as pd
@@ -116,6 +122,8 @@ input_get_latest_article_data = [
     ("https://towardsdatascience.com/latest", "Towards Data Science")
 ]
 
+parser_engines = ["lxml", "strainer", "html.parser"]
+
 ###############################################################################
 
 
@@ -181,3 +189,115 @@ def test_get_latest_article_data(url, publication):
 
     assert type(df) == pd.DataFrame
     assert df.shape == (10, 8)
+
+
+###############################################################################
+
+
+def test_get_latest_article_data_concurrent(monkeypatch):
+    """
+    Run unit tests on the concurrent path of medium.get_latest_article_data().
+    The network calls are replaced so that the test does not depend on the
+    live publication. The dataframe returned when fetching concurrently must
+    be identical to the dataframe returned when fetching sequentially.
+    """
+
+    links = [f"https://host{i % 3}.com/article-{i}" for i in range(25)]
+
+    def get_article_data(url, publication, logger=None):
+        return {
+            "author": [f"author {url[-2:]}"],
+            "publication": [publication],
+            "title": [url],
+            "url": [url],
+        }
+
+    monkeypatch.setattr(medium, "get_latest_posts_links", lambda url, pub: links)
+    monkeypatch.setattr(medium, "get_article_data", get_article_data)
+
+    sequential = medium.get_latest_article_data("", "Publication", "")
+    concurrent = medium.get_latest_article_data(
+        "", "Publication", "", max_workers=8, max_per_host=2
+    )
+
+    assert sequential.shape == (25, 4)
+    assert concurrent.equals(sequential)
+
+
+###############################################################################
+
+
+def test_get_latest_article_data_skips_seen(monkeypatch, tmp_path):
+    """
+    Run unit tests on medium.get_latest_article_data(). Articles that are in
+    the seen URL index must not be fetched.
+    """
+
+    links = [f"https://example.com/article-{i}" for i in range(10)]
+    fetched = []
+
+    def get_article_data(url, publication, logger=None):
+        fetched.append(url)
+        return {"title": [url], "url": [url]}
+
+    monkeypatch.setattr(medium, "get_latest_posts_links", lambda url, pub: links)
+    monkeypatch.setattr(medium, "get_article_data", get_article_data)
+
+    seen = seen_index.SeenUrlIndex(str(tmp_path / "seen-urls.npy"))
+    seen.add(links[:7])
+
+    df = medium.get_latest_article_data("", "Publication", "", seen=seen)
+
+    assert fetched == links[7:]
+    assert list(df["url"]) == links[7:]
+
+
+###############################################################################
+
+
+@pytest.mark.parametrize("engine", parser_engines)
+def test_parse_article_data(engine: str):
+    """
+    Run unit tests on medium.parse_article_data() with each parser engine
+    against a saved article page. Every engine must return the same data as
+    the original html.parser implementation, and a page without a subtitle
+    must get an empty subtitle.
+    """
+
+    with open("tests/test_files/medium_article.html", "r") as file:
+        html = file.read()
+
+    url = "https://towardsdatascience.com/ai-can-now-play-minecraft-1f19cfe37ef"
+    expected = dict(expected_output_get_article_data[0][2], url=[url])
+
+    assert medium.parse_article_data(html, url, "Towards Data Science", engine) == (
+        expected
+    )
+
+    html = html.replace("pw-subtitle-paragraph", "subtitle")
+    data = medium.parse_article_data(html, url, "Towards Data Science", engine)
+
+    assert data["subtitle"] == [""]
+
+    with pytest.raises(AttributeError):
+        medium.parse_article_data(html.replace("pw-author", "x"), url, "", engine)
+
+
+###############################################################################
+
+
+@pytest.mark.parametrize("engine", parser_engines)
+def test_parse_latest_posts_links(engine: str):
+    """
+    Run unit tests on medium.parse_latest_posts_links() with each parser
+    engine against a saved latest posts page.
+    """
+
+    with open("tests/test_files/medium_latest.html", "r") as file:
+        html = file.read()
+
+    links = medium.parse_latest_posts_links(html, "Towards Data Science", engine)
+
+    assert len(links) == 10
+    assert all(link.startswith("https://towardsdatascience.com/") for link in links)
+    assert not any("?source" in link for link in links)
@@ -0,0 +1,150 @@
+"""
+
+    test_metrics.py
+
+    Description:
+
+        This module contains all unit tests for the metrics.py module in the
+        web_scraper package.
+
+    Functions:
+
+        test_histogram()
+        test_labels()
+        test_write_json(tmp_path)
+        test_write_prometheus(tmp_path)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/extract/")
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+###############################################################################
+
+
+def test_histogram():
+    """
+    Run unit tests on metrics.Histogram. Each value must be counted in the
+    first bucket whose bound is at least the value, and the quantiles must be
+    the bound of the bucket they fall in.
+    """
+
+    histogram = metrics.Histogram(buckets=(0.1, 1.0))
+    for value in [0.05, 0.1, 0.5, 0.7, 2.0]:
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 2, 1]
+    assert histogram.count == 5
+    assert abs(histogram.sum - 3.35) < 1e-9
+    assert histogram.quantile(0.4) == 0.1
+    assert histogram.quantile(0.8) == 1.0
+    assert histogram.quantile(1.0) == 2.0
+
+    summary = histogram.summary()
+    assert summary["buckets"] == {"0.1": 2, "1.0": 2, "+Inf": 1}
+    assert summary["max"] == 2.0
+
+
+###############################################################################
+
+
+def test_labels():
+    """
+    Run unit tests on metrics.labels() and metrics.bind(). The labels must
+    only apply to the thread that set them, unless a function is bound to
+    them before it is run in another thread.
+    """
+
+    registry = metrics.MetricsRegistry()
+
+    def record():
+        registry.increment("pages_total")
+
+    with metrics.labels(source="a"):
+        record()
+        registry.increment("pages_total", 2, source="b")
+
+        thread = threading.Thread(target=record)
+        thread.start()
+        thread.join()
+
+        bound = metrics.bind(record)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(lambda _: bound(), range(3)))
+
+    record()
+
+    assert registry.counters == {
+        ("pages_total", (("source", "a"),)): 4,
+        ("pages_total", (("source", "b"),)): 2,
+        ("pages_total", ()): 2,
+    }
+
+
+###############################################################################
+
+
+def test_write_json(tmp_path):
+    """
+    Run unit tests on metrics.MetricsRegistry.write_json(). The summary must
+    hold every series of every metric along with the provided fields.
+    """
+
+    registry = metrics.MetricsRegistry()
+    registry.increment("http_bytes_downloaded_total", 100, source="a")
+    registry.increment("http_bytes_downloaded_total", 50, source="a")
+    with registry.timer("source_seconds", source="a"):
+        pass
+
+    path = tmp_path / "metrics" / "run.json"
+    registry.write_json(str(path), status="completed")
+
+    with open(path, "r") as file:
+        summary = json.load(file)
+
+    assert summary["status"] == "completed"
+    assert summary["counters"]["http_bytes_downloaded_total"] == [
+        {"labels": {"source": "a"}, "value": 150}
+    ]
+    (series,) = summary["histograms"]["source_seconds"]
+    assert series["labels"] == {"source": "a"}
+    assert series["count"] == 1
+    assert series["buckets"]["0.005"] == 1
+
+
+###############################################################################
+
+
+def test_write_prometheus(tmp_path):
+    """
+    Run unit tests on metrics.MetricsRegistry.write_prometheus(). Histogram
+    buckets must be cumulative and label values must be escaped.
+    """
+
+    registry = metrics.MetricsRegistry()
+    registry.increment("source_errors_total", source='say "hi"')
+    for value in [0.001, 0.2, 100.0]:
+        registry.observe("http_fetch_seconds", value)
+
+    path = tmp_path / "web_scraper.prom"
+    registry.write_prometheus(str(path), prefix="test_")
+    lines = path.read_text().splitlines()
+
+    assert "# TYPE test_source_errors_total counter" in lines
+    assert 'test_source_errors_total{source="say \\"hi\\""} 1' in lines
+    assert "# TYPE test_http_fetch_seconds histogram" in lines
+    assert 'test_http_fetch_seconds_bucket{le="0.005"} 1' in lines
+    assert 'test_http_fetch_seconds_bucket{le="0.25"} 2' in lines
+    assert 'test_http_fetch_seconds_bucket{le="60"} 2' in lines
+    assert 'test_http_fetch_seconds_bucket{le="+Inf"} 3' in lines
+    assert "test_http_fetch_seconds_count 3" in lines
+    assert any(line.startswith("test_last_run_timestamp_seconds ") for line in lines)
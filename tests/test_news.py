@@ -11,17 +11,26 @@
         used in place of the function return value.
 
         The get_news_page function requires an api key meaning it would not
-        be possible to automate testing of this function on Github. For this
-        reason there is no unit test for get_news_page.
+        be possible to automate testing of this function on Github against the
+        real News API. For this reason it is tested with a fake client that
+        returns pages built from the test files.
 
-    Variables:
+    Classes:
 
-        Variable
+        FakeNewsApiClient
+        WindowedNewsApiClient
 
     Functions:
 
-        test_get_latest_article_data()
         test_get_article_data()
+        test_get_news_page(news_test_input)
+        test_get_latest_article_data(news_test_input, monkeypatch, tmp_path)
+        test_get_latest_article_data_page_budget(news_test_input, monkeypatch,
+            tmp_path)
+        test_get_latest_article_data_gap(news_test_input, monkeypatch, tmp_path)
+        test_get_latest_article_data_cancel(news_test_input, monkeypatch,
+            tmp_path)
+        test_parse_timestamp()
 
 """
 
@@ -31,8 +40,14 @@ import sys
 
 sys.path.append("web_scraper/extract/")
 
-# import pytest
+import copy
+import datetime
+import pytest
+import threading
 import news
+import watermarks
+from records import ArticleRecords
+from newsapi.newsapi_exception import NewsAPIException
 
 ###############################################################################
 
@@ -54,3 +69,275 @@ def test_get_article_data(news_test_input, news_test_output):
     test_output = news_test_output.drop(columns="article_intro")
 
     assert test_output.equals(test_input)
+
+
+###############################################################################
+
+
+class FakeNewsApiClient:
+    """
+    Stands in for NewsApiClient. Returns full pages of articles built from
+    the test input until the requested number of pages has been served, then
+    a final partial page. Pages after max_page raise the error the News API
+    raises when the result limit of the plan is reached.
+    """
+
+    def __init__(self, articles: dict, full_pages: int, max_page: int = 100):
+        self.articles = articles
+        self.full_pages = full_pages
+        self.max_page = max_page
+        self.calls = []
+
+    def get_everything(self, **kwargs):
+        self.calls.append(kwargs)
+        if kwargs["page"] > self.max_page:
+            raise NewsAPIException({"code": "maximumResultsReached"})
+
+        page = copy.deepcopy(self.articles)
+        if kwargs["page"] <= self.full_pages:
+            page["articles"] = (page["articles"] * 20)[: kwargs["page_size"]]
+        return page
+
+
+###############################################################################
+
+
+def test_get_news_page(news_test_input):
+    """
+    Run unit tests on news.get_news_page(). Pages must be requested until a
+    partial page is returned, the page budget runs out, or the News API
+    refuses to return more results.
+    """
+
+    client = FakeNewsApiClient(news_test_input, full_pages=2)
+    pages = list(news.get_news_page(client, "python", None, "", max_pages=5))
+
+    assert [len(page) for page in pages] == [100, 100, 5]
+    assert [call["page"] for call in client.calls] == [1, 2, 3]
+
+    client = FakeNewsApiClient(news_test_input, full_pages=10)
+    pages = list(news.get_news_page(client, "python", None, "", max_pages=4))
+
+    assert len(pages) == 4
+
+    client = FakeNewsApiClient(news_test_input, full_pages=10, max_page=2)
+    pages = list(news.get_news_page(client, "python", None, "", max_pages=4))
+
+    assert len(pages) == 2
+
+
+###############################################################################
+
+
+def test_get_latest_article_data(news_test_input, monkeypatch, tmp_path):
+    """
+    Run unit tests on news.get_latest_article_data(). The high-water mark of
+    the topic must be passed as the from argument and raised to just after
+    the newest article returned, and the articles must also be added to the
+    provided records.
+    """
+
+    client = FakeNewsApiClient(news_test_input, full_pages=0)
+    monkeypatch.setattr(news, "NewsApiClient", lambda **kwargs: client)
+
+    marks = watermarks.HighWaterMarks(str(tmp_path / "watermarks.json"))
+    marks.update("news:python", "2022-07-01T00:00:00")
+
+    article_records = ArticleRecords()
+    df = news.get_latest_article_data(
+        "", "", "python", "key", watermarks=marks, records=article_records
+    )
+    marks.save()
+
+    assert len(df) == 5
+    assert article_records.to_dataframe().equals(df)
+    assert client.calls[0]["from_param"] == "2022-07-01T00:00:00"
+
+    marks = watermarks.HighWaterMarks(str(tmp_path / "watermarks.json"))
+    assert marks.get("news:python") == "2022-07-27T09:28:00"
+
+
+###############################################################################
+
+
+def test_get_latest_article_data_page_budget(news_test_input, monkeypatch, tmp_path):
+    """
+    Run unit tests on news.get_latest_article_data(). When the page budget
+    runs out before the final page, the high-water mark must be raised to the
+    newest article returned and the articles older than the oldest article
+    returned must be recorded as the gap of the topic.
+    """
+
+    client = FakeNewsApiClient(news_test_input, full_pages=10)
+    monkeypatch.setattr(news, "NewsApiClient", lambda **kwargs: client)
+
+    marks = watermarks.HighWaterMarks(str(tmp_path / "watermarks.json"))
+    marks.update("news:python", "2022-07-01T00:00:00")
+
+    df = news.get_latest_article_data(
+        "", "", "python", "key", watermarks=marks, max_pages=2
+    )
+
+    assert len(df) == 2 * news.page_size
+    assert marks.get("news:python") == "2022-07-27T09:28:00"
+    assert marks.get("news:python:gap") == [
+        "2022-07-01T00:00:00",
+        "2022-07-15T15:09:26",
+    ]
+
+
+###############################################################################
+
+
+class WindowedNewsApiClient:
+    """
+    Stands in for NewsApiClient. Serves the provided articles published in
+    the requested window, newest first, a page at a time.
+    """
+
+    def __init__(self, articles: list[dict]):
+        self.articles = sorted(articles, key=lambda a: a["publishedAt"], reverse=True)
+        self.calls = []
+
+    def get_everything(self, **kwargs):
+        self.calls.append(kwargs)
+        start, end = kwargs["from_param"] or "", kwargs["to"] or "9999"
+        selected = [
+            article
+            for article in self.articles
+            if start <= article["publishedAt"][:19] <= end
+        ]
+        skipped = (kwargs["page"] - 1) * kwargs["page_size"]
+        return {"articles": selected[skipped:][: kwargs["page_size"]]}
+
+
+###############################################################################
+
+
+def test_get_latest_article_data_gap(news_test_input, monkeypatch, tmp_path):
+    """
+    Run unit tests on news.get_latest_article_data(). The articles of a run
+    cut short by the page budget must be requested by the next runs, before
+    the articles published since, so every article is collected once the
+    gap is closed.
+    """
+
+    published = [
+        datetime.datetime(2022, 7, 2) + datetime.timedelta(minutes=i)
+        for i in range(250)
+    ]
+    articles = [
+        dict(
+            news_test_input["articles"][0],
+            publishedAt=f"{date.isoformat()}Z",
+            url=f"https://example.com/{i}",
+        )
+        for i, date in enumerate(published)
+    ]
+    client = WindowedNewsApiClient(articles)
+    monkeypatch.setattr(news, "NewsApiClient", lambda **kwargs: client)
+
+    marks = watermarks.HighWaterMarks(str(tmp_path / "watermarks.json"))
+    marks.update("news:python", "2022-07-01T00:00:00")
+
+    collected = set()
+    df = news.get_latest_article_data(
+        "", "", "python", "key", watermarks=marks, max_pages=1
+    )
+    collected |= set(df["url"])
+    assert marks.get("news:python") == "2022-07-02T04:09:01"
+    assert marks.get("news:python:gap") == [
+        "2022-07-01T00:00:00",
+        "2022-07-02T02:30:00",
+    ]
+
+    # An article is published before the next runs, which close the gap
+    # first, a page per run, and then collect the new article.
+    client.articles.insert(
+        0,
+        dict(
+            articles[0],
+            publishedAt="2022-07-03T00:00:00Z",
+            url="https://example.com/new",
+        ),
+    )
+    for _ in range(3):
+        df = news.get_latest_article_data(
+            "", "", "python", "key", watermarks=marks, max_pages=1
+        )
+        collected |= set(df["url"])
+
+    assert client.calls[1]["to"] == "2022-07-02T02:30:00"
+    assert collected == {article["url"] for article in client.articles}
+    assert marks.get("news:python:gap") is None
+    assert marks.get("news:python") == "2022-07-03T00:00:01"
+
+
+###############################################################################
+
+
+def test_get_latest_article_data_cancel(news_test_input, monkeypatch, tmp_path):
+    """
+    Run unit tests on news.get_latest_article_data(). Once the cancellation
+    event is set no more pages must be requested, and the marks raised
+    through pending marks must only reach the store once committed.
+    """
+
+    client = FakeNewsApiClient(news_test_input, full_pages=10)
+    cancel = threading.Event()
+    get_everything = client.get_everything
+
+    def get_everything_then_cancel(**kwargs):
+        cancel.set()
+        return get_everything(**kwargs)
+
+    client.get_everything = get_everything_then_cancel
+    monkeypatch.setattr(news, "NewsApiClient", lambda **kwargs: client)
+
+    marks = watermarks.HighWaterMarks(str(tmp_path / "watermarks.json"))
+    marks.update("news:python", "2022-07-01T00:00:00")
+    pending = marks.pending()
+
+    df = news.get_latest_article_data(
+        "", "", "python", "key", watermarks=pending, cancel=cancel
+    )
+
+    assert len(client.calls) == 1 and len(df) == news.page_size
+    assert pending.get("news:python") == "2022-07-27T09:28:00"
+    assert marks.get("news:python") == "2022-07-01T00:00:00"
+    assert marks.get("news:python:gap") is None
+
+    pending.commit()
+    assert marks.get("news:python") == "2022-07-27T09:28:00"
+    assert marks.get("news:python:gap") == [
+        "2022-07-01T00:00:00",
+        "2022-07-15T15:09:26",
+    ]
+
+
+###############################################################################
+
+
+def test_parse_timestamp():
+    """
+    Run unit tests on news.parse_timestamp() and news.next_timestamp(). Publish
+    times with a Z suffix, fractional seconds of any length and UTC offsets
+    must all be read as UTC.
+    """
+
+    expected = datetime.datetime(2022, 7, 27, 17, 45, 30)
+    for published_at in [
+        "2022-07-27T17:45:30Z",
+        "2022-07-27T17:45:30.1Z",
+        "2022-07-27T17:45:30.12345Z",
+        "2022-07-27T17:45:30.123456789Z",
+        "2022-07-27T19:45:30+02:00",
+        "2022-07-27T12:15:30.5-0530",
+        "2022-07-27T17:45:30",
+    ]:
+        assert news.parse_timestamp(published_at) == expected
+
+    assert news.next_timestamp("2022-07-27T17:45:59.999Z") == "2022-07-27T17:46:00"
+
+    with pytest.raises(ValueError):
+        news.parse_timestamp("27/07/2022")
@@ -0,0 +1,83 @@
+"""
+
+    test_parquet_store.py
+
+    Description:
+
+        This module contains all unit tests for the parquet_store.py module in
+        the web_scraper package.
+
+    Functions:
+
+        test_append_and_read(prepare_article_data_output, tmp_path)
+        test_read_empty(tmp_path)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/prepare/")
+sys.path.append("web_scraper/store/")
+
+import datetime
+import parquet_store
+import prepare
+import pandas as pd
+
+###############################################################################
+
+
+def test_append_and_read(prepare_article_data_output, tmp_path):
+    """
+    Run unit tests on parquet_store.ArticleStore. Two runs appended to the
+    store must be read back with their types, partitioned by scrape date and
+    source, and readers must be able to select columns and filter rows.
+    """
+
+    # The read times the fixture leaves blank are estimated and the dates
+    # parsed, as the web scraper stores them.
+    df = prepare.prepare_read_time(prepare_article_data_output)
+    df = prepare.normalize_dates(df)
+    df["source"] = ["medium"] * 7 + ["news"] * 5
+
+    store = parquet_store.ArticleStore(str(tmp_path / "articles"))
+    written = store.append(df, scrape_date=datetime.date(2022, 8, 11))
+    store.append(df.iloc[:2], scrape_date=datetime.date(2022, 8, 12))
+
+    assert len(written) == 2
+    assert "scrape_date=2022-08-11/source=news/" in sorted(written)[1]
+    assert len(store) == 14
+
+    result = store.read()
+    assert str(result["publication"].dtype) == "category"
+    assert str(result["read_time"].dtype) == "int16"
+    assert isinstance(result["date"][0], datetime.date)
+
+    news = store.read(
+        columns=["url", "read_time"],
+        filters=[("source", "=", "news"), ("read_time", ">", 2)],
+    )
+    expected = df[(df["source"] == "news") & (df["read_time"] > 2)]
+    assert list(news.columns) == ["url", "read_time"]
+    assert sorted(news["url"]) == sorted(expected["url"])
+
+    latest = store.read(filters=[("scrape_date", "=", datetime.date(2022, 8, 12))])
+    assert sorted(latest["url"]) == sorted(df["url"][:2])
+
+
+###############################################################################
+
+
+def test_read_empty(tmp_path):
+    """
+    Run unit tests on parquet_store.ArticleStore. A store nothing was appended
+    to must read as an empty dataframe with the selected columns.
+    """
+
+    store = parquet_store.ArticleStore(str(tmp_path / "articles"))
+
+    assert len(store) == 0
+    assert store.append(pd.DataFrame()) == []
+    assert list(store.read(columns=["url"]).columns) == ["url"]
@@ -0,0 +1,235 @@
+"""
+
+    test_pipeline.py
+
+    Description:
+
+        This module contains all unit tests for the pipeline.py module in the
+        web_scraper package. The parse stage runs the real medium.py parser in
+        a process pool over the saved article page.
+
+    Functions:
+
+        test_fetch_and_parse()
+        test_fetch_and_parse_fetch_error()
+        failing_parse(page, url)
+        test_fetch_and_parse_parse_error()
+        test_get_latest_article_data_pipeline(monkeypatch)
+        test_get_latest_article_data_cancel(monkeypatch)
+        test_parse_errors_logged_from_workers()
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("logging/")
+sys.path.append("web_scraper/extract/")
+
+import io
+import json
+import logging
+import multiprocessing
+import pytest
+import threading
+import async_logging
+import medium
+import pipeline
+from records import ArticleRecords
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+###############################################################################
+
+with open("tests/test_files/medium_article.html", "r") as file:
+    article_html = file.read()
+
+###############################################################################
+
+
+def test_fetch_and_parse():
+    """
+    Run unit tests on pipeline.fetch_and_parse(). The results must be in the
+    same order as the URLs even though pages are fetched and parsed
+    concurrently, and must match parsing in the current process.
+    """
+
+    urls = [f"https://example.com/article-{i}" for i in range(12)]
+    parse = partial(medium.parse_article_page, publication="Publication")
+
+    results = pipeline.fetch_and_parse(
+        urls,
+        lambda url: article_html,
+        parse,
+        fetch_workers=4,
+        parse_workers=2,
+        queue_size=2,
+    )
+
+    assert results == [parse(article_html, url) for url in urls]
+
+
+###############################################################################
+
+
+def test_fetch_and_parse_fetch_error():
+    """
+    Run unit tests on pipeline.fetch_and_parse(). An error raised while
+    fetching must be raised by the pipeline once it has stopped.
+    """
+
+    def fetch(url):
+        if url.endswith("3"):
+            raise ConnectionError("connection reset")
+        return article_html
+
+    parse = partial(medium.parse_article_page, publication="Publication")
+    urls = [f"https://example.com/article-{i}" for i in range(5)]
+
+    with pytest.raises(ConnectionError):
+        pipeline.fetch_and_parse(urls, fetch, parse, parse_workers=2)
+
+
+###############################################################################
+
+
+def failing_parse(page: str, url: str):
+    raise ValueError(f"Could not parse {url}")
+
+
+###############################################################################
+
+
+def test_fetch_and_parse_parse_error():
+    """
+    Run unit tests on pipeline.fetch_and_parse(). An error raised while
+    parsing must be raised by the pipeline once the fetch threads have
+    stopped, without fetching the pages whose fetch had not started.
+    """
+
+    urls = [f"https://example.com/article-{i}" for i in range(100)]
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        return article_html
+
+    with pytest.raises(ValueError):
+        pipeline.fetch_and_parse(
+            urls, fetch, failing_parse, fetch_workers=4, parse_workers=2, queue_size=2
+        )
+
+    assert len(fetched) < len(urls)
+    assert not any(
+        thread.name.startswith("pipeline-fetch") for thread in threading.enumerate()
+    )
+
+
+###############################################################################
+
+
+def test_get_latest_article_data_pipeline(monkeypatch):
+    """
+    Run unit tests on medium.get_latest_article_data(). Parsing in the process
+    pool must return the same dataframe as parsing in the fetch threads, and
+    both must add every article to the provided records.
+    """
+
+    links = [f"https://host{i % 2}.com/article-{i}" for i in range(8)]
+    monkeypatch.setattr(medium, "get_latest_posts_links", lambda url, pub: links)
+    monkeypatch.setattr(medium.http_cache, "get_text", lambda url: article_html)
+
+    threaded_records = ArticleRecords()
+    threaded = medium.get_latest_article_data(
+        "", "Publication", "", max_workers=4, records=threaded_records
+    )
+    pipelined_records = ArticleRecords()
+    pipelined = medium.get_latest_article_data(
+        "", "Publication", "", max_workers=4, parse_workers=2, records=pipelined_records
+    )
+
+    assert threaded.shape == (8, 8)
+    assert pipelined.equals(threaded)
+    assert threaded_records.to_dataframe().equals(threaded)
+    assert sorted(pipelined_records.to_dataframe()["url"]) == sorted(threaded["url"])
+
+
+###############################################################################
+
+
+def test_get_latest_article_data_cancel(monkeypatch):
+    """
+    Run unit tests on medium.get_latest_article_data(). Once the cancellation
+    event is set no more articles must be fetched, in the fetch threads and
+    in the pipeline, and the articles collected until then must be returned.
+    """
+
+    links = [f"https://host{i % 2}.com/article-{i}" for i in range(100)]
+    monkeypatch.setattr(medium, "get_latest_posts_links", lambda url, pub: links)
+
+    for parse_workers in (0, 2):
+        cancel = threading.Event()
+        fetched = []
+
+        def fetch(url):
+            fetched.append(url)
+            if len(fetched) == 5:
+                cancel.set()
+            return article_html
+
+        monkeypatch.setattr(medium.http_cache, "get_text", fetch)
+        df = medium.get_latest_article_data(
+            "",
+            "Publication",
+            "",
+            max_workers=2,
+            max_per_host=1,
+            parse_workers=parse_workers,
+            cancel=cancel,
+        )
+
+        assert 5 <= len(fetched) < 10
+        assert len(df) <= len(fetched)
+
+
+###############################################################################
+
+
+def test_parse_errors_logged_from_workers(monkeypatch):
+    """
+    Run unit tests on medium.parse_article_page(). A page that cannot be
+    parsed in a worker set up with async_logging.configure_worker() must be
+    logged by the listener of the main process, with the source passed in.
+    """
+
+    stream = io.StringIO()
+    scraper_logger = logging.getLogger("webScraper")
+    monkeypatch.setattr(scraper_logger, "handlers", [logging.StreamHandler(stream)])
+    monkeypatch.setattr(scraper_logger, "propagate", False)
+    scraper_logger.setLevel(logging.INFO)
+
+    async_logging.start_queue_listener(["webScraper"])
+    parse = partial(
+        medium.parse_article_page, publication="Publication", source="Medium (row 0)"
+    )
+    try:
+        with ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=async_logging.configure_worker,
+            initargs=(async_logging.get_worker_queue(),),
+        ) as executor:
+            assert (
+                executor.submit(parse, "<html></html>", "https://a.com/1").result()
+                is None
+            )
+    finally:
+        async_logging.stop_queue_listener()
+
+    (record,) = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert record["logger"] == "webScraper.medium"
+    assert record["source"] == "Medium (row 0)"
+    assert record["url"] == "https://a.com/1"
+    assert record["stage"] == "parse"
+    assert record["process"] != "MainProcess"
@@ -10,9 +10,14 @@
     Functions:
 
         test_prepare_text_data()
+        test_clean_text()
         test_normalize_dates()
+        test_normalize_dates_year_rollover()
         test_prepare_read_time()
+        test_prepare_read_time_estimate()
+        test_count_words()
         test_prepare_article_data()
+        test_prepare_article_data_file()
 
 """
 
@@ -24,8 +29,11 @@ sys.path.append("web_scraper/prepare/")
 
 # import pytest
 import prepare
+import datetime
+import unicodedata
 
-# import pandas as pd
+import numpy as np
+import pandas as pd
 
 ###############################################################################
 
@@ -56,13 +64,70 @@ def test_prepare_text_data(prepare_text_data_input, prepare_text_data_output):
 ###############################################################################
 
 
+def test_clean_text():
+    """
+    Run unit tests on prepare.clean_text(). The fused implementation must give
+    exactly the same result as applying each preparation step separately,
+    including for characters whose normalized form is uppercase or contains
+    punctuation.
+    """
+
+    strings = [
+        "AI Can Now Play Minecraft — A Step Closer",
+        "DALL·E 2 isn’t\nopen-ended… [+794 chars]",
+        "ℌello ﬁle Ⅻ ① Ǆ ½ café naïve",
+        "C++ & C# <ul><li>tabs\tand\r\nreturns</li></ul>",
+        "",
+    ]
+
+    for string in strings:
+        expected = (
+            unicodedata.normalize("NFKD", string.lower())
+            .encode("ascii", "ignore")
+            .decode("utf-8", "ignore")
+        )
+        expected = prepare.remove_special_characters(
+            prepare.replace_newline(prepare.replace_dash(expected))
+        )
+
+        assert prepare.clean_text(string) == expected
+
+
+###############################################################################
+
+
 def test_normalize_dates(normalize_dates_input, normalize_dates_output):
     """
     Run unit tests on prepare.normalize_dates(). Each test will compare the
-    output to the expected output and check for an exact match.
+    output to the expected output and check for an exact match. The expected
+    output was created in 2022, so dates without a year are normalized as if
+    they were scraped at the end of 2022.
+    """
+
+    assert prepare.normalize_dates(
+        normalize_dates_input, reference_date=datetime.date(2022, 12, 31)
+    ).equals(normalize_dates_output)
+
+
+###############################################################################
+
+
+def test_normalize_dates_year_rollover():
+    """
+    Run unit tests on prepare.normalize_dates(). Dates without a year that
+    would fall after the reference date belong to the previous year, such as
+    December articles scraped in January.
     """
 
-    assert prepare.normalize_dates(normalize_dates_input).equals(normalize_dates_output)
+    df = pd.DataFrame({"date": ["Dec 30", "Jan 3", "Dec 30, 2020", "Jan 6"]})
+    df = prepare.normalize_dates(df, reference_date=datetime.date(2023, 1, 5))
+
+    assert df["date"].tolist() == [
+        datetime.date(2022, 12, 30),
+        datetime.date(2023, 1, 3),
+        datetime.date(2020, 12, 30),
+        datetime.date(2023, 1, 6),
+    ]
 
 
 ###############################################################################
@@ -82,12 +147,108 @@ def test_prepare_read_time(prepare_read_time_input, prepare_read_time_output):
 ###############################################################################
 
 
+def test_prepare_read_time_estimate():
+    """
+    Run unit tests on prepare.prepare_read_time(). Articles without a read
+    time must get one estimated from the words in their text columns,
+    including the characters the News API truncated, and never less than a
+    minute.
+    """
+
+    words = " ".join(["word"] * 265)
+    df = pd.DataFrame(
+        {
+            "title": ["A title", "A title", None],
+            "subtitle": ["", "", None],
+            "article_intro": [words, f"{words} … [+1590 chars]", None],
+            "read_time": [np.NaN, np.NaN, np.NaN],
+        }
+    )
+    df = prepare.prepare_read_time(df)
+
+    assert df["read_time"].dtype == "int16"
+    assert df["read_time"].tolist() == [2, 3, 1]
+
+
+###############################################################################
+
+
+def test_count_words():
+    """
+    Run unit tests on prepare.count_words(). Words must be counted as
+    str.split() counts them, including words in CJK characters and emoji and
+    words separated by the ideographic space.
+    """
+
+    text = pd.Series(
+        ["hello world", "word😀word", "日本語 の 記事", "x\u3000y", " \u3000 ", ""]
+    )
+
+    assert prepare.count_words(text).tolist() == [len(t.split()) for t in text]
+    assert prepare.count_words(text).tolist() == [2, 1, 3, 2, 0, 0]
+
+
+###############################################################################
+
+
 def test_prepare_article_data(prepare_article_data_input, prepare_article_data_output):
     """
-    Run unit tests on prepare.prepare_article_data(). Each test will compare
-    the output to the expected output and check for an exact match.
+    Run unit tests on prepare.prepare_article_data(). The columns the stages
+    prepare must match the expected output. The throughput of every stage
+    must be recorded in stats.
+    """
+
+    stats = {}
+    result = prepare.prepare_article_data(
+        prepare_article_data_input,
+        reference_date=datetime.date(2022, 12, 31),
+        stats=stats,
+    )
+    expected = prepare_article_data_output
+
+    # The expected output leaves the read time of the News API articles
+    # blank, they are estimated, and its text columns also expect the News
+    # API markup removed from the article content, which is not a stage of
+    # the preparation, so only the titles are compared of the text columns.
+    for column in ["author", "publication", "title", "url"]:
+        assert result[column].equals(expected[column])
+    assert result["date"].astype(str).equals(expected["date"])
+
+    known = expected["read_time"].notna()
+    assert (result["read_time"][known] == expected["read_time"][known]).all()
+    assert (result["read_time"][~known] >= 1).all()
+    assert str(result["read_time"].dtype) == "int16"
+
+    assert [name for name, _ in prepare.article_data_stages()] == list(stats)
+    assert all(rows == len(result) for rows, _ in stats.values())
+
+
+###############################################################################
+
+
+def test_prepare_article_data_file(tmp_path):
+    """
+    Run unit tests on prepare.prepare_article_data_file(). Preparing the file
+    in chunks smaller than the file, in place, must give the same result as
+    preparing the whole dataframe at once.
     """
 
-    assert prepare.prepare_article_data(prepare_article_data_input).equals(
-        prepare_article_data_output
+    source = tmp_path / "collected_data.csv"
+    data = pd.read_csv("tests/test_files/prepare_article_data_input.csv")
+    data.to_csv(source, index=False)
+
+    expected = tmp_path / "expected.csv"
+    prepare.prepare_article_data(
+        data, reference_date=datetime.date(2022, 12, 31)
+    ).to_csv(expected, index=False)
+
+    rows = prepare.prepare_article_data_file(
+        str(source),
+        str(source),
+        chunksize=5,
+        reference_date=datetime.date(2022, 12, 31),
     )
+
+    assert rows == 12
+    assert pd.read_csv(source).equals(pd.read_csv(expected))
+    assert not (tmp_path / "collected_data.csv.tmp").exists()
@@ -0,0 +1,61 @@
+"""
+
+    test_records.py
+
+    Description:
+
+        This module contains all unit tests for the records.py module in the
+        web_scraper package.
+
+    Functions:
+
+        test_article_records()
+        test_article_records_empty()
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/extract/")
+
+import records
+import pandas as pd
+
+###############################################################################
+
+
+def test_article_records():
+    """
+    Run unit tests on records.ArticleRecords. Records added one at a time and
+    several at a time must end up in the dataframe in the order they were
+    added, with the columns in the order of the first record.
+    """
+
+    article_records = records.ArticleRecords()
+    article_records.append({"title": "first", "read_time": 4})
+    article_records.extend({"read_time": [3, 2], "title": ["second", "third"]})
+
+    expected = pd.DataFrame(
+        {"title": ["first", "second", "third"], "read_time": [4, 3, 2]}
+    )
+
+    assert len(article_records) == 3
+    assert article_records.to_dataframe().equals(expected)
+
+
+###############################################################################
+
+
+def test_article_records_empty():
+    """
+    Run unit tests on records.ArticleRecords. A builder with no records must
+    still produce a dataframe with the columns it was given.
+    """
+
+    article_records = records.ArticleRecords(["title", "url"])
+
+    assert len(article_records) == 0
+    assert list(article_records.to_dataframe().columns) == ["title", "url"]
+    assert records.ArticleRecords().to_dataframe().shape == (0, 0)
@@ -0,0 +1,122 @@
+"""
+
+    test_scheduler.py
+
+    Description:
+
+        This module contains all unit tests for the scheduler.py module in the
+        web_scraper package.
+
+    Functions:
+
+        test_run_sources()
+        test_run_sources_isolates_failures()
+        test_label_source()
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/extract/")
+
+import threading
+import metrics
+import scheduler
+import pandas as pd
+
+###############################################################################
+
+
+def test_run_sources():
+    """
+    Run unit tests on scheduler.run_sources(). The sources run concurrently,
+    so three sources that each wait until all three have started must all
+    complete. The dataframes must be returned in the same order as the
+    sources.
+    """
+
+    started = threading.Barrier(3, timeout=5)
+
+    def source(value, records, cancel):
+        started.wait()
+        return pd.DataFrame({"url": [value]})
+
+    sources = [
+        (str(i), lambda records, cancel, i=i: source(i, records, cancel), 5)
+        for i in range(3)
+    ]
+
+    frames, failures = scheduler.run_sources(sources)
+
+    assert failures == {}
+    assert [frame["url"][0] for frame in frames] == [0, 1, 2]
+
+
+###############################################################################
+
+
+def test_run_sources_isolates_failures():
+    """
+    Run unit tests on scheduler.run_sources(). A source that raises an error
+    and a source that runs past its timeout must both be reported as failures
+    without affecting the result of the source that completed, and recorded
+    in the metrics. The articles the timed out source collected before its
+    timeout must be kept, and the source must be cancelled.
+    """
+
+    stopped = threading.Event()
+
+    def failing(records, cancel):
+        raise ValueError("bad response")
+
+    def slow(records, cancel):
+        records.append({"url": "partial"})
+        if cancel.wait(5):
+            stopped.set()
+            return records.to_dataframe()
+        records.append({"url": "late"})
+        return records.to_dataframe()
+
+    sources = [
+        ("failing", failing, 5),
+        ("slow", slow, 0.2),
+        ("ok", lambda records, cancel: pd.DataFrame({"url": ["ok"]}), 5),
+    ]
+
+    metrics.registry.reset()
+    frames, failures = scheduler.run_sources(sources)
+
+    assert stopped.wait(5)
+    assert [frame["url"].tolist() for frame in frames] == [["partial"], ["ok"]]
+    assert "ValueError: bad response" in failures["failing"]
+    assert failures["slow"].startswith("Timed out")
+
+    # The rows, errors and timeouts are recorded per source.
+    counters = metrics.registry.counters
+    assert counters[("rows_produced_total", (("source", "ok"),))] == 1
+    assert counters[("rows_produced_total", (("source", "slow"),))] == 1
+    assert counters[("source_errors_total", (("source", "failing"),))] == 1
+    assert counters[("source_timeouts_total", (("source", "slow"),))] == 1
+
+
+###############################################################################
+
+
+def test_label_source():
+    """
+    Run unit tests on scheduler.label_source(). The source and topic columns
+    must be added to the returned dataframe and to the records the source
+    adds its articles to.
+    """
+
+    def collect(records=None, cancel=None):
+        records.append({"url": "a"})
+        return records.to_dataframe()[["url"]]
+
+    records = scheduler.ArticleRecords()
+    df = scheduler.label_source(collect, "medium", "python", records)
+
+    expected = [["a", "medium", "python"]]
+    assert df.values.tolist() == records.to_dataframe().values.tolist() == expected
@@ -0,0 +1,78 @@
+"""
+
+    test_scoring.py
+
+    Description:
+
+        This module contains all unit tests for the scoring.py and model.py
+        modules in the recommender package.
+
+    Functions:
+
+        test_top_k()
+        test_score_articles(tmp_path)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("recommender/")
+
+import numpy as np
+import scipy.sparse as sparse
+
+import scoring
+from ann_index import embed
+from model import LinearModel
+
+###############################################################################
+
+
+def test_top_k():
+    """
+    Run unit tests on scoring.top_k(). The selected articles of each user must
+    match those of a full sort, best first, and k larger than the number of
+    articles must select every article.
+    """
+
+    scores = np.random.default_rng(0).random((1000, 5), dtype=np.float32)
+    positions, selected = scoring.top_k(scores, 10)
+
+    expected = np.argsort(-scores, axis=0)[:10]
+    assert (positions == expected).all()
+    assert (selected == np.take_along_axis(scores, expected, axis=0)).all()
+
+    positions, _ = scoring.top_k(scores[:3], 10)
+    assert positions.shape == (3, 5)
+
+
+###############################################################################
+
+
+def test_score_articles(tmp_path):
+    """
+    Run unit tests on scoring.score_articles(). Scoring in batches must select
+    the same articles as scoring all articles at once, with a model saved and
+    loaded again.
+    """
+
+    rng = np.random.default_rng(0)
+    features = sparse.random(2000, 300, density=0.05, format="csr", random_state=0)
+    embeddings = embed(features)
+    model = LinearModel(rng.normal(size=(128, 4)), rng.normal(size=4), list("abcd"))
+
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    model = LinearModel.load(path)
+
+    assert model.users == list("abcd")
+
+    positions, scores = scoring.score_articles(model, embeddings, k=7, batch_size=300)
+    expected, _ = scoring.top_k(model.score(embeddings), 7)
+
+    assert (positions == expected).all()
+    assert np.allclose(
+        scores, np.take_along_axis(model.score(embeddings), expected, axis=0)
+    )
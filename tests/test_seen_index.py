@@ -0,0 +1,83 @@
+"""
+
+    test_seen_index.py
+
+    Description:
+
+        This module contains all unit tests for the seen_index.py module in the
+        web_scraper package.
+
+    Functions:
+
+        test_canonicalize_url()
+        test_seen_url_index(tmp_path)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("web_scraper/extract/")
+
+import seen_index
+
+###############################################################################
+
+
+def test_canonicalize_url():
+    """
+    Run unit tests on seen_index.canonicalize_url(). URLs that only differ in
+    their tracking source or parameters, fragment, trailing slash or the case
+    of the host must have the same canonical form.
+    """
+
+    expected = "https://towardsdatascience.com/an-article-1f19cfe37ef"
+
+    assert seen_index.canonicalize_url(expected) == expected
+    assert (
+        seen_index.canonicalize_url(
+            "https://TowardsDataScience.com/an-article-1f19cfe37ef/?source=collection"
+        )
+        == expected
+    )
+    assert seen_index.canonicalize_url(expected + "#section") == expected
+    assert (
+        seen_index.canonicalize_url(
+            expected + "?utm_source=newsletter&id=7&fbclid=abc&UTM_MEDIUM=email"
+        )
+        == expected + "?id=7"
+    )
+
+
+###############################################################################
+
+
+def test_seen_url_index(tmp_path):
+    """
+    Run unit tests on seen_index.SeenUrlIndex. URLs that were added must be
+    found both before and after the index is saved and loaded again, and
+    URLs added again must only be counted once.
+    """
+
+    path = str(tmp_path / "seen-urls.npy")
+    urls = [f"https://example.com/article-{i}" for i in range(1000)]
+
+    index = seen_index.SeenUrlIndex(path)
+    assert not index.contains(urls).any()
+
+    index.add(urls[:500])
+    assert index.contains(urls).sum() == 500
+    index.save()
+
+    index = seen_index.SeenUrlIndex(path)
+    index.add(urls[500:600])
+    index.add(urls[450:550])
+
+    assert len(index) == 600
+    assert index.contains(urls[:600]).all()
+    assert not index.contains(urls[600:]).any()
+    assert urls[0] + "?source=home" in index
+
+    index.save()
+    assert len(seen_index.SeenUrlIndex(path)) == 600
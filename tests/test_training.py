@@ -0,0 +1,196 @@
+"""
+
+    test_training.py
+
+    Description:
+
+        This module contains all unit tests for the training.py module in the
+        recommender package.
+
+    Functions:
+
+        topic_embeddings(rng, topics, count)
+        test_fit()
+        test_partial_fit()
+        test_model_registry(tmp_path, monkeypatch)
+        test_update_model(prepare_article_data_output, tmp_path)
+
+"""
+
+###############################################################################
+
+import sys
+
+sys.path.append("recommender/")
+sys.path.append("web_scraper/extract/")
+sys.path.append("web_scraper/prepare/")
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+
+import training
+from ann_index import embed
+from features import FeatureStore
+from model import LinearModel
+
+###############################################################################
+
+
+def topic_embeddings(rng, topics: np.ndarray, count: int = 10):
+    """
+    Returns the embeddings of articles on the provided topics, whose sparse
+    features use a block of 10 columns out of 100 for each topic.
+    """
+
+    columns = topics[:, None] * 10 + rng.integers(0, 10, (len(topics), count))
+    rows = np.repeat(np.arange(len(topics)), count)
+    features = sparse.csr_matrix(
+        (np.ones(rows.size, dtype=np.float32), (rows, columns.ravel())),
+        shape=(len(topics), 100),
+    )
+    norms = np.sqrt(np.asarray(features.multiply(features).sum(axis=1))).ravel()
+    return embed(sparse.diags(1 / norms).dot(features).tocsr())
+
+
+###############################################################################
+
+
+def test_fit():
+    """
+    Run unit tests on training.fit(). Two users interested in different
+    topics must each be predicted to like the articles of their own topic.
+    """
+
+    rng = np.random.default_rng(0)
+    topics = rng.integers(0, 2, 400)
+    users = np.tile([0, 1], 200)
+    embeddings = topic_embeddings(rng, topics)
+
+    model = training.fit(["a", "b"], embeddings, users, topics == users)
+    predictions = training.predict(model, embeddings, users) > 0.5
+
+    assert model.users == ["a", "b"]
+    assert (predictions == (topics == users)).mean() > 0.95
+    assert training.log_loss(model, embeddings, users, topics == users) < 0.3
+
+
+###############################################################################
+
+
+def test_partial_fit():
+    """
+    Run unit tests on training.partial_fit() and training.user_positions().
+    Updates must lower the loss on the labels, and new users must be added
+    with zero weights.
+    """
+
+    rng = np.random.default_rng(1)
+    model = LinearModel(np.zeros((128, 1)), np.zeros(1), ["a"])
+
+    positions = training.user_positions(model, pd.Series(["b", "a", "b"]))
+    assert positions.tolist() == [1, 0, 1]
+    assert model.users == ["a", "b"] and model.weights.shape == (128, 2)
+
+    topics = rng.integers(0, 2, 200)
+    users = np.zeros(200, dtype=np.int64)
+    embeddings = topic_embeddings(rng, topics)
+
+    loss = training.log_loss(model, embeddings, users, topics)
+    for _ in range(3):
+        training.partial_fit(model, embeddings, users, topics)
+        updated_loss = training.log_loss(model, embeddings, users, topics)
+        assert updated_loss < loss
+        loss = updated_loss
+
+    assert (model.weights[:, 1] == 0).all()
+
+
+###############################################################################
+
+
+def test_model_registry(tmp_path, monkeypatch):
+    """
+    Run unit tests on training.ModelRegistry. Each published model must get
+    the next version, old snapshots must be removed, and drift must be
+    measured against the losses since the last full retrain.
+    """
+
+    monkeypatch.setattr(training, "snapshots_kept", 2)
+    registry = training.ModelRegistry(str(tmp_path))
+    assert registry.load() is None
+
+    model = LinearModel(np.zeros((128, 1)), np.zeros(1), ["a"])
+    registry.publish(model, full_retrain=True)
+    registry.publish(model, 0.4)
+    registry.publish(model, 0.6)
+
+    registry = training.ModelRegistry(str(tmp_path))
+    assert registry.load().version == 3
+    assert registry.load(2).version == 2
+    assert [path[-10:] for path in registry.snapshots()] == [
+        "000002.npz",
+        "000003.npz",
+    ]
+    assert np.isclose(registry.drift(0.75), 0.5)
+
+    registry.publish(model, 0.6, full_retrain=True)
+    assert registry.drift(0.75) == 0
+
+    # A model with a weight per TF-IDF feature is retrained.
+    registry.publish(LinearModel(np.zeros((10, 1)), np.zeros(1), ["a"]))
+    assert registry.load() is None
+
+
+###############################################################################
+
+
+def test_update_model(prepare_article_data_output, tmp_path):
+    """
+    Run unit tests on training.update_model(). The first feedback must train
+    a model from scratch, consistent feedback must update it, and feedback
+    contradicting what the model learned must trigger a full retrain on
+    every label. Feedback that was already applied must be skipped.
+    """
+
+    df = prepare_article_data_output
+    store = FeatureStore(str(tmp_path / "features"), n_features=2**12)
+    store.add(df)
+
+    registry = training.ModelRegistry(str(tmp_path / "model"))
+    labels_file = str(tmp_path / "labels.csv")
+    feedback = pd.DataFrame(
+        {
+            "user": "a",
+            "url": df["url"],
+            "label": np.arange(len(df)) % 2,
+            "row": np.arange(len(df)) + 1,
+        }
+    )
+
+    model = training.update_model(registry, store, feedback.iloc[:8], labels_file, None)
+    assert model.version == 1 and registry.state["losses"] == []
+
+    model = training.update_model(registry, store, feedback.iloc[8:], labels_file, None)
+    assert model.version == 2 and len(registry.state["losses"]) == 1
+
+    flipped = feedback.assign(
+        label=1 - feedback["label"], row=feedback["row"] + len(df)
+    )
+    model = training.update_model(registry, store, flipped, labels_file, None)
+    assert model.version == 3 and registry.state["losses"] == []
+    assert registry.state["feedback_row"] == 2 * len(df)
+    assert len(pd.read_csv(labels_file)) == 2 * len(df)
+
+    # A later run passing the same feedback again changes nothing.
+    both = pd.concat([feedback, flipped])
+    model = training.update_model(registry, store, both, labels_file, None)
+    assert model.version == 3 and registry.state["losses"] == []
+    assert len(pd.read_csv(labels_file)) == 2 * len(df)
+    assert training.ModelRegistry(str(tmp_path / "model")).state == registry.state
+
+    # The retrained model learned the latest label of each article.
+    users = np.zeros(len(df), dtype=np.int64)
+    features, _ = store.load()
+    predictions = training.predict(model, embed(features), users) > 0.5
+    assert (predictions == flipped["label"].astype(bool)).all()
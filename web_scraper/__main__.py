@@ -25,31 +25,124 @@ import sys
 
 sys.path.append("logging")
 sys.path.append("modules")
+sys.path.append("recommender")
 sys.path.append("web_scraper/extract")
+sys.path.append("web_scraper/ingest")
 sys.path.append("web_scraper/prepare")
+sys.path.append("web_scraper/store")
 
+import datetime
+import imaplib
 import os
 import logging
 import pandas as pd
 import traceback
 
+from functools import partial
+
+import http_cache
 import medium
+import metrics
 import news
-
-# import prepare
-
+import pipeline
+import scheduler
+from seen_index import SeenUrlIndex
+from watermarks import HighWaterMarks
+
+import prepare
+import dedup
+import email_ingest
+from features import FeatureStore
+from parquet_store import ArticleStore
+from database import ArticleDatabase
+from preferences import PreferenceStore
+from ann_index import AnnIndex, embed
+
+import async_logging
 from configure_logger import configure_logger
-from env import email_address, news_api_key
+from env import email_address, email_password, imap_server, news_api_key
 
 ###############################################################################
 
-functions = {"medium": medium.get_latest_article_data}
+# The number of threads used to fetch the articles of a single medium
+# publication and the maximum number of requests in flight to a single host.
+# Setting medium_max_workers to 1 fetches the articles sequentially.
+medium_max_workers = 8
+medium_max_per_host = 4
+
+# The number of processes that parse the fetched medium articles, shared by
+# all publications. Setting medium_parse_workers to 0 parses each article in
+# the thread that fetched it.
+medium_parse_workers = max(1, (os.cpu_count() or 2) - 1)
+
+functions = {
+    "medium": partial(
+        medium.get_latest_article_data,
+        max_workers=medium_max_workers,
+        max_per_host=medium_max_per_host,
+        parse_workers=medium_parse_workers,
+    )
+}
 
 functions_with_api_key = {
     "news": {"function": news.get_latest_article_data, "api_key": news_api_key}
 }
 
-destination_file = "data/collected_data.csv"
+# The Parquet dataset each run appends its prepared article data to.
+article_store_directory = "data/articles"
+
+# The SQLite database the article recommender queries the articles from.
+database_file = "data/articles.db"
+
+# The CSV file earlier versions overwrote with the article data of each run.
+legacy_data_file = "data/collected_data.csv"
+
+# The index of the URLs of all articles collected so far.
+seen_urls_file = "data/seen-urls.npy"
+
+# The index of the content of all articles kept so far.
+duplicate_index_file = "data/duplicate-index.npz"
+
+# The directory the TF-IDF features of the articles are stored in.
+feature_store_directory = "data/features"
+
+# The approximate nearest neighbor index of the article embeddings.
+ann_index_directory = "data/ann-index"
+
+# The high-water marks of the sources that support incremental collection,
+# and of the emails already ingested.
+watermarks_file = "data/watermarks.json"
+
+# The website dataset and the store of the users' settings and preferences,
+# both updated from the commands users send in by email.
+sites_file = "data/site-and-api-data.csv"
+preferences_file = "data/preferences.db"
+
+# The name the receiving mail server gives itself in the
+# Authentication-Results headers it adds, mx.google.com for Gmail. Source
+# commands are only accepted from the owner when that server verified them.
+mail_authserv_id = "mx.google.com"
+
+# The directory and maximum size of the on-disk cache of fetched pages.
+http_cache_directory = "data/http-cache"
+http_cache_max_bytes = 512 * 1024**2
+
+# Whether log calls only queue their records, which a background thread
+# writes as JSON, so the sources running concurrently and the workers of the
+# parse process pool do not wait on the log file.
+asynchronous_logging = True
+
+# The number of seconds each source is given to collect its article data. A
+# source can be given its own budget with a timeout column in the website
+# dataset.
+source_timeout = 300
+
+# The directory the JSON summary of the metrics of each run is written to,
+# and the file the metrics are written to for the textfile collector of the
+# Prometheus node exporter, e.g. /var/lib/node_exporter/web_scraper.prom. No
+# Prometheus file is written when it is None.
+metrics_directory = "data/metrics"
+prometheus_textfile = None
 
 ###############################################################################
 
@@ -59,36 +152,193 @@ if __name__ == "__main__":
         # Configure the logger using the configure_logger module. If the
         # configuration was successful use the webScraper logger for this
         # script.
-        logger_configured_successfully = configure_logger()
+        logger_configured_successfully = configure_logger(
+            asynchronous=asynchronous_logging
+        )
         logger = None
         if logger_configured_successfully:
             logger = logging.getLogger("webScraper")
 
-        # TODO read new emails for updates
+        # The workers of the parse process pool log to the same queue.
+        worker_queue = async_logging.get_worker_queue()
+        if worker_queue is not None:
+            pipeline.process_initializer = async_logging.configure_worker
+            pipeline.process_initargs = (worker_queue,)
+
+        # Apply the commands of the emails received since the last run to the
+        # website dataset and the preference store. The mailbox being down
+        # does not stop the scrape, which runs with the sources as they are
+        # and picks the emails up in the next run.
+        watermarks = HighWaterMarks(watermarks_file)
+        preferences = PreferenceStore(preferences_file)
+        try:
+            with metrics.timer("stage_seconds", stage="ingest"):
+                with imaplib.IMAP4_SSL(imap_server) as imap:
+                    imap.login(email_address, email_password)
+                    email_ingest.ingest(
+                        imap,
+                        preferences,
+                        sites_file,
+                        watermarks,
+                        email_address,
+                        logger=logger,
+                        authserv_id=mail_authserv_id,
+                    )
+        except Exception as error:
+            metrics.increment("stage_errors_total", stage="ingest")
+            error_message = "".join(
+                traceback.format_exception(None, error, error.__traceback__)
+            )
+            message = f"Could not ingest the emails, continuing without them.\n{error_message}"
+            if logger_configured_successfully:
+                logger.error(message, extra={"stage": "ingest"})
+            else:
+                print(message)
+        finally:
+            preferences.close()
+        watermarks.save()
+
+        # Serve pages that have not changed since the last run from the cache.
+        cache = http_cache.enable(http_cache_directory, http_cache_max_bytes)
+
+        # Load the index of articles collected in previous runs so that only
+        # new articles are fetched. The first time the index is used it is
+        # seeded with the articles already in the store, or in the collected
+        # data file of earlier versions.
+        article_store = ArticleStore(article_store_directory)
+        seen_urls = SeenUrlIndex(seen_urls_file)
+        if not len(seen_urls) and len(article_store):
+            seen_urls.add(article_store.read(columns=["url"])["url"])
+        elif not len(seen_urls) and os.path.exists(legacy_data_file):
+            seen_urls.add(pd.read_csv(legacy_data_file, usecols=["url"])["url"])
+
+        # Load the index of the content of the articles kept so far, used to
+        # remove articles that duplicate one from an earlier run.
+        duplicate_index = dedup.DuplicateIndex(duplicate_index_file)
 
         # Pull all the latest articles from each website and API in the
-        # database.
-        sites_and_apis = pd.read_csv("data/site-and-api-data.csv")
-        article_data = pd.DataFrame()
+        # database. Every source runs concurrently with its own timeout budget
+        # and the results of the sources that completed are merged, along
+        # with the articles the sources that timed out collected so far. The
+        # high-water marks a source raises are held back until it completes,
+        # so the articles a failed or timed out source did not collect are
+        # requested again by the next run.
+        sites_and_apis = pd.read_csv(sites_file)
+        sources = []
+        pending_marks = {}
         for index, row in sites_and_apis.iterrows():
+            name = f"{row['name']} (row {index})"
 
             # If the data collection module requires an API key.
             if row["class"] in functions_with_api_key:
                 api_key = functions_with_api_key[row["class"]]["api_key"]
-                df = functions_with_api_key[row["class"]]["function"](
-                    row["url"], row["name"], row["topic"], api_key
+                pending_marks[name] = watermarks.pending()
+                function = partial(
+                    functions_with_api_key[row["class"]]["function"],
+                    row["url"],
+                    row["name"],
+                    row["topic"],
+                    api_key,
+                    seen=seen_urls,
+                    watermarks=pending_marks[name],
                 )
-                article_data = pd.concat([article_data, df]).reset_index(drop=True)
 
             # If the data collection module does not require an API key.
             else:
-                df = functions[row["class"]](row["url"], row["name"], row["topic"])
-                article_data = pd.concat([article_data, df]).reset_index(drop=True)
-            # pass
+                function = partial(
+                    functions[row["class"]],
+                    row["url"],
+                    row["name"],
+                    row["topic"],
+                    seen=seen_urls,
+                )
 
-        # prepare.prepare_article_data(article_data)
+            timeout = row.get("timeout", source_timeout)
+            if pd.isna(timeout):
+                timeout = source_timeout
 
-        article_data.to_csv(destination_file, index=False)
+            function = partial(
+                scheduler.label_source, function, row["class"], row["topic"]
+            )
+            sources.append((name, function, timeout))
+
+        with metrics.timer("stage_seconds", stage="extract"):
+            frames, failures = scheduler.run_sources(sources, logger)
+        for name, marks in pending_marks.items():
+            if name not in failures:
+                marks.commit()
+        article_data = pd.concat([pd.DataFrame(), *frames]).reset_index(drop=True)
+
+        # Record the collected articles so they are skipped in the next run,
+        # including the ones removed as duplicates below.
+        if len(article_data):
+            seen_urls.add(article_data["url"])
+
+        # Prepare the collected article data, removing the articles that
+        # duplicate one collected before, and log the throughput of each
+        # stage of the preparation.
+        if len(article_data):
+            stats = {}
+            stages = prepare.article_data_stages() + [
+                (
+                    "dedup",
+                    partial(dedup.deduplicate, index=duplicate_index, logger=logger),
+                )
+            ]
+            article_data = prepare.prepare_article_data(
+                article_data, stages=stages, stats=stats
+            )
+            prepare.log_stage_throughput(stats, logger)
+
+            for name, (rows, seconds) in stats.items():
+                metrics.increment("prepare_rows_total", rows, stage=name)
+                metrics.increment("prepare_seconds_total", seconds, stage=name)
+
+        metrics.increment("articles_stored_total", len(article_data))
+
+        # Append the articles of this run to the store, partitioned by the
+        # date they were scraped on and their source.
+        with metrics.timer("stage_seconds", stage="store"):
+            article_store.append(article_data)
+
+            # Insert the new articles into the database, or update the ones
+            # that were collected before.
+            database = ArticleDatabase(database_file)
+            database.upsert(article_data)
+            database.close()
+
+        # Vectorize only the articles collected in this run. The features of
+        # earlier runs are kept as they are.
+        with metrics.timer("stage_seconds", stage="features"):
+            feature_store = FeatureStore(feature_store_directory)
+            shard = feature_store.add(article_data)
+
+            # Embed the new articles and insert them into the index the
+            # recommender finds similar articles with.
+            if shard:
+                features, ids = feature_store.load([shard])
+                AnnIndex(ann_index_directory).add(ids, embed(features))
+
+        # Persist the indexes used to skip and deduplicate articles.
+        seen_urls.save()
+        duplicate_index.save()
+        watermarks.save()
+
+        # Persist the cache index and report how much the cache saved.
+        cache.save()
+        if logger_configured_successfully:
+            logger.info(cache.report())
+
+        # Write the metrics of the run, one summary file per run so they can
+        # be compared over time.
+        run_time = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+        metrics.registry.write_json(
+            os.path.join(metrics_directory, f"run-{run_time}.json"),
+            status="completed",
+            failures=failures,
+        )
+        if prometheus_textfile:
+            metrics.registry.write_prometheus(prometheus_textfile)
 
         # If the logger  was configured successfully log that execution of the
         # web scraper script completed.
@@ -122,3 +372,13 @@ if __name__ == "__main__":
             f'echo {message + error_message} | mail -s "Article Recommender \
                 Web Scraper Error" {email_address}'
         )
+
+        # Write the metrics recorded until the error occurred.
+        run_time = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+        metrics.registry.write_json(
+            os.path.join(metrics_directory, f"run-{run_time}.json"),
+            status="failed",
+            error=error_message,
+        )
+        if prometheus_textfile:
+            metrics.registry.write_prometheus(prometheus_textfile)
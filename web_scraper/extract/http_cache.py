@@ -0,0 +1,282 @@
+"""
+
+    http_cache.py
+
+    Description:
+
+        This module contains an on-disk HTTP cache for pages fetched by the
+        extract modules. The body of each cached page is stored along with
+        the ETag and Last-Modified headers of the response. The next time the
+        page is requested a conditional request is sent, and if the server
+        responds with 304 Not Modified the page is served from disk instead of
+        being downloaded again. The cache is limited in size and evicts the
+        least recently used pages first. The hits, misses and bytes saved are
+        also recorded in the metrics of the run.
+
+        Page bodies are written as they are fetched, while the index is only
+        saved at the end of the run. When the cache is opened, bodies missing
+        from the index, left behind by a run that did not finish, are removed
+        along with the index entries whose body is missing.
+
+    Classes:
+
+        HttpCache
+
+    Functions:
+
+        enable(directory, max_bytes)
+        disable()
+        get_text(url)
+
+"""
+
+###############################################################################
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import http_client
+import metrics
+
+###############################################################################
+
+# The cache used by get_text(), set with enable().
+_cache = None
+
+###############################################################################
+
+
+class HttpCache:
+    """
+    An on-disk cache of page bodies validated with conditional requests.
+
+    Parameters
+    ----------
+    directory: str
+        The directory the cached pages and the index are stored in. It is
+        created if it does not exist.
+
+    max_bytes: int, optional
+        The maximum total size of the cached page bodies.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024**2):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_downloaded = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file, "r") as file:
+                self.index = json.load(file)
+        self._reconcile()
+
+    def _reconcile(self):
+        # Remove the bodies that are not in the index, and the entries of the
+        # index whose body is missing or incomplete.
+        paths = {self._body_path(url): url for url in self.index}
+        sizes = {}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if path == self.index_file:
+                continue
+            if path in paths:
+                sizes[path] = os.path.getsize(path)
+            else:
+                os.remove(path)
+
+        for path, url in paths.items():
+            if sizes.get(path) != self.index[url]["size"]:
+                del self.index[url]
+                if path in sizes:
+                    os.remove(path)
+
+    def _body_path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key)
+
+    def get_text(self, url: str) -> str:
+        """
+        Returns the text of the page referenced by the provided URL, served
+        from the cache when the server reports that it has not changed.
+        """
+
+        with self.lock:
+            entry = self.index.get(url)
+
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = http_client.get(url, headers=headers)
+
+        if response.status_code == 304 and entry is not None:
+            try:
+                with open(self._body_path(url), "rb") as file:
+                    content = file.read()
+            except FileNotFoundError:
+                content = None
+
+            if content is not None:
+                with self.lock:
+                    entry["accessed"] = time.time()
+                    self.hits += 1
+                    self.bytes_saved += entry["size"]
+                metrics.increment("http_cache_hits_total")
+                metrics.increment("http_cache_bytes_saved_total", entry["size"])
+                return content.decode(entry["encoding"], errors="replace")
+
+            # The body went missing, so the page has to be fetched in full.
+            with self.lock:
+                self.index.pop(url, None)
+            response = http_client.get(url)
+
+        content = response.content
+        encoding = response.encoding or response.apparent_encoding or "utf-8"
+
+        with self.lock:
+            self.misses += 1
+            self.bytes_downloaded += len(content)
+        metrics.increment("http_cache_misses_total")
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code == 200 and (etag or last_modified):
+            self._store(url, content, encoding, etag, last_modified)
+
+        return content.decode(encoding, errors="replace")
+
+    def _store(self, url, content, encoding, etag, last_modified):
+        # Pages larger than the whole cache are never stored.
+        if len(content) > self.max_bytes:
+            return
+
+        # The body is written to a temporary file without holding the lock,
+        # which is only held to move it in place and update the index.
+        path = self._body_path(url)
+        temporary_file = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_file, "wb") as file:
+            file.write(content)
+
+        with self.lock:
+            os.replace(temporary_file, path)
+            self.index[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "encoding": encoding,
+                "size": len(content),
+                "accessed": time.time(),
+            }
+            self._evict()
+
+    def _evict(self):
+        # Remove the least recently used pages until the cache fits in
+        # max_bytes. Must be called with the lock held.
+        total = sum(entry["size"] for entry in self.index.values())
+        if total <= self.max_bytes:
+            return
+
+        for url in sorted(self.index, key=lambda url: self.index[url]["accessed"]):
+            total -= self.index.pop(url)["size"]
+            try:
+                os.remove(self._body_path(url))
+            except FileNotFoundError:
+                pass
+            if total <= self.max_bytes:
+                break
+
+    def save(self):
+        """
+        Write the index of cached pages to disk.
+        """
+
+        with self.lock:
+            temporary_file = self.index_file + ".tmp"
+            with open(temporary_file, "w") as file:
+                json.dump(self.index, file)
+            os.replace(temporary_file, self.index_file)
+
+    def report(self) -> str:
+        """
+        Returns a summary of the cache hits, misses and bytes saved since the
+        cache was opened.
+        """
+
+        requests = self.hits + self.misses
+        hit_rate = self.hits / requests if requests else 0.0
+        size = sum(entry["size"] for entry in self.index.values())
+
+        return (
+            f"HTTP cache: {self.hits} hits, {self.misses} misses "
+            f"({hit_rate:.1%} hit rate), {self.bytes_saved} bytes saved, "
+            f"{self.bytes_downloaded} bytes downloaded, {len(self.index)} pages "
+            f"({size} bytes) cached."
+        )
+
+
+###############################################################################
+
+
+def enable(directory: str, max_bytes: int = 256 * 1024**2) -> HttpCache:
+    """
+    Open the cache stored in the provided directory and use it for all pages
+    fetched with get_text().
+
+    Parameters
+    ----------
+    directory: str
+        The directory the cache is stored in.
+
+    max_bytes: int, optional
+        The maximum total size of the cached page bodies.
+
+    Returns
+    -------
+    HttpCache:
+        The opened cache.
+    """
+
+    global _cache
+    _cache = HttpCache(directory, max_bytes)
+    return _cache
+
+
+###############################################################################
+
+
+def disable():
+    """
+    Stop using the cache for pages fetched with get_text().
+    """
+
+    global _cache
+    _cache = None
+
+
+###############################################################################
+
+
+def get_text(url: str) -> str:
+    """
+    Returns the text of the page referenced by the provided URL. The page is
+    fetched through the cache if one was enabled, otherwise it is fetched
+    with the shared HTTP client.
+    """
+
+    if _cache is None:
+        return http_client.get(url).text
+
+    return _cache.get_text(url)
@@ -0,0 +1,270 @@
+"""
+
+    http_client.py
+
+    Description:
+
+        This module contains the HTTP client shared by all extract modules.
+        A single requests session is used so that connections to the same host
+        are pooled and kept alive between requests. Every request made through
+        the session has a connect and read timeout and is retried with
+        exponential backoff and jitter when the connection fails or the server
+        responds with a 429 or 5xx status code. A Retry-After header sent with
+        the response takes precedence over the backoff delay.
+
+        The latency of every attempt, the status of every response, the bytes
+        downloaded, the retries and the connection errors are recorded in the
+        metrics of the run.
+
+    Variables:
+
+        connect_timeout
+        read_timeout
+        max_retries
+        backoff_factor
+        max_backoff
+        retry_statuses
+        pool_connections
+        pool_maxsize
+
+    Classes:
+
+        RetryAdapter
+
+    Functions:
+
+        create_session(**kwargs)
+        get_session()
+        get(url, **kwargs)
+        retry_after(response)
+
+"""
+
+###############################################################################
+
+import random
+import threading
+import time
+import datetime
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+###############################################################################
+
+# The default settings used by the shared session.
+connect_timeout = 5
+read_timeout = 30
+max_retries = 4
+backoff_factor = 0.5
+max_backoff = 60
+retry_statuses = frozenset({429, 500, 502, 503, 504})
+pool_connections = 16
+pool_maxsize = 32
+
+_session = None
+_session_lock = threading.Lock()
+
+###############################################################################
+
+
+class RetryAdapter(HTTPAdapter):
+    """
+    A transport adapter that applies a default timeout to every request and
+    retries idempotent requests that fail with a connection error, a timeout
+    or a retryable status code.
+
+    Parameters
+    ----------
+    timeout: tuple[float, float], optional
+        The connect and read timeout used when a request has no timeout.
+
+    retries: int, optional
+        The number of times a request is retried before giving up.
+
+    delay: float, optional
+        The delay before the first retry. The delay doubles with each retry.
+
+    max_delay: float, optional
+        The maximum delay between two attempts, also applied to Retry-After.
+
+    statuses: frozenset[int], optional
+        The response status codes that cause a request to be retried.
+
+    Any setting that is not provided falls back to the module setting.
+    """
+
+    def __init__(
+        self,
+        timeout: tuple[float, float] = None,
+        retries: int = None,
+        delay: float = None,
+        max_delay: float = None,
+        statuses: frozenset[int] = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.timeout = timeout or (connect_timeout, read_timeout)
+        self.retries = max_retries if retries is None else retries
+        self.delay = backoff_factor if delay is None else delay
+        self.max_delay = max_backoff if max_delay is None else max_delay
+        self.statuses = retry_statuses if statuses is None else statuses
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Returns the delay before retrying after the given attempt. Half of the
+        exponential delay is fixed and the other half is random so that
+        clients that failed at the same time do not retry at the same time.
+        """
+
+        delay = min(self.max_delay, self.delay * 2**attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def send(self, request, timeout=None, **kwargs) -> requests.Response:
+        if timeout is None:
+            timeout = self.timeout
+
+        # Only requests that can safely be sent twice are retried.
+        retries = self.retries if request.method in ("GET", "HEAD") else 0
+
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                response = super().send(request, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                metrics.increment("http_errors_total")
+                if attempt == retries:
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                if response.status_code not in self.statuses or attempt == retries:
+                    self.record(response, start, kwargs.get("stream", False))
+                    return response
+
+                self.record(response, start, stream=True)
+                delay = retry_after(response)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                delay = min(delay, self.max_delay)
+                response.close()
+
+            metrics.increment("http_retries_total")
+            time.sleep(delay)
+
+    @staticmethod
+    def record(response: requests.Response, start: float, stream: bool):
+        """
+        Record the latency and status of a response. Unless the response is
+        streamed its body is read here, as the session would right after, so
+        that the latency includes the download and the bytes are counted.
+        """
+
+        if not stream:
+            metrics.increment("http_bytes_downloaded_total", len(response.content))
+        metrics.observe("http_fetch_seconds", time.perf_counter() - start)
+        metrics.increment("http_responses_total", status=response.status_code)
+
+
+###############################################################################
+
+
+def create_session(**kwargs) -> requests.Session:
+    """
+    Returns a new session that sends all requests through a RetryAdapter.
+
+    Parameters
+    ----------
+    **kwargs:
+        Keyword arguments passed on to RetryAdapter, such as timeout, retries
+        or delay. The connection pool is sized with pool_connections
+        and pool_maxsize unless they are provided.
+
+    Returns
+    -------
+    Session:
+        The configured session.
+    """
+
+    kwargs.setdefault("pool_connections", pool_connections)
+    kwargs.setdefault("pool_maxsize", pool_maxsize)
+
+    adapter = RetryAdapter(**kwargs)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+###############################################################################
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the session shared by all extract modules, creating it with the
+    module settings the first time it is requested.
+    """
+
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+###############################################################################
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """
+    Send a GET request for the provided URL with the shared session.
+
+    Parameters
+    ----------
+    url: str
+        The URL to request.
+
+    **kwargs:
+        Keyword arguments passed on to Session.get().
+
+    Returns
+    -------
+    Response:
+        The response to the request.
+    """
+
+    return get_session().get(url, **kwargs)
+
+
+###############################################################################
+
+
+def retry_after(response: requests.Response) -> float:
+    """
+    Returns the number of seconds to wait before retrying according to the
+    Retry-After header of the response, or None if there is no valid header.
+    The header can either contain a number of seconds or an HTTP date.
+    """
+
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (date - now).total_seconds())
@@ -9,11 +9,29 @@
         information is collected for each article: author, publication, title,
         subtitle, article intro, date, read time, and url.
 
+        Articles that cannot be parsed are logged to the webScraper.medium
+        logger, from the parse processes of the pipeline as well, with the
+        name of the source they were collected for.
+
+    Variables:
+
+        logger
+        parser_engine
+        article_classes
+
     Functions:
 
-        get_latest_article_data(url, publication)
+        get_latest_article_data(url, publication, topic, max_workers,
+            max_per_host, seen, parse_workers, records, cancel)
         get_latest_posts_links(url)
+        parse_latest_posts_links(html, publication, engine)
         get_article_data(url, publication)
+        parse_article_page(html, url, publication, source)
+        parse_article_data(html, url, publication, engine)
+        has_article_class(value)
+        get_articles_data(links, publication, max_workers, max_per_host,
+            cancel)
+        limit_per_host(function, links, max_per_host)
 
 """
 
@@ -22,13 +40,59 @@
 import pandas as pd
 
 import logging
-import requests
-from bs4 import BeautifulSoup
+import threading
+from bs4 import BeautifulSoup, SoupStrainer
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Iterator
+from urllib.parse import urlparse
+
+import http_cache
+import metrics
+import pipeline
+from records import ArticleRecords
+from seen_index import SeenUrlIndex
+
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:
+    lxml = None
 
 ###############################################################################
 
+logger = logging.getLogger("webScraper.medium")
+
+# The engine used to parse Medium pages. "lxml" builds the tree with lxml and
+# finds the fields with a single XPath query, "strainer" only builds the parts
+# of the tree with a pw-* class using BeautifulSoup, and "html.parser" builds
+# the full BeautifulSoup tree.
+parser_engine = "lxml" if lxml is not None else "strainer"
+
+# The tag of the element carrying each of the article data classes.
+article_classes = {
+    "pw-author": "div",
+    "pw-post-title": "h1",
+    "pw-subtitle-paragraph": "h2",
+    "pw-published-date": "p",
+    "pw-reading-time": "div",
+    "pw-post-body-paragraph": "p",
+}
 
-def get_latest_article_data(url: str, publication: str, topic: str) -> pd.DataFrame:
+###############################################################################
+
+
+def get_latest_article_data(
+    url: str,
+    publication: str,
+    topic: str,
+    max_workers: int = 1,
+    max_per_host: int = 4,
+    seen: SeenUrlIndex = None,
+    parse_workers: int = 0,
+    records: ArticleRecords = None,
+    cancel: threading.Event = None,
+) -> pd.DataFrame:
     """
     Collect data for the latest articles posted on the medium publication
     referenced by the provided URL.
@@ -45,6 +109,33 @@ def get_latest_article_data(url: str, publication: str, topic: str) -> pd.DataFr
         This parameter is not used, it is included only to allow this function
         to be called in the same way as similar functions in other modules.
 
+    max_workers: int, optional
+        The number of threads used to fetch the articles. The default of 1
+        fetches the articles sequentially.
+
+    max_per_host: int, optional
+        The maximum number of requests that may be in flight to a single host
+        at any one time. Only used when max_workers is greater than 1.
+
+    seen: SeenUrlIndex, optional
+        The index of articles that were already collected. Articles in the
+        index are not fetched.
+
+    parse_workers: int, optional
+        The number of processes used to parse the articles. When greater than
+        0 the articles are fetched by max_workers threads and parsed in a
+        process pool as they arrive, see the pipeline module. The default of
+        0 parses each article in the thread that fetched it.
+
+    records: ArticleRecords, optional
+        The records each article is also added to as soon as it is collected,
+        such as those of the scheduler, which keeps them if the source runs
+        out of time.
+
+    cancel: Event, optional
+        An event set when the source runs out of time, such as the one of the
+        scheduler. No more articles are fetched once it is set.
+
     Returns
     -------
     DataFrame:
@@ -52,18 +143,162 @@ def get_latest_article_data(url: str, publication: str, topic: str) -> pd.DataFr
         articles posted to the provided publication.
     """
 
-    # Initialize the article data dataframe.
-    article_data = pd.DataFrame()
+    # Initialize the article records.
+    article_data = ArticleRecords()
 
     links = get_latest_posts_links(url, publication)
+    if seen is not None and links:
+        links = [link for link, found in zip(links, seen.contains(links)) if not found]
+
+    def collected(info: dict):
+        if info is not None and records is not None:
+            records.extend(info)
+
+    # For each article link collect the data and add it to the article
+    # records. Articles that could not be scraped are skipped.
+    if parse_workers > 0:
+        articles = pipeline.fetch_and_parse(
+            links,
+            limit_per_host(http_cache.get_text, links, max_per_host),
+            partial(
+                parse_article_page,
+                publication=publication,
+                source=metrics.current_labels().get("source"),
+            ),
+            fetch_workers=max_workers,
+            parse_workers=parse_workers,
+            kind="article",
+            on_result=collected,
+            cancel=cancel,
+        )
+    else:
+        articles = get_articles_data(
+            links, publication, max_workers, max_per_host, cancel
+        )
+
+    # The pipeline passes each article to collected() as soon as it is
+    # parsed, get_articles_data() yields each one as soon as it is fetched.
+    for info in articles:
+        if parse_workers <= 0:
+            collected(info)
+        if info is not None:
+            article_data.extend(info)
+
+    return article_data.to_dataframe()
+
+
+###############################################################################
+
+
+def get_articles_data(
+    links: list[str],
+    publication: str,
+    max_workers: int = 1,
+    max_per_host: int = 4,
+    cancel: threading.Event = None,
+) -> Iterator[dict]:
+    """
+    This function is a generator. Yield the article data for each of the
+    provided links, in the same order as the links, as soon as it is
+    collected. When max_workers is greater than 1 the articles are fetched
+    concurrently by a thread pool, with no more than max_per_host requests
+    sent to the same host at once.
+
+    Parameters
+    ----------
+    links: list[str]
+        The URLs of the medium articles.
+
+    publication: str
+        The name of the publication the articles belong to.
+
+    max_workers: int, optional
+        The number of threads used to fetch the articles.
+
+    max_per_host: int, optional
+        The maximum number of concurrent requests to a single host.
+
+    cancel: Event, optional
+        An event that stops the articles not fetched yet from being fetched
+        once it is set, which ends the iteration.
+
+    Returns
+    -------
+    Iterator[dict]:
+        The dictionaries returned by get_article_data() for each link.
+    """
+
+    def cancelled() -> bool:
+        return cancel is not None and cancel.is_set()
+
+    if max_workers <= 1 or len(links) <= 1:
+        for link in links:
+            if cancelled():
+                return
+            yield get_article_data(link, publication)
+        return
 
-    # For each article link collect the data and combine the existing article
-    # data dataframe with the data collected.
-    for link in links:
-        temp = pd.DataFrame(get_article_data(link, publication))
-        article_data = pd.concat([article_data, temp]).reset_index(drop=True)
+    fetch = limit_per_host(
+        partial(get_article_data, publication=publication), links, max_per_host
+    )
 
-    return article_data
+    # The metrics recorded in the pool threads keep the labels of the source.
+    fetch = metrics.bind(fetch)
+
+    # The pool threads are not daemon threads, the interpreter waits for the
+    # links they were given before it exits. Once cancelled they skip the
+    # links not fetched yet.
+    def fetch_unless_cancelled(link: str):
+        return None if cancelled() else fetch(link)
+
+    # Executor.map yields results in the order of the links, which keeps the
+    # output identical to the sequential path. Leaving the loop cancels the
+    # links not started yet.
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(links))) as executor:
+        for info in executor.map(fetch_unless_cancelled, links):
+            if cancelled():
+                return
+            yield info
+
+
+###############################################################################
+
+
+def limit_per_host(function: Callable, links: list[str], max_per_host: int) -> Callable:
+    """
+    Returns a wrapper around function, which takes a link as its first
+    argument, that never lets more than max_per_host calls run at once for
+    links to the same host.
+
+    Parameters
+    ----------
+    function: Callable
+        The function to wrap.
+
+    links: list[str]
+        The links the wrapper will be called with.
+
+    max_per_host: int
+        The maximum number of concurrent calls for a single host.
+
+    Returns
+    -------
+    Callable:
+        The wrapped function.
+    """
+
+    # One semaphore per host so that a publication hosted on a single domain
+    # is never hit with more than max_per_host requests at the same time.
+    host_limits = {
+        host: threading.BoundedSemaphore(max_per_host)
+        for host in {urlparse(link).netloc for link in links}
+    }
+
+    def limited(link: str, *args, **kwargs):
+        with host_limits[urlparse(link).netloc]:
+            return function(link, *args, **kwargs)
+
+    return limited
 
 
 ###############################################################################
@@ -89,21 +324,64 @@ def get_latest_posts_links(url: str, publication: str) -> list[str]:
         publication.
     """
 
-    # Get the HTML for the webpage with an HTTPS request and create the
-    # soup object.
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, "html.parser")
+    # Get the HTML for the webpage with an HTTPS request, served from the HTTP
+    # cache if the page has not changed, and collect the links.
+    html = http_cache.get_text(url)
+    with metrics.timer("parse_seconds", page="links"):
+        return parse_latest_posts_links(html, publication)
+
+
+###############################################################################
+
+
+def parse_latest_posts_links(
+    html: str, publication: str, engine: str = None
+) -> list[str]:
+    """
+    Returns the URL links to the latest articles found in the HTML of a
+    medium publication's latest posts page.
+
+    Parameters
+    ----------
+    html: str
+        The HTML of the latest posts page.
+
+    publication: str
+        The name of the publication the page belongs to.
+
+    engine: str, optional
+        The parser engine to use, defaults to parser_engine.
+
+    Returns
+    -------
+    list[str]:
+        A list of URL links to the latest articles posted to the provided
+        publication.
+    """
+
+    engine = engine or parser_engine
+    title = f"Latest stories published on {publication}"
 
     # Gather all <a> elements with the relevant title value and get the href
     # and remove everything after '?source' since this stuff is not needed.
-    links = soup.find_all("a", title=f"Latest stories published on {publication}")
-    return [link["href"].split("?source")[0] for link in links]
+    if engine == "lxml":
+        try:
+            tree = lxml.html.fromstring(html)
+        except lxml.etree.ParserError:
+            return []
+        hrefs = tree.xpath("//a[@title=$title]/@href", title=title)
+    else:
+        parse_only = SoupStrainer("a", title=title) if engine == "strainer" else None
+        soup = BeautifulSoup(html, "html.parser", parse_only=parse_only)
+        hrefs = [link["href"] for link in soup.find_all("a", title=title)]
+
+    return [href.split("?source")[0] for href in hrefs]
 
 
 ###############################################################################
 
 
-def get_article_data(url: str, publication: str, logger: logging.Logger = None) -> dict:
+def get_article_data(url: str, publication: str) -> dict:
     """
     Returns a dictionary containing all the data for the article referenced
     by the provided URL.
@@ -119,44 +397,191 @@ def get_article_data(url: str, publication: str, logger: logging.Logger = None)
         A dictionary containing the data for the provided article.
     """
 
+    # Get the HTML for the webpage with an HTTPS request, served from the HTTP
+    # cache if the page has not changed, and parse the article data.
+    html = http_cache.get_text(url)
+    with metrics.timer("parse_seconds", page="article"):
+        return parse_article_page(html, url, publication)
+
+
+###############################################################################
+
+
+def parse_article_page(
+    html: str, url: str, publication: str, source: str = None
+) -> dict:
+    """
+    Returns a dictionary containing all the data for the article found in the
+    HTML of a medium article page, or None if the page is missing some of the
+    data, in which case the error is logged. This function can be run in a
+    separate process.
+
+    Parameters
+    ----------
+    html: str
+        The HTML of the article page.
+
+    url: str
+        The URL of the medium article.
+
+    publication: str
+        The name of the publication the article belongs to.
+
+    source: str, optional
+        The name of the source the article is collected for, logged with the
+        error. Defaults to the source label of the metrics of the current
+        thread, which processes of the pipeline do not have, so the pipeline
+        passes it in.
+
+    Returns
+    -------
+    dict:
+        A dictionary containing the data for the provided article.
+    """
+
     try:
-        # Get the HTML for the webpage with an HTTPS request and create the
-        # soup object.
-        response = requests.get(url)
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        article_info = {}
-
-        # Collect all the data for the article that we need. The classes referring
-        # to each data point are consistent across all Medium publications.
-        article_info["author"] = [
-            soup.find("div", class_="pw-author").div.div.div.a.text
-        ]
-        article_info["publication"] = [publication]
-        article_info["title"] = [soup.find("h1", class_="pw-post-title").text]
-        article_info["article_intro"] = [
-            soup.find("p", class_="pw-post-body-paragraph").text
-        ]
-        article_info["date"] = [soup.find("p", class_="pw-published-date").span.text]
-        article_info["read_time"] = [soup.find("div", class_="pw-reading-time").text]
-        article_info["url"] = [url]
-
-        # Sometimes articles don't have a subtitle so we must check if there is a subtitle and
-        # set the subtitle to an empty string if one doesn't exist.
-        if (subtitle := soup.find("h2", class_="pw-subtitle-paragraph")) is None:
-            article_info["subtitle"] = [""]
-        else:
-            article_info["subtitle"] = [subtitle.text]
-
-        return article_info
+        return parse_article_data(html, url, publication)
 
     except AttributeError as e:
-        if logger:
-            logger.error(
-                "An AttributeError occurred in web_scraper/extract/medium.py get_article_data()."
-            )
-            logger.error(e)
-            logger.error(f"Error occurred while scraping URL: {url}")
-        else:
-            print(e)
-            print(f"URL: {url}")
+        logger.error(
+            f"An AttributeError occurred in web_scraper/extract/medium.py "
+            f"parse_article_page() while scraping URL {url}: {e}",
+            extra={
+                "source": source or metrics.current_labels().get("source"),
+                "url": url,
+                "stage": "parse",
+            },
+        )
+
+
+###############################################################################
+
+
+def parse_article_data(
+    html: str, url: str, publication: str, engine: str = None
+) -> dict:
+    """
+    Returns a dictionary containing all the data for the article found in the
+    HTML of a medium article page.
+
+    Parameters
+    ----------
+    html: str
+        The HTML of the article page.
+
+    url: str
+        The URL of the medium article.
+
+    publication: str
+        The name of the publication the article belongs to.
+
+    engine: str, optional
+        The parser engine to use, defaults to parser_engine.
+
+    Returns
+    -------
+    dict:
+        A dictionary containing the data for the provided article.
+
+    Raises
+    ------
+    AttributeError:
+        If one of the required elements is missing from the page.
+    """
+
+    engine = engine or parser_engine
+    if engine == "lxml":
+        return _parse_article_data_lxml(html, url, publication)
+
+    parse_only = (
+        SoupStrainer(attrs={"class": has_article_class})
+        if engine == "strainer"
+        else None
+    )
+    soup = BeautifulSoup(html, "html.parser", parse_only=parse_only)
+
+    article_info = {}
+
+    # Collect all the data for the article that we need. The classes referring
+    # to each data point are consistent across all Medium publications.
+    article_info["author"] = [soup.find("div", class_="pw-author").div.div.div.a.text]
+    article_info["publication"] = [publication]
+    article_info["title"] = [soup.find("h1", class_="pw-post-title").text]
+    article_info["article_intro"] = [
+        soup.find("p", class_="pw-post-body-paragraph").text
+    ]
+    article_info["date"] = [soup.find("p", class_="pw-published-date").span.text]
+    article_info["read_time"] = [soup.find("div", class_="pw-reading-time").text]
+    article_info["url"] = [url]
+
+    # Sometimes articles don't have a subtitle so we must check if there is a subtitle and
+    # set the subtitle to an empty string if one doesn't exist.
+    if (subtitle := soup.find("h2", class_="pw-subtitle-paragraph")) is None:
+        article_info["subtitle"] = [""]
+    else:
+        article_info["subtitle"] = [subtitle.text]
+
+    return article_info
+
+
+###############################################################################
+
+
+def has_article_class(value) -> bool:
+    """
+    Returns True if the class attribute value contains one of the article
+    data classes. Depending on the BeautifulSoup version the value is either
+    the whole attribute or a single class.
+    """
+
+    if value is None:
+        return False
+
+    classes = value.split() if isinstance(value, str) else value
+    return any(name in article_classes for name in classes)
+
+
+###############################################################################
+
+
+def _parse_article_data_lxml(html: str, url: str, publication: str) -> dict:
+    # A single XPath query returns every element with a pw-* class in document
+    # order, the first element of each class with the expected tag is kept.
+    try:
+        tree = lxml.html.fromstring(html)
+    except lxml.etree.ParserError as error:
+        raise AttributeError(f"Unable to parse the article page: {error}")
+
+    elements = {}
+    for element in tree.xpath("//*[contains(@class, 'pw-')]"):
+        for name in element.get("class").split():
+            if article_classes.get(name) == element.tag and name not in elements:
+                elements[name] = element
+
+    def find(name: str, *tags: str):
+        # Mirrors soup.find(tag, class_=name).tag.tag... where each .tag is the
+        # first descendant with that tag, raising AttributeError if missing.
+        element = elements.get(name)
+        for tag in tags:
+            if element is None:
+                break
+            element = next(element.iterdescendants(tag), None)
+        if element is None:
+            raise AttributeError(f"No element found for the {name} class.")
+        return element.text_content()
+
+    article_info = {}
+    article_info["author"] = [find("pw-author", "div", "div", "div", "a")]
+    article_info["publication"] = [publication]
+    article_info["title"] = [find("pw-post-title")]
+    article_info["article_intro"] = [find("pw-post-body-paragraph")]
+    article_info["date"] = [find("pw-published-date", "span")]
+    article_info["read_time"] = [find("pw-reading-time")]
+    article_info["url"] = [url]
+
+    if "pw-subtitle-paragraph" in elements:
+        article_info["subtitle"] = [find("pw-subtitle-paragraph")]
+    else:
+        article_info["subtitle"] = [""]
+
+    return article_info
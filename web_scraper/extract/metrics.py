@@ -0,0 +1,444 @@
+"""
+
+    metrics.py
+
+    Description:
+
+        This module contains the metrics of a web scraper run: counters, such
+        as the bytes downloaded, the rows produced, the errors and the cache
+        hits, and histograms of durations, such as the latency of each fetch
+        and the time spent parsing each page.
+
+        Every metric is recorded with labels. The labels set with labels() are
+        added to every metric recorded in the same thread, so the scheduler
+        sets the name of the source once and the HTTP client, the cache and
+        the parsers do not need to know which source they work for. Functions
+        run in thread pools are wrapped with bind() to keep the labels of the
+        thread that submitted them.
+
+        At the end of a run the metrics are written as a JSON summary, and
+        optionally in the Prometheus text format for the textfile collector
+        of the node exporter, so they can be compared between runs.
+
+    Variables:
+
+        latency_buckets
+        registry
+
+    Classes:
+
+        Histogram
+        MetricsRegistry
+
+    Functions:
+
+        format_labels(labels)
+        format_value(value)
+        labels(**labels)
+        current_labels()
+        bind(function)
+        increment(name, value, **labels)
+        observe(name, value, **labels)
+        timer(name, **labels)
+
+"""
+
+###############################################################################
+
+import bisect
+import contextlib
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from typing import Callable
+
+###############################################################################
+
+# The upper bounds, in seconds, of the buckets of the duration histograms.
+latency_buckets = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# The labels set with labels() in each thread.
+_context = threading.local()
+
+###############################################################################
+
+
+class Histogram:
+    """
+    The distribution of the observed values of a metric, counted in buckets.
+
+    Parameters
+    ----------
+    buckets: tuple[float], optional
+        The upper bounds of the buckets, in increasing order. Values above the
+        last bound are counted in a final bucket without a bound.
+    """
+
+    def __init__(self, buckets: tuple = latency_buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        """
+        Count a value in the first bucket whose bound is at least the value.
+        """
+
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns an upper bound of the q quantile of the observed values, the
+        bound of the bucket the quantile falls in.
+        """
+
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """
+        Returns the count, sum, mean, maximum and approximate quantiles of the
+        observed values, and the number of values in each bucket.
+        """
+
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip(bounds, self.counts)),
+        }
+
+
+###############################################################################
+
+
+class MetricsRegistry:
+    """
+    The counters and histograms of a run, each kept per metric name and set
+    of labels. The registry can be used from any number of threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Remove every metric and start a new run.
+        """
+
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+            self.started = time.time()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        labels = {**current_labels(), **labels}
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """
+        Add a value to a counter, such as a number of bytes or errors.
+        """
+
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Count a value, such as a duration in seconds, in a histogram.
+        """
+
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels):
+        """
+        Observe the number of seconds the body of the with statement takes,
+        including when it raises an error.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def summary(self, **fields) -> dict:
+        """
+        Returns the metrics of the run as a dictionary that can be written as
+        JSON. Each metric holds a list of series, one per set of labels.
+
+        Parameters
+        ----------
+        **fields:
+            Other information about the run added to the summary, such as the
+            sources that failed.
+        """
+
+        finished = time.time()
+        with self.lock:
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                counters.setdefault(name, []).append(
+                    {"labels": dict(labels), "value": value}
+                )
+
+            histograms = {}
+            for (name, labels), histogram in sorted(
+                self.histograms.items(), key=lambda item: item[0]
+            ):
+                histograms.setdefault(name, []).append(
+                    {"labels": dict(labels), **histogram.summary()}
+                )
+
+        return {
+            "started": datetime.datetime.fromtimestamp(self.started).isoformat(),
+            "finished": datetime.datetime.fromtimestamp(finished).isoformat(),
+            "duration_seconds": finished - self.started,
+            **fields,
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def write_json(self, path: str, **fields):
+        """
+        Write the summary of the run to a JSON file, replacing it atomically.
+        Any keyword arguments are added to the summary.
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temporary_file = path + ".tmp"
+        with open(temporary_file, "w") as file:
+            json.dump(self.summary(**fields), file, indent=2, default=str)
+        os.replace(temporary_file, path)
+
+    def write_prometheus(self, path: str, prefix: str = "web_scraper_"):
+        """
+        Write the metrics in the Prometheus text format, along with the time
+        the file was written. The file is replaced atomically, as the
+        textfile collector may read it at any time.
+
+        Parameters
+        ----------
+        path: str
+            The file to write, which must end with .prom to be collected.
+
+        prefix: str, optional
+            The prefix added to the name of every metric.
+        """
+
+        lines = [
+            f"# TYPE {prefix}last_run_timestamp_seconds gauge",
+            f"{prefix}last_run_timestamp_seconds {format_value(time.time())}",
+        ]
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+
+            names = set()
+            for (name, labels), value in counters:
+                if name not in names:
+                    names.add(name)
+                    lines.append(f"# TYPE {prefix}{name} counter")
+                lines.append(
+                    f"{prefix}{name}{format_labels(labels)} {format_value(value)}"
+                )
+
+            for (name, labels), histogram in histograms:
+                if name not in names:
+                    names.add(name)
+                    lines.append(f"# TYPE {prefix}{name} histogram")
+
+                # The count of each bucket includes the counts of the buckets
+                # below it.
+                cumulative = 0
+                bounds = [format_value(bound) for bound in histogram.buckets]
+                for bound, count in zip(bounds + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f"{prefix}{name}_bucket"
+                        f"{format_labels(labels + (('le', bound),))} {cumulative}"
+                    )
+                lines.append(
+                    f"{prefix}{name}_sum{format_labels(labels)} "
+                    f"{format_value(histogram.sum)}"
+                )
+                lines.append(
+                    f"{prefix}{name}_count{format_labels(labels)} {histogram.count}"
+                )
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temporary_file = path + ".tmp"
+        with open(temporary_file, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temporary_file, path)
+
+
+###############################################################################
+
+
+def format_labels(labels: tuple) -> str:
+    """
+    Returns the labels of a series in the Prometheus text format.
+    """
+
+    if not labels:
+        return ""
+
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+###############################################################################
+
+
+def format_value(value: float) -> str:
+    """
+    Returns a value in the Prometheus text format, without a fraction if it
+    is a whole number.
+    """
+
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+###############################################################################
+
+# The registry the metrics of the run are recorded in.
+registry = MetricsRegistry()
+
+###############################################################################
+
+
+@contextlib.contextmanager
+def labels(**labels):
+    """
+    Add the provided labels to every metric recorded in the current thread
+    in the body of the with statement.
+    """
+
+    previous = current_labels()
+    _context.labels = {**previous, **labels}
+    try:
+        yield
+    finally:
+        _context.labels = previous
+
+
+###############################################################################
+
+
+def current_labels() -> dict:
+    """
+    Returns the labels set with labels() in the current thread.
+    """
+
+    return getattr(_context, "labels", {})
+
+
+###############################################################################
+
+
+def bind(function: Callable) -> Callable:
+    """
+    Returns a wrapper around function that records its metrics with the
+    labels of the current thread, for functions run in other threads such as
+    those of a thread pool.
+    """
+
+    bound_labels = current_labels()
+
+    @functools.wraps(function)
+    def bound(*args, **kwargs):
+        with labels(**bound_labels):
+            return function(*args, **kwargs)
+
+    return bound
+
+
+###############################################################################
+
+
+def increment(name: str, value: float = 1, **labels):
+    """
+    Add a value to a counter of the run's registry.
+    """
+
+    registry.increment(name, value, **labels)
+
+
+###############################################################################
+
+
+def observe(name: str, value: float, **labels):
+    """
+    Count a value in a histogram of the run's registry.
+    """
+
+    registry.observe(name, value, **labels)
+
+
+###############################################################################
+
+
+def timer(name: str, **labels):
+    """
+    Observe the duration of the body of a with statement in a histogram of
+    the run's registry.
+    """
+
+    return registry.timer(name, **labels)
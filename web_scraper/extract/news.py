@@ -9,26 +9,79 @@
         article: author, publication, title, subtitle, article intro, date,
         read time, and url.
 
+        The publish time of the newest article collected for each topic is
+        kept as a high-water mark, and each run only requests newer articles.
+        When the page budget or the News API's result limit cuts a run short,
+        the older articles that were not requested are kept as a gap, a
+        window with the mark it started from and the oldest article returned.
+        The next runs page through the gap with the News API's to argument
+        before requesting new articles, so no article is skipped.
+
+    Variables:
+
+        logger
+        page_size
+        page_budget
+        timestamp_pattern
+
     Functions:
 
-        get_latest_article_data(url, publication, topic, api_key)
-        get_news_page(news, topic, timestamp, url)
+        get_latest_article_data(url, publication, topic, api_key, seen,
+            watermarks, max_pages, records, cancel)
+        get_news_page(news, topic, timestamp, url, max_pages, to)
         get_article_data(articles)
+        parse_timestamp(published_at)
+        format_timestamp(date)
+        next_timestamp(published_at)
 
 """
 
 ###############################################################################
 
+import datetime
+import logging
+import re
+import threading
+
 import numpy as np
 import pandas as pd
 
 from newsapi import NewsApiClient
+from newsapi.newsapi_exception import NewsAPIException
+
+import http_client
+from records import ArticleRecords
+from seen_index import SeenUrlIndex
+from watermarks import HighWaterMarks
+
+###############################################################################
+
+logger = logging.getLogger("webScraper.news")
+
+# The number of articles requested per page, the maximum the News API allows,
+# and the default number of pages requested per topic in each run.
+page_size = 100
+page_budget = 5
+
+# A publish time in ISO 8601 format, with optional fractional seconds and an
+# optional Z or UTC offset suffix, e.g. 2022-07-27T17:45:30.123Z.
+timestamp_pattern = re.compile(
+    r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.\d+)?(Z|[+-]\d{2}:?\d{2})?$"
+)
 
 ###############################################################################
 
 
 def get_latest_article_data(
-    url: str, publication: str, topic: str, api_key: str = None
+    url: str,
+    publication: str,
+    topic: str,
+    api_key: str = None,
+    seen: SeenUrlIndex = None,
+    watermarks: HighWaterMarks = None,
+    max_pages: int = page_budget,
+    records: ArticleRecords = None,
+    cancel: threading.Event = None,
 ) -> pd.DataFrame:
     """
     Collect data for the latest articles posted on a variety of publications
@@ -48,6 +101,34 @@ def get_latest_article_data(
         the News API. This is used if we want to get all the latest articles
         that mention a specific topic.
 
+    api_key: str, optional
+        The News API key.
+
+    seen: SeenUrlIndex, optional
+        The index of articles that were already collected. Articles in the
+        index are left out of the returned dataframe.
+
+    watermarks: HighWaterMarks or PendingMarks, optional
+        The store of the publish time of the newest article collected for
+        each topic. Only articles published after the mark are requested, and
+        the mark is raised to the newest article returned. If the pages were
+        cut short, the window of older articles that were not requested is
+        stored as the gap of the topic, and requested first by the next runs.
+
+    max_pages: int, optional
+        The maximum number of pages requested from the News API, shared by
+        the gap and the new articles.
+
+    records: ArticleRecords, optional
+        The records the articles of each page, leaving out those in the seen
+        index, are also added to as soon as the page is received, such as
+        those of the scheduler, which keeps them if the source runs out of
+        time.
+
+    cancel: Event, optional
+        An event set when the source runs out of time, such as the one of the
+        scheduler. No more pages are requested once it is set.
+
     Returns
     -------
     DataFrame:
@@ -55,18 +136,71 @@ def get_latest_article_data(
         articles posted to the provided publication.
     """
 
-    # Initialize the article data dataframe.
-    article_data = pd.DataFrame()
-
-    # Initialize News API Client and get the last timestamp when data was
-    # acquired.
-    news = NewsApiClient(api_key=api_key)
-    timestamp = None
+    # Initialize News API Client with the shared HTTP session and get the last
+    # timestamp when data was acquired for this topic, and the window of
+    # older articles a previous run did not get to, if any.
+    news = NewsApiClient(api_key=api_key, session=http_client.get_session())
+    key, gap_key = f"news:{topic}", f"news:{topic}:gap"
+    timestamp, gap = None, None
+    if watermarks is not None:
+        timestamp, gap = watermarks.get(key), watermarks.get(gap_key)
+
+    # Page through the gap first, newest first down to its start, then
+    # through the articles published since the mark, until the page budget
+    # runs out. The pages of a window run out with a page that is not full.
+    windows = [tuple(gap), (timestamp, None)] if gap else [(timestamp, None)]
+    pages, new_pages = [], []
+    for start, end in windows:
+        window = []
+        for page in get_news_page(
+            news, topic, start, url, max_pages - len(pages), to=end
+        ):
+            window.append(page)
+            if records is not None and len(page):
+                if seen is not None:
+                    page = page[~seen.contains(page["url"])]
+                records.extend(page.to_dict("list"))
+            if cancel is not None and cancel.is_set():
+                break
+        pages += window
+        if end is None:
+            new_pages = window
+
+        # If the window was cut short by the page budget or an error, the
+        # articles older than the oldest one returned were not requested.
+        # They are left as the gap, unless the window had no start, as on
+        # the first run of a topic.
+        complete = not window or len(window[-1]) < page_size
+        gap = None
+        if not complete and start is not None:
+            oldest = min(pd.concat(window)["date"].map(parse_timestamp))
+            gap = (start, format_timestamp(oldest))
+        if not complete or len(pages) >= max_pages:
+            break
 
-    # For page yielded by the get_news_page function add the returned
-    # dataframe to the article_data dataframe.
-    for page in get_news_page(news, topic, timestamp, url):
-        article_data = pd.concat([article_data, page]).reset_index(drop=True)
+    article_data = pd.concat([pd.DataFrame(), *pages]).reset_index(drop=True)
+
+    # Raise the high-water mark to just after the newest article returned, so
+    # the next run asks for newer articles, and record the gap left, if any.
+    if watermarks is not None:
+        new_articles = pd.concat([pd.DataFrame(columns=["date"]), *new_pages])
+        if len(new_articles):
+            watermarks.update(
+                key, next_timestamp(max(new_articles["date"], key=parse_timestamp))
+            )
+        if gap is not None and gap[1] > gap[0]:
+            watermarks.set(gap_key, list(gap))
+            logger.warning(
+                f"News API pages for {topic} were cut short, the articles "
+                f"published from {gap[0]} to {gap[1]} are requested next run."
+            )
+        else:
+            watermarks.set(gap_key, None)
+
+    # Leave out the articles that were collected in a previous run.
+    if seen is not None and len(article_data):
+        article_data = article_data[~seen.contains(article_data["url"])]
+        article_data = article_data.reset_index(drop=True)
 
     return article_data
 
@@ -74,10 +208,20 @@ def get_latest_article_data(
 ###############################################################################
 
 
-def get_news_page(news, topic: str, timestamp: str, url: str) -> pd.DataFrame:
+def get_news_page(
+    news,
+    topic: str,
+    timestamp: str,
+    url: str,
+    max_pages: int = page_budget,
+    to: str = None,
+) -> pd.DataFrame:
     """
     This function is a generator. Yield the article data for each page
-    until reaching the final page for the given search parameters.
+    until reaching the final page for the given search parameters or the
+    page budget, whichever comes first. The News API returns the newest
+    articles first, so if the budget runs out the articles that are skipped
+    are the oldest ones in the search window.
 
     Parameters
     ----------
@@ -94,37 +238,45 @@ def get_news_page(news, topic: str, timestamp: str, url: str) -> pd.DataFrame:
         The URL of the publication to grab latest posts from. This is used if
         we want to get all the latest article from a specific publication.
 
+    max_pages: int, optional
+        The maximum number of pages to request.
+
+    to: str, optional
+        The timestamp in ISO 8601 format of the newest articles requested,
+        defaults to the latest articles.
+
     Returns
     -------
     DataFrame:
         A dataframe containing the article data for the yielded page.
     """
 
-    # Start from page 1.
-    page_number = 1
-
-    # We'll keep going until reaching the final page.
-    while True:
-
-        # Grab 100 articles from the current page number.
-        articles = news.get_everything(
-            q=f'"{topic}"', from_param=timestamp, language="en", page=page_number
-        )
-
-        # If the page has less than 100 articles, we have reached the final
-        # page.
-        if len(articles["articles"]) < 100:
+    for page_number in range(1, max_pages + 1):
+
+        # Grab a page of articles, newest first. An error on a page after the
+        # first one usually means the plan's result limit was reached, in
+        # which case the pages already yielded are kept.
+        try:
+            articles = news.get_everything(
+                q=f'"{topic}"',
+                from_param=timestamp,
+                to=to,
+                language="en",
+                sort_by="publishedAt",
+                page=page_number,
+                page_size=page_size,
+            )
+        except NewsAPIException:
+            if page_number == 1:
+                raise
             break
 
-        # Increment the page number and yield the results of get_article_data()
-        page_number += 1
-        # yield get_article_data(articles)
+        yield get_article_data(articles)
 
-        # Temporary solution to API limitations.
-        break
-
-    # Yield the results of get_article_data() for the final page.
-    yield get_article_data(articles)
+        # If the page has less than a full page of articles, we have reached
+        # the final page.
+        if len(articles["articles"]) < page_size:
+            break
 
 
 ###############################################################################
@@ -147,35 +299,108 @@ def get_article_data(articles: dict) -> pd.DataFrame:
         extracted for merging with the main article dataframe.
     """
 
-    # Initialize the article dataframe.
-    article_df = pd.DataFrame(
-        {
-            "author": [],
-            "publication": [],
-            "title": [],
-            "subtitle": [],
-            "article_intro": [],
-            "date": [],
-            "read_time": [],
-            "url": [],
-        }
+    # Initialize the article records.
+    article_records = ArticleRecords(
+        [
+            "author",
+            "publication",
+            "title",
+            "subtitle",
+            "article_intro",
+            "date",
+            "read_time",
+            "url",
+        ]
     )
 
-    # For each article in the article dictionary acquire all the required data.
-    # Join everything into the article dataframe
+    # For each article in the article dictionary acquire all the required data
+    # and add it to the article records.
     for article in articles["articles"]:
         article_info = {}
 
-        article_info["author"] = [article["author"]]
-        article_info["publication"] = [article["source"]["name"]]
-        article_info["title"] = [article["title"]]
-        article_info["subtitle"] = [article["description"][:100]]
-        article_info["article_intro"] = [article["content"]]
-        article_info["date"] = [article["publishedAt"]]
-        article_info["read_time"] = [np.NaN]
-        article_info["url"] = [article["url"]]
+        article_info["author"] = article["author"]
+        article_info["publication"] = article["source"]["name"]
+        article_info["title"] = article["title"]
+        article_info["subtitle"] = article["description"][:100]
+        article_info["article_intro"] = article["content"]
+        article_info["date"] = article["publishedAt"]
+        article_info["read_time"] = np.NaN
+        article_info["url"] = article["url"]
+
+        article_records.append(article_info)
+
+    return article_records.to_dataframe()
+
+
+###############################################################################
+
 
-        temp = pd.DataFrame(article_info)
-        article_df = pd.concat([article_df, temp]).reset_index(drop=True)
+def parse_timestamp(published_at: str) -> datetime.datetime:
+    """
+    Returns the provided publish time as a UTC datetime without a time zone,
+    dropping any fractional seconds. Python 3.9 and 3.10 datetime.fromisoformat
+    does not accept the Z suffix nor fractional seconds that are not 3 or 6
+    digits long, which the News API may return.
+
+    Parameters
+    ----------
+    published_at: str
+        A publish time as returned by the News API, e.g. 2022-07-27T17:45:30Z
+        or 2022-07-27T17:45:30.12345Z.
+
+    Returns
+    -------
+    datetime:
+        The publish time in UTC, e.g. datetime(2022, 7, 27, 17, 45, 30).
+    """
+
+    match = timestamp_pattern.match(published_at.strip())
+    if match is None:
+        raise ValueError(f"Invalid publish time: {published_at}")
 
-    return article_df
+    date = datetime.datetime.fromisoformat(match.group(1))
+    offset = match.group(2)
+    if offset and offset != "Z":
+        sign = 1 if offset[0] == "+" else -1
+        date -= sign * datetime.timedelta(
+            hours=int(offset[1:3]), minutes=int(offset[-2:])
+        )
+    return date
+
+
+###############################################################################
+
+
+def format_timestamp(date: datetime.datetime) -> str:
+    """
+    Returns a UTC datetime in the format accepted by the from argument of the
+    News API, e.g. 2022-07-27T17:45:30.
+    """
+
+    return date.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+###############################################################################
+
+
+def next_timestamp(published_at: str) -> str:
+    """
+    Returns the timestamp one second after the provided publish time, in the
+    format accepted by the from argument of the News API. The from argument
+    is inclusive, so using the publish time of the newest article as is would
+    return that article again in the next run.
+
+    Parameters
+    ----------
+    published_at: str
+        A publish time as returned by the News API, e.g. 2022-07-27T17:45:30Z.
+
+    Returns
+    -------
+    str:
+        The timestamp one second later, e.g. 2022-07-27T17:45:31.
+    """
+
+    return format_timestamp(
+        parse_timestamp(published_at) + datetime.timedelta(seconds=1)
+    )
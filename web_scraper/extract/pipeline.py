@@ -0,0 +1,286 @@
+"""
+
+    pipeline.py
+
+    Description:
+
+        This module contains the two stage pipeline used to scrape pages once
+        parsing, not the network, is the bottleneck. A pool of threads fetches
+        the pages and puts them on a bounded queue, and the pages on the queue
+        are parsed by a pool of processes so that multicore hosts parse in
+        parallel while the threads keep fetching. When the parse stage falls
+        behind the queue fills up and the fetch threads wait, which keeps the
+        number of pages held in memory bounded. If parsing raises an error the
+        fetches not started yet are cancelled and the queue is drained, so no
+        fetch thread is left waiting on a full queue. Once the cancellation
+        event of the pipeline is set, the pages not fetched yet are skipped
+        and the pages not parsed yet are dropped.
+
+        The depth of the queue and the throughput of each stage are logged to
+        the webScraper.pipeline logger so the number of workers of each stage
+        can be sized. The time each page takes to parse is measured in the
+        parse process and recorded in the metrics of the run.
+
+    Variables:
+
+        logger
+        process_initializer
+        process_initargs
+
+    Functions:
+
+        get_process_pool(workers)
+        fetch_and_parse(urls, fetch, parse, fetch_workers, parse_workers,
+            queue_size, log_every, kind, on_result, cancel)
+        timed_parse(parse, page, url)
+        log_progress(stats, depth, queue_size, start)
+
+"""
+
+###############################################################################
+
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Callable
+
+import metrics
+
+###############################################################################
+
+logger = logging.getLogger("webScraper.pipeline")
+
+# The function, and its arguments, each worker of the process pool runs when
+# it starts, e.g. async_logging.configure_worker to send the records logged
+# in the workers to the log queue of the main process.
+process_initializer = None
+process_initargs = ()
+
+# The process pool shared by every pipeline, created on first use. Sources
+# that run concurrently share the pool instead of each starting their own.
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+###############################################################################
+
+
+def get_process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the process pool shared by all pipelines. The pool is created
+    with the provided number of workers the first time it is requested and
+    reused as is afterwards, since other pipelines may still be using it.
+
+    The spawn start method is used because the scraper runs many threads at
+    once, and forking a process that has other threads running can leave
+    locks held in the child.
+    """
+
+    global _process_pool
+
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=process_initializer,
+                initargs=process_initargs,
+            )
+        return _process_pool
+
+
+###############################################################################
+
+
+def fetch_and_parse(
+    urls: list[str],
+    fetch: Callable[[str], str],
+    parse: Callable[[str, str], object],
+    fetch_workers: int = 8,
+    parse_workers: int = 2,
+    queue_size: int = 16,
+    log_every: int = 50,
+    kind: str = "page",
+    on_result: Callable[[object], None] = None,
+    cancel: threading.Event = None,
+) -> list:
+    """
+    Fetch every URL in a pool of threads and parse the fetched pages in a pool
+    of processes. The results are returned in the same order as the URLs.
+
+    Parameters
+    ----------
+    urls: list[str]
+        The URLs of the pages to scrape.
+
+    fetch: Callable[[str], str]
+        Returns the page for a URL. Called in the fetch threads, errors raised
+        by fetch are raised again once the pipeline has stopped.
+
+    parse: Callable[[str, str], object]
+        Returns the result for a page given the page and its URL. Called in
+        the parse processes, so it must be a picklable module level function.
+        An error raised by parse stops the pipeline and is raised again.
+
+    fetch_workers: int, optional
+        The number of fetch threads.
+
+    parse_workers: int, optional
+        The number of parse processes.
+
+    queue_size: int, optional
+        The maximum number of fetched pages waiting to be parsed.
+
+    log_every: int, optional
+        The number of parsed pages between two progress log messages.
+
+    kind: str, optional
+        The kind of pages parsed, recorded as the page label of the parse
+        time metric.
+
+    on_result: Callable[[object], None], optional
+        Called in the calling thread with the result of each page as soon as
+        it is parsed, in the order the pages finish parsing.
+
+    cancel: Event, optional
+        An event that stops the pipeline once it is set. The fetch threads are
+        not daemon threads, so without it the interpreter would wait for every
+        URL to be fetched before it exits. The result of the pages skipped is
+        None.
+
+    Returns
+    -------
+    list:
+        The result returned by parse for each URL.
+    """
+
+    if not urls:
+        return []
+
+    # The metrics recorded in the fetch threads keep the labels of the
+    # calling thread.
+    fetch = metrics.bind(fetch)
+
+    fetched = queue.Queue(maxsize=queue_size)
+    stats = {"fetched": 0, "parsed": 0, "max_depth": 0}
+    stats_lock = threading.Lock()
+    errors = []
+    start = time.monotonic()
+
+    def cancelled() -> bool:
+        return cancel is not None and cancel.is_set()
+
+    def fetch_one(index: int, url: str):
+        page = None
+        try:
+            if not cancelled():
+                page = fetch(url)
+        except Exception as error:
+            errors.append(error)
+        fetched.put((index, url, page))
+        with stats_lock:
+            stats["fetched"] += 1
+
+    fetch_pool = ThreadPoolExecutor(
+        max_workers=max(1, fetch_workers), thread_name_prefix="pipeline-fetch"
+    )
+    fetches = [
+        fetch_pool.submit(fetch_one, index, url) for index, url in enumerate(urls)
+    ]
+
+    # Move the fetched pages from the queue to the process pool, keeping at
+    # most two pages per parse worker in flight so the queue stays the only
+    # place pages wait in.
+    process_pool = get_process_pool(parse_workers)
+    results = [None] * len(urls)
+    in_flight = {}
+
+    def collect(futures):
+        for future in futures:
+            result, seconds = future.result()
+            results[in_flight.pop(future)] = result
+            metrics.observe("parse_seconds", seconds, page=kind)
+            if on_result is not None:
+                on_result(result)
+            stats["parsed"] += 1
+            if stats["parsed"] % log_every == 0:
+                log_progress(stats, fetched.qsize(), queue_size, start)
+
+    try:
+        for _ in range(len(urls)):
+            index, url, page = fetched.get()
+            stats["max_depth"] = max(stats["max_depth"], fetched.qsize() + 1)
+
+            if page is None or cancelled():
+                continue
+
+            if len(in_flight) >= 2 * parse_workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            in_flight[process_pool.submit(timed_parse, parse, page, url)] = index
+
+        collect(wait(in_flight).done)
+
+    # Cancel the work not started yet, and take the pages of the fetches
+    # already running off the queue until they are done, since they wait for
+    # room on the queue and would never finish otherwise.
+    except BaseException:
+        for future in in_flight:
+            future.cancel()
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+        while not all(future.done() for future in fetches):
+            try:
+                fetched.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        raise
+
+    finally:
+        fetch_pool.shutdown()
+
+    log_progress(stats, fetched.qsize(), queue_size, start)
+
+    if errors:
+        raise errors[0]
+
+    return results
+
+
+###############################################################################
+
+
+def timed_parse(parse: Callable[[str, str], object], page: str, url: str) -> tuple:
+    """
+    Returns the result of parse for a page and the number of seconds it took.
+    Called in the parse processes, whose own metrics are not collected.
+    """
+
+    start = time.perf_counter()
+    result = parse(page, url)
+    return result, time.perf_counter() - start
+
+
+###############################################################################
+
+
+def log_progress(stats: dict, depth: int, queue_size: int, start: float):
+    """
+    Log the throughput of both stages and the depth of the queue.
+    """
+
+    elapsed = max(time.monotonic() - start, 1e-9)
+    logger.info(
+        f"Pipeline: fetched {stats['fetched']} pages "
+        f"({stats['fetched'] / elapsed:.1f}/s), parsed {stats['parsed']} pages "
+        f"({stats['parsed'] / elapsed:.1f}/s), queue depth {depth}/{queue_size} "
+        f"(max {stats['max_depth']}).",
+        extra={"source": metrics.current_labels().get("source"), "stage": "pipeline"},
+    )
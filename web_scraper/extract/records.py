@@ -0,0 +1,106 @@
+"""
+
+    records.py
+
+    Description:
+
+        This module contains the record builder used by the extract modules to
+        accumulate article data. Records are appended to one list per column
+        and the dataframe is only created once all records have been
+        collected. Growing a dataframe with pd.concat copies every row that
+        was collected so far on each call, so collecting n articles that way
+        costs O(n^2), where appending to the column lists costs O(n).
+
+        The scheduler hands each source a builder to add its articles to as
+        they are collected, so the articles of a source that runs out of time
+        are still kept. The dataframe can be created while another thread is
+        still adding records.
+
+    Classes:
+
+        ArticleRecords
+
+"""
+
+###############################################################################
+
+import pandas as pd
+
+###############################################################################
+
+
+class ArticleRecords:
+    """
+    A columnar builder for article data.
+
+    Parameters
+    ----------
+    columns: list[str], optional
+        The names of the columns in the order they should appear in the
+        dataframe. If no columns are provided the columns of the first record
+        added are used.
+
+    labels: dict, optional
+        Values added as a column to every record, such as the source the
+        articles were collected from.
+    """
+
+    def __init__(self, columns: list[str] = None, labels: dict = None):
+        self.columns = None
+        self.data = {}
+        self.labels = dict(labels or {})
+        if columns is not None:
+            self._set_columns(columns)
+
+    def __len__(self) -> int:
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def _set_columns(self, columns: list[str]):
+        # The lists are created before the columns are set, for threads
+        # creating the dataframe at the same time.
+        self.data = {column: [] for column in columns}
+        self.columns = list(columns)
+
+    def append(self, record: dict):
+        """
+        Add a single record, a dictionary mapping each column to a value.
+        """
+
+        if self.columns is None:
+            self._set_columns(record)
+
+        for column in self.columns:
+            self.data[column].append(record[column])
+
+    def extend(self, records: dict):
+        """
+        Add several records at once from a dictionary mapping each column to
+        a list of values, such as the dictionary returned by
+        medium.get_article_data().
+        """
+
+        if self.columns is None:
+            self._set_columns(records)
+
+        for column in self.columns:
+            self.data[column].extend(records[column])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Returns a dataframe containing all the records that were added. If
+        another thread is adding a record at the same time, the columns it
+        has not reached yet are shorter and the record is left out.
+        """
+
+        columns, data = self.columns, self.data
+        if columns is None:
+            return pd.DataFrame()
+
+        rows = min(len(data[column]) for column in columns)
+        if any(len(data[column]) != rows for column in columns):
+            data = {column: data[column][:rows] for column in columns}
+
+        df = pd.DataFrame(data, columns=columns)
+        for column, value in self.labels.items():
+            df[column] = value
+        return df
@@ -0,0 +1,234 @@
+"""
+
+    scheduler.py
+
+    Description:
+
+        This module contains the code used for running the data collection
+        functions of every website and API in the website dataset at the same
+        time. Each source runs in its own thread with its own timeout budget so
+        that one slow or failing source cannot hold up the others. Each source
+        adds its articles to an ArticleRecords builder of its own as it
+        collects them, so the articles a source collected before it ran out of
+        time are still kept. A source that runs out of time is also told to
+        stop through a cancellation event of its own, since its thread cannot
+        be stopped from the outside, and the sources stop starting new
+        requests once it is set.
+
+        Every metric recorded while a source runs is labeled with the name of
+        the source, and the time each source took, the rows it produced and
+        whether it failed or timed out are recorded as well.
+
+    Functions:
+
+        run_sources(sources, logger)
+        run_source(name, function, records, cancel, results)
+        label_source(function, source, topic, records, cancel)
+
+"""
+
+###############################################################################
+
+import logging
+import threading
+import time
+import traceback
+from typing import Callable
+
+import pandas as pd
+
+import metrics
+from records import ArticleRecords
+
+###############################################################################
+
+
+def run_sources(
+    sources: list[
+        tuple[str, Callable[[ArticleRecords, threading.Event], pd.DataFrame], float]
+    ],
+    logger: logging.Logger = None,
+) -> tuple[list[pd.DataFrame], dict[str, str]]:
+    """
+    Run the data collection function of every source concurrently and wait
+    for each source until its timeout budget runs out. Sources that raise an
+    error are skipped, and only the articles collected so far are kept for
+    sources that run out of time, which are cancelled. The results of all
+    other sources are still returned.
+
+    Parameters
+    ----------
+    sources: list[tuple[str, Callable[[ArticleRecords, Event], DataFrame], float]]
+        A list of (name, function, timeout) tuples. The function takes the
+        records the source adds its articles to as it collects them and the
+        event set when the source runs out of time, and returns the article
+        data for the source. The timeout is the number of seconds the source
+        is allowed to run for, measured from the moment all sources are
+        started.
+
+    logger: Logger, optional
+        The logger used to report failed and timed out sources.
+
+    Returns
+    -------
+    tuple[list[DataFrame], dict[str, str]]:
+        The dataframes returned by the sources that completed and the
+        articles collected by the sources that timed out, in the same order
+        as the sources, and a dictionary mapping the name of each source that
+        did not complete to the reason it failed.
+    """
+
+    results = {}
+    threads = []
+
+    # Daemon threads are used so that a source that hangs past its budget
+    # does not keep the interpreter alive once the run has finished.
+    start = time.monotonic()
+    for name, function, timeout in sources:
+        records = ArticleRecords()
+        cancel = threading.Event()
+        thread = threading.Thread(
+            target=run_source,
+            args=(name, function, records, cancel, results),
+            daemon=True,
+        )
+        thread.start()
+        threads.append((name, thread, timeout, records, cancel))
+
+    frames = []
+    failures = {}
+    for name, thread, timeout, records, cancel in threads:
+        thread.join(max(0.0, start + timeout - time.monotonic()))
+
+        if thread.is_alive():
+            # The source is told to stop and winds down in the background,
+            # the articles it collected until now are kept.
+            cancel.set()
+            partial = records.to_dataframe()
+            failures[name] = (
+                f"Timed out after {timeout} seconds, "
+                f"kept {len(partial)} articles collected so far."
+            )
+            metrics.increment("source_timeouts_total", source=name)
+            if len(partial):
+                frames.append(partial)
+                metrics.increment("rows_produced_total", len(partial), source=name)
+        elif "error" in results[name]:
+            failures[name] = results[name]["error"]
+        else:
+            frames.append(results[name]["data"])
+
+    for name, reason in failures.items():
+        if logger:
+            logger.warning(
+                f"Source '{name}' did not complete: {reason}",
+                extra={"source": name, "stage": "extract"},
+            )
+        else:
+            print(f"Source '{name}' did not complete: {reason}")
+
+    return frames, failures
+
+
+###############################################################################
+
+
+def run_source(
+    name: str,
+    function: Callable[[ArticleRecords, threading.Event], pd.DataFrame],
+    records: ArticleRecords,
+    cancel: threading.Event,
+    results: dict,
+):
+    """
+    Run the data collection function of a single source and store either the
+    returned dataframe or the traceback of the error raised in the results
+    dictionary under the name of the source.
+
+    Parameters
+    ----------
+    name: str
+        The name of the source.
+
+    function: Callable[[ArticleRecords, Event], DataFrame]
+        The data collection function of the source.
+
+    records: ArticleRecords
+        The records the source adds its articles to as it collects them.
+
+    cancel: Event
+        The event set when the source runs out of time.
+
+    results: dict
+        The dictionary shared by all sources that the result is stored in.
+    """
+
+    with metrics.labels(source=name):
+        try:
+            with metrics.timer("source_seconds"):
+                data = function(records, cancel)
+            results[name] = {"data": data}
+
+            # The rows of a source that ran out of time were counted when its
+            # partial articles were kept.
+            if not cancel.is_set():
+                metrics.increment("rows_produced_total", len(data))
+        except Exception as error:
+            metrics.increment("source_errors_total")
+            results[name] = {
+                "error": "".join(
+                    traceback.format_exception(None, error, error.__traceback__)
+                )
+            }
+
+
+###############################################################################
+
+
+def label_source(
+    function: Callable[..., pd.DataFrame],
+    source: str,
+    topic: str,
+    records: ArticleRecords = None,
+    cancel: threading.Event = None,
+) -> pd.DataFrame:
+    """
+    Run a data collection function and add source and topic columns to the
+    dataframe it returns, and to the records it adds its articles to, so the
+    articles of every source can be told apart once the results are merged.
+    Used with functools.partial to build the function of a source.
+
+    Parameters
+    ----------
+    function: Callable[..., DataFrame]
+        The data collection function of the source, which takes the records
+        and the cancellation event as the records and cancel keyword
+        arguments.
+
+    source: str
+        The name of the module that collected the articles, e.g. medium.
+
+    topic: str
+        The topic of the source in the website dataset.
+
+    records: ArticleRecords, optional
+        The records the source adds its articles to as it collects them.
+
+    cancel: Event, optional
+        The event set when the source runs out of time.
+
+    Returns
+    -------
+    DataFrame:
+        The article data with the source and topic columns added.
+    """
+
+    if records is not None:
+        records.labels.update(source=source, topic=topic)
+        df = function(records=records, cancel=cancel)
+    else:
+        df = function()
+
+    df["source"] = source
+    df["topic"] = topic
+    return df
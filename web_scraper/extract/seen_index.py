@@ -0,0 +1,219 @@
+"""
+
+    seen_index.py
+
+    Description:
+
+        This module contains the index of article URLs that have already been
+        collected. The extract modules consult the index before fetching an
+        article so that each run only pays for new articles.
+
+        Each URL is canonicalized and reduced to a 64-bit hash. The hashes are
+        stored on disk as a sorted NumPy array which is memory mapped when the
+        index is loaded, so opening an index with millions of entries is
+        instant and a lookup is a binary search. With 64-bit hashes the chance
+        of a new URL colliding with one of ten million stored URLs is below
+        one in a million.
+
+    Classes:
+
+        SeenUrlIndex
+
+    Variables:
+
+        tracking_parameters
+
+    Functions:
+
+        canonicalize_url(url)
+        is_tracking_parameter(name)
+        hash_urls(urls)
+
+"""
+
+###############################################################################
+
+import hashlib
+import os
+import threading
+from typing import Iterable
+from urllib.parse import urlsplit, urlunsplit
+
+import numpy as np
+
+###############################################################################
+
+# The query parameters, besides the utm_ parameters, that are removed from
+# URLs when they are canonicalized.
+tracking_parameters = {
+    "fbclid",
+    "gclid",
+    "mc_cid",
+    "mc_eid",
+    "ref",
+    "ref_src",
+    "source",
+}
+
+###############################################################################
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Returns the canonical form of the provided URL. Everything after
+    '?source' is removed, as is done when collecting medium links, along with
+    tracking parameters such as utm_source, any fragment and trailing slash,
+    and the scheme and host are lowercased.
+    """
+
+    parts = urlsplit(url.split("?source")[0].strip())
+    path = parts.path.rstrip("/")
+
+    query = parts.query
+    if query:
+        query = "&".join(
+            parameter
+            for parameter in query.split("&")
+            if not is_tracking_parameter(parameter.split("=", 1)[0])
+        )
+
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+
+###############################################################################
+
+
+def is_tracking_parameter(name: str) -> bool:
+    """
+    Returns whether the provided query parameter name is one added to links
+    to track where visitors came from, which does not change the page.
+    """
+
+    name = name.lower()
+    return name.startswith("utm_") or name in tracking_parameters
+
+
+###############################################################################
+
+
+def hash_urls(urls: Iterable[str]) -> np.ndarray:
+    """
+    Returns an array with the 64-bit hash of the canonical form of each URL.
+    """
+
+    return np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(
+                    canonicalize_url(url).encode("utf-8"), digest_size=8
+                ).digest(),
+                "little",
+            )
+            for url in urls
+        ),
+        dtype=np.uint64,
+    )
+
+
+###############################################################################
+
+
+class SeenUrlIndex:
+    """
+    A persistent set of the URLs of collected articles.
+
+    Parameters
+    ----------
+    path: str
+        The .npy file the index is stored in. If the file does not exist the
+        index starts out empty.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = set()
+
+        if os.path.exists(path):
+            self.hashes = np.load(path, mmap_mode="r")
+        else:
+            self.hashes = np.empty(0, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        # The pending hashes never include a hash of the saved array.
+        return len(self.hashes) + len(self.pending)
+
+    def __contains__(self, url: str) -> bool:
+        return bool(self.contains(url)[0])
+
+    def contains(self, urls: Iterable[str]) -> np.ndarray:
+        """
+        Returns a boolean array indicating for each URL (or for the single URL
+        provided) whether it is in the index.
+        """
+
+        if isinstance(urls, str):
+            urls = [urls]
+
+        hashes = hash_urls(urls)
+        found = self._saved(hashes)
+
+        with self.lock:
+            if self.pending:
+                found |= np.isin(hashes, np.fromiter(self.pending, dtype=np.uint64))
+
+        return found
+
+    def _saved(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Returns a boolean array indicating for each hash whether it is in the
+        sorted array of saved hashes.
+        """
+
+        saved = self.hashes
+        positions = np.searchsorted(saved, hashes)
+        found = positions < len(saved)
+        found[found] = saved[positions[found]] == hashes[found]
+        return found
+
+    def add(self, urls: Iterable[str]):
+        """
+        Add the provided URLs to the index. The URLs are only written to disk
+        when save() is called. URLs that are already saved are not added
+        again.
+        """
+
+        if isinstance(urls, str):
+            urls = [urls]
+
+        hashes = hash_urls(urls)
+
+        # The saved array is looked up while holding the lock, so a save()
+        # cannot move the hash into it between the lookup and the update.
+        with self.lock:
+            self.pending.update(hashes[~self._saved(hashes)].tolist())
+
+    def save(self):
+        """
+        Merge the URLs added since the index was loaded into the sorted array
+        and write it to disk.
+        """
+
+        with self.lock:
+            if not self.pending:
+                return
+
+            pending = np.fromiter(self.pending, dtype=np.uint64)
+            hashes = np.union1d(np.asarray(self.hashes), pending)
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            # np.save appends .npy to names that do not already end with it.
+            temporary_file = self.path + ".tmp.npy"
+            np.save(temporary_file, hashes)
+            os.replace(temporary_file, self.path)
+
+            self.hashes = np.load(self.path, mmap_mode="r")
+            self.pending = set()
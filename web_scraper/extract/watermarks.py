@@ -0,0 +1,175 @@
+"""
+
+    watermarks.py
+
+    Description:
+
+        This module contains the store of high-water marks used for
+        incremental data collection. A high-water mark records the newest
+        item collected for a key, such as the publish time of the newest
+        article for a News API topic, so that the next run can ask only for
+        newer items. The marks are stored in a JSON file.
+
+        The updates a source makes while it runs can be held back in
+        PendingMarks and only applied to the store once the source completes,
+        so the marks of a source that fails or runs out of time stay where
+        they were and its articles are requested again by the next run.
+
+    Classes:
+
+        HighWaterMarks
+        PendingMarks
+
+"""
+
+###############################################################################
+
+import json
+import os
+import threading
+
+###############################################################################
+
+
+class HighWaterMarks:
+    """
+    A persistent mapping of keys to the newest value seen for each key.
+
+    Parameters
+    ----------
+    path: str
+        The JSON file the marks are stored in. If the file does not exist the
+        store starts out empty.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.marks = {}
+
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                self.marks = json.load(file)
+
+    def get(self, key: str, default=None):
+        """
+        Returns the mark for the provided key, or default if there is none.
+        """
+
+        with self.lock:
+            return self.marks.get(key, default)
+
+    def update(self, key: str, value):
+        """
+        Raise the mark for the provided key to value. Marks never move
+        backwards, a value lower than the current mark is ignored. Values
+        must be comparable with each other, such as ISO 8601 timestamps in
+        the same format or integers.
+        """
+
+        with self.lock:
+            if key not in self.marks or value > self.marks[key]:
+                self.marks[key] = value
+
+    def set(self, key: str, value):
+        """
+        Set the mark for the provided key to value, even if it is lower than
+        the current mark, or remove the mark if value is None. Used for
+        cursors that move backwards, such as the end of a window of older
+        items still being collected.
+        """
+
+        with self.lock:
+            if value is None:
+                self.marks.pop(key, None)
+            else:
+                self.marks[key] = value
+
+    def pending(self) -> "PendingMarks":
+        """
+        Returns a view of the marks whose updates are held back until it is
+        committed.
+        """
+
+        return PendingMarks(self)
+
+    def save(self):
+        """
+        Write the marks to disk.
+        """
+
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            temporary_file = self.path + ".tmp"
+            with open(temporary_file, "w") as file:
+                json.dump(self.marks, file, indent=4, sort_keys=True)
+            os.replace(temporary_file, self.path)
+
+
+###############################################################################
+
+
+class PendingMarks:
+    """
+    The updates of a single source to a HighWaterMarks store, held back until
+    they are committed. Marks that were not updated are read from the store.
+
+    Parameters
+    ----------
+    marks: HighWaterMarks
+        The store the updates are applied to when committed.
+    """
+
+    def __init__(self, marks: HighWaterMarks):
+        self.marks = marks
+        self.lock = threading.Lock()
+
+        # The method of the store each held back update is applied with, and
+        # the value, for each key.
+        self.updates = {}
+
+    def get(self, key: str, default=None):
+        """
+        Returns the mark for the provided key, including the updates held
+        back, or default if there is none.
+        """
+
+        with self.lock:
+            if key in self.updates:
+                value = self.updates[key][1]
+                return default if value is None else value
+        return self.marks.get(key, default)
+
+    def update(self, key: str, value):
+        """
+        Raise the mark for the provided key to value once committed. A value
+        lower than the current mark is ignored.
+        """
+
+        current = self.get(key)
+        if current is None or value > current:
+            with self.lock:
+                self.updates[key] = ("update", value)
+
+    def set(self, key: str, value):
+        """
+        Set the mark for the provided key to value once committed, or remove
+        it if value is None.
+        """
+
+        with self.lock:
+            self.updates[key] = ("set", value)
+
+    def commit(self):
+        """
+        Apply the updates held back to the store.
+        """
+
+        with self.lock:
+            updates, self.updates = self.updates, {}
+
+        for key, (method, value) in updates.items():
+            getattr(self.marks, method)(key, value)
@@ -0,0 +1,467 @@
+"""
+
+    email_ingest.py
+
+    Description:
+
+        This module contains the ingestion of the settings and preferences
+        users send in by email. Each line of an email can hold a command:
+
+            subscribe
+            unsubscribe
+            topic add <topic>
+            topic remove <topic>
+            like <url>
+            dislike <url>
+            source add <class> <name> <topic> <url>
+            source remove <url>
+
+        Only the messages with a UID above the UID high-water mark of the
+        mailbox are fetched, all of them with a single UID FETCH command, so a
+        run never reads the rest of the mailbox again. The commands of every
+        message are parsed in one pass, and only the last command of each
+        user for the same setting is kept. The changes are then applied to
+        the preference store, with one executemany per kind of change, and to
+        the website dataset in a single transaction. The high-water mark is
+        only raised once the transaction is committed, so a failed run reads
+        the same messages again.
+
+        Every command changes the state of the app, so commands are only
+        accepted when the receiving mail server verified the domain of the
+        sender. The From header alone can be forged, so the
+        Authentication-Results header the server added must report a passing
+        DMARC check or DKIM signature for the domain of the sender. Source
+        commands change the websites collected for every user, so they are
+        also only accepted from the owner of the app.
+
+    Variables:
+
+        command_pattern
+
+    Classes:
+
+        Command
+
+    Functions:
+
+        fetch_new_messages(imap, watermarks, mailbox)
+        message_commands(uid, message, authserv_id)
+        sender_verified(message, sender, authserv_id)
+        parse_commands(messages, authserv_id)
+        latest_commands(commands)
+        apply_source_commands(sites, commands, owner)
+        write_csv(df, path)
+        ingest(imap, store, sites_file, watermarks, owner, mailbox, logger,
+            authserv_id)
+
+"""
+
+###############################################################################
+
+import email
+import email.message
+import email.policy
+import email.utils
+import logging
+import os
+import re
+from typing import NamedTuple
+
+import pandas as pd
+
+from preferences import PreferenceStore
+from seen_index import canonicalize_url
+from watermarks import HighWaterMarks
+
+###############################################################################
+
+# A command on a line of its own. The arguments are the rest of the line.
+command_pattern = re.compile(
+    r"^[ \t]*(subscribe|unsubscribe|topic|like|dislike|source)\b[ \t]*(.*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+###############################################################################
+
+
+class Command(NamedTuple):
+    """
+    A command parsed from an email, and whether the receiving mail server
+    verified the domain of its sender.
+    """
+
+    uid: int
+    sender: str
+    name: str
+    arguments: tuple
+    verified: bool = False
+
+
+###############################################################################
+
+
+def fetch_new_messages(
+    imap, watermarks: HighWaterMarks, mailbox: str = "INBOX"
+) -> tuple[str, list[tuple[int, bytes]]]:
+    """
+    Fetch the messages of the mailbox with a UID above its high-water mark.
+
+    Parameters
+    ----------
+    imap: IMAP4
+        A logged in imaplib connection, or an object with the same select(),
+        response() and uid() methods.
+
+    watermarks: HighWaterMarks
+        The high-water marks holding the highest UID already ingested.
+
+    mailbox: str, optional
+        The mailbox to read.
+
+    Returns
+    -------
+    tuple[str, list[tuple[int, bytes]]]:
+        The high-water mark key of the mailbox and the UID and raw content of
+        each new message, in UID order.
+    """
+
+    imap.select(mailbox, readonly=True)
+
+    # UIDs are only valid for the same UIDVALIDITY of a mailbox, so the mark
+    # is kept per UIDVALIDITY. If it changes every message is read again.
+    _, validity = imap.response("UIDVALIDITY")
+    key = f"imap:{mailbox}:{int(validity[0])}"
+    last_uid = watermarks.get(key, 0)
+
+    # A UID range n:* always includes the highest UID, even when it is below
+    # n, so the UIDs are filtered as well.
+    _, data = imap.uid("SEARCH", None, f"UID {last_uid + 1}:*")
+    uids = [int(uid) for uid in data[0].split() if int(uid) > last_uid]
+    if not uids:
+        return key, []
+
+    _, data = imap.uid("FETCH", ",".join(map(str, uids)), "(BODY.PEEK[])")
+
+    messages = []
+    for item in data:
+        if isinstance(item, tuple):
+            uid = re.search(rb"UID (\d+)", item[0])
+            messages.append((int(uid.group(1)), item[1]))
+
+    return key, sorted(messages)
+
+
+###############################################################################
+
+
+def message_commands(
+    uid: int, message: bytes, authserv_id: str = None
+) -> list[Command]:
+    """
+    Returns the commands of the plain text body of a message. Quoted lines of
+    earlier messages and the signature are ignored. See sender_verified() for
+    authserv_id.
+    """
+
+    message = email.message_from_bytes(message, policy=email.policy.default)
+    sender = email.utils.parseaddr(message.get("From", ""))[1].lower()
+    body = message.get_body(preferencelist=("plain",))
+    if not sender or body is None:
+        return []
+
+    verified = sender_verified(message, sender, authserv_id)
+
+    text = body.get_content().split("\n-- \n")[0]
+    text = "\n".join(line for line in text.splitlines() if not line.startswith(">"))
+
+    return [
+        Command(
+            uid,
+            sender,
+            match.group(1).lower(),
+            tuple(match.group(2).split()),
+            verified,
+        )
+        for match in command_pattern.finditer(text)
+    ]
+
+
+###############################################################################
+
+
+def sender_verified(
+    message: email.message.EmailMessage, sender: str, authserv_id: str = None
+) -> bool:
+    """
+    Returns whether the receiving mail server verified the domain of the
+    sender. The server adds its Authentication-Results header above every
+    other header, including any the sender wrote, so only the first one is
+    read. It must report a passing DMARC check for the domain of the From
+    header, or a passing DKIM signature of that domain.
+
+    Parameters
+    ----------
+    message: EmailMessage
+        The message.
+
+    sender: str
+        The address of the From header of the message.
+
+    authserv_id: str, optional
+        The name the receiving server gives itself in its headers, such as
+        mx.google.com. If provided, the first header must have been added by
+        that server.
+    """
+
+    headers = message.get_all("Authentication-Results") or []
+    if not headers:
+        return False
+
+    results = str(headers[0]).lower()
+    if authserv_id is not None and (
+        results.split(";", 1)[0].split()[:1] != [authserv_id.lower()]
+    ):
+        return False
+
+    # The domain must end the property, so example.com.evil.org does not pass
+    # as example.com.
+    domain = re.escape(sender.rpartition("@")[2])
+    end = r"(?![\w.-])"
+    return bool(
+        re.search(rf"\bdmarc=pass\b[^;]*\bheader\.from={domain}{end}", results)
+        or re.search(
+            rf"\bdkim=pass\b[^;]*\bheader\.(?:d=|i=[^;\s]*@){domain}{end}", results
+        )
+    )
+
+
+###############################################################################
+
+
+def parse_commands(
+    messages: list[tuple[int, bytes]], authserv_id: str = None
+) -> list[Command]:
+    """
+    Returns the commands of every message, in UID order. See
+    sender_verified() for authserv_id.
+    """
+
+    return [
+        command
+        for uid, message in messages
+        for command in message_commands(uid, message, authserv_id)
+    ]
+
+
+###############################################################################
+
+
+def latest_commands(commands: list[Command]) -> dict[str, list[Command]]:
+    """
+    Returns the last valid command of each user for each setting, grouped by
+    the kind of change: subscription, topic, feedback and source. Commands
+    with missing arguments are dropped.
+    """
+
+    latest = {}
+    for command in commands:
+        name, arguments = command.name, command.arguments
+
+        # The action of topic and source commands is case insensitive.
+        if name in ("topic", "source") and arguments:
+            arguments = (arguments[0].lower(),) + arguments[1:]
+            command = command._replace(arguments=arguments)
+
+        if name in ("subscribe", "unsubscribe") and not arguments:
+            key = ("subscription", command.sender)
+        elif (
+            name == "topic"
+            and len(arguments) == 2
+            and arguments[0] in ("add", "remove")
+        ):
+            key = ("topic", command.sender, arguments[1].lower())
+        elif name in ("like", "dislike") and len(arguments) == 1:
+            key = ("feedback", command.sender, canonicalize_url(arguments[0]))
+        elif name == "source" and (
+            (arguments[:1] == ("add",) and len(arguments) == 5)
+            or (arguments[:1] == ("remove",) and len(arguments) == 2)
+        ):
+            key = ("source", command.sender, canonicalize_url(arguments[-1]))
+        else:
+            continue
+
+        # Commands are in UID order, so later commands replace earlier ones.
+        latest.pop(key, None)
+        latest[key] = command
+
+    groups = {"subscription": [], "topic": [], "feedback": [], "source": []}
+    for key, command in latest.items():
+        groups[key[0]].append(command)
+    return groups
+
+
+###############################################################################
+
+
+def apply_source_commands(
+    sites: pd.DataFrame, commands: list[Command], owner: str
+) -> pd.DataFrame:
+    """
+    Returns the website dataset with the source commands of the owner
+    applied. Commands from other senders, or whose sender was not verified,
+    are ignored.
+    """
+
+    commands = [
+        command
+        for command in commands
+        if command.sender == owner.lower() and command.verified
+    ]
+    if not commands:
+        return sites
+
+    urls = {canonicalize_url(command.arguments[-1]) for command in commands}
+    sites = sites[~sites["url"].astype(str).map(canonicalize_url).isin(urls)]
+
+    added = pd.DataFrame(
+        [
+            dict(zip(["class", "name", "topic", "url"], command.arguments[1:]))
+            for command in commands
+            if command.arguments[0] == "add"
+        ],
+        columns=["class", "name", "topic", "url"],
+    )
+
+    return pd.concat([sites, added], ignore_index=True)[sites.columns]
+
+
+###############################################################################
+
+
+def write_csv(df: pd.DataFrame, path: str):
+    """
+    Write the provided data to a CSV file, replacing it atomically.
+    """
+
+    temporary_file = path + ".tmp"
+    df.to_csv(temporary_file, index=False)
+    os.replace(temporary_file, path)
+
+
+###############################################################################
+
+
+def ingest(
+    imap,
+    store: PreferenceStore,
+    sites_file: str,
+    watermarks: HighWaterMarks,
+    owner: str,
+    mailbox: str = "INBOX",
+    logger: logging.Logger = None,
+    authserv_id: str = None,
+) -> int:
+    """
+    Apply the commands of the new messages of the mailbox to the preference
+    store and the website dataset in one transaction, and raise the UID
+    high-water mark of the mailbox.
+
+    Parameters
+    ----------
+    imap: IMAP4
+        A logged in imaplib connection.
+
+    store: PreferenceStore
+        The store of the users' settings and preferences.
+
+    sites_file: str
+        The CSV file of the websites and APIs articles are collected from.
+
+    watermarks: HighWaterMarks
+        The high-water marks holding the highest UID already ingested. The
+        marks are updated but not saved.
+
+    owner: str
+        The email address of the owner of the app, the only sender allowed
+        to change the sources. The commands of every sender are only applied
+        from messages whose sender was verified.
+
+    mailbox: str, optional
+        The mailbox to read.
+
+    logger: Logger, optional
+        The logger the number of messages and commands is logged to. If no
+        logger is provided it is printed.
+
+    authserv_id: str, optional
+        The name the receiving mail server gives itself in the
+        Authentication-Results headers it adds, see sender_verified().
+
+    Returns
+    -------
+    int:
+        The number of commands applied.
+    """
+
+    key, messages = fetch_new_messages(imap, watermarks, mailbox)
+    if not messages:
+        return 0
+
+    # The commands of unverified senders, whose From header may be forged,
+    # and the source commands of senders other than the owner are dropped
+    # before the latest command of each setting is selected, so they cannot
+    # replace the commands of the user they claim to be from.
+    commands = parse_commands(messages, authserv_id)
+    unverified = sum(not c.verified for c in commands)
+    commands = [
+        c
+        for c in commands
+        if c.verified and (c.name != "source" or c.sender == owner.lower())
+    ]
+    groups = latest_commands(commands)
+
+    sites = pd.read_csv(sites_file)
+    updated_sites = apply_source_commands(sites, groups["source"], owner)
+
+    replaced = False
+    try:
+        with store.connection:
+            store.set_subscriptions(
+                [(c.sender, c.name == "subscribe") for c in groups["subscription"]]
+            )
+            store.set_topics(
+                [
+                    (c.sender, c.arguments[1].lower(), c.arguments[0] == "add")
+                    for c in groups["topic"]
+                ]
+            )
+            store.set_feedback(
+                [
+                    (c.sender, canonicalize_url(c.arguments[0]), c.name == "like")
+                    for c in groups["feedback"]
+                ]
+            )
+
+            # The dataset is replaced last, just before the commit.
+            if updated_sites is not sites:
+                write_csv(updated_sites, sites_file)
+                replaced = True
+
+    # If the commit failed after the dataset was replaced, put it back.
+    except Exception:
+        if replaced:
+            write_csv(sites, sites_file)
+        raise
+
+    watermarks.update(key, messages[-1][0])
+
+    applied = sum(len(commands) for commands in groups.values())
+    message = f"Ingested {applied} commands from {len(messages)} new emails."
+    if unverified:
+        message += f" Ignored {unverified} commands from unverified senders."
+    if logger is not None:
+        logger.info(message, extra={"stage": "ingest"})
+    else:
+        print(message)
+
+    return applied
@@ -0,0 +1,447 @@
+"""
+
+    dedup.py
+
+    Description:
+
+        This module contains the deduplication stage of the prepared article
+        data. The same story often reaches the article data more than once,
+        from medium and again from the News API under a syndicated URL, or
+        with tracking parameters added to its URL. An article is dropped when
+        an article already kept in this run has the same canonical URL, or
+        when an article already kept, in this run or an earlier one, has
+
+            - the same title and intro, compared by a 64-bit content hash, or
+            - a nearly identical title and intro.
+
+        Canonical URLs are not kept in the index. Articles whose canonical URL
+        was seen in an earlier run are skipped before they are fetched, by the
+        SeenUrlIndex the medium and News API sources are given.
+
+        Near duplicates are found with MinHash and locality sensitive hashing
+        (LSH). The title and intro of each article is reduced to a MinHash
+        signature, whose rows are grouped into bands. Two articles whose
+        shingles have a Jaccard similarity of s share at least one band with
+        probability 1 - (1 - s^r)^b for b bands of r rows, so only the
+        articles sharing a band with a new article are compared with it,
+        instead of every article in the history. The band keys, signatures and
+        content hashes are kept in a sorted index on disk, so each lookup is a
+        binary search.
+
+    Variables:
+
+        shingle_size
+        permutations
+        bands
+        similarity_threshold
+
+    Classes:
+
+        DuplicateIndex
+
+    Functions:
+
+        deduplicate(df, index, threshold, logger)
+        content_text(df)
+        content_hashes(texts)
+        minhash_signatures(texts)
+        band_keys(signatures)
+
+"""
+
+###############################################################################
+
+import hashlib
+import logging
+import os
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from seen_index import canonicalize_url
+
+###############################################################################
+
+# The number of consecutive words in each shingle of an article's text.
+shingle_size = 3
+
+# The number of hash functions in each MinHash signature, and the number of
+# bands the signature is split into for LSH. With 16 bands of 8 rows, articles
+# with a similarity of 0.8 share a band with a probability of 0.94, and
+# articles with a similarity of 0.4 with a probability of 0.01.
+permutations = 128
+bands = 16
+
+# The estimated Jaccard similarity above which two articles are duplicates.
+similarity_threshold = 0.8
+
+# The parameters of the hash functions. They are seeded so signatures stored
+# in an index stay comparable with the signatures of later runs.
+_random = np.random.default_rng(20220811)
+_multipliers = _random.integers(1, 2**63, permutations, dtype=np.uint64) | 1
+_increments = _random.integers(0, 2**63, permutations, dtype=np.uint64)
+_band_multipliers = _random.integers(1, 2**63, permutations, dtype=np.uint64) | 1
+_band_offsets = _random.integers(0, 2**63, bands, dtype=np.uint64)
+
+###############################################################################
+
+
+def content_text(df: pd.DataFrame) -> pd.Series:
+    """
+    Returns the title and intro of each article joined into a single string
+    with runs of whitespace collapsed, as compared for duplicates. The text
+    columns are expected to have been prepared with prepare_text_data().
+    """
+
+    title = df["title"].fillna("").astype(str)
+    intro = df["article_intro"].fillna("").astype(str)
+    return (title + " " + intro).map(lambda text: " ".join(text.split()))
+
+
+###############################################################################
+
+
+def content_hashes(texts: pd.Series) -> np.ndarray:
+    """
+    Returns the 64-bit hash of each text.
+    """
+
+    return np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(),
+                "little",
+            )
+            for text in texts
+        ),
+        dtype=np.uint64,
+        count=len(texts),
+    )
+
+
+###############################################################################
+
+
+def minhash_signatures(texts: pd.Series, block: int = 256) -> np.ndarray:
+    """
+    Returns the MinHash signature of the word shingles of each text, an array
+    with one row of permutations uint32 values per text. Texts without any
+    words get a signature of zeros, which is never compared.
+
+    The words of all texts are hashed once per distinct word, and the hash
+    functions are applied to the shingles of block texts at a time.
+    """
+
+    words = [text.split() for text in texts]
+    signatures = np.zeros((len(words), permutations), dtype=np.uint32)
+
+    vocabulary, codes = np.unique(
+        np.array([word for text in words for word in text], dtype=object),
+        return_inverse=True,
+    )
+    word_hashes = np.array(
+        [zlib.crc32(word.encode("utf-8")) for word in vocabulary], dtype=np.uint64
+    )[codes]
+    offsets = np.cumsum([0] + [len(text) for text in words])
+
+    for start in range(0, len(words), block):
+        shingles, owners = [], []
+        for position in range(start, min(start + block, len(words))):
+            first, last = offsets[position], offsets[position + 1]
+            hashes = word_hashes[first:last]
+            if not len(hashes):
+                continue
+            shingles.append(shingle_hashes(hashes))
+            owners.append(np.full(len(shingles[-1]), position))
+
+        if not shingles:
+            continue
+
+        shingles = np.concatenate(shingles)
+        owners = np.concatenate(owners)
+
+        # Multiply-shift hashing of the 32-bit shingle hashes, with the
+        # arithmetic wrapping around at 64 bits.
+        values = (shingles[:, None] * _multipliers + _increments) >> np.uint64(32)
+
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+        signatures[owners[starts]] = np.minimum.reduceat(values, starts, axis=0)
+
+    return signatures
+
+
+###############################################################################
+
+
+def shingle_hashes(word_hashes: np.ndarray) -> np.ndarray:
+    """
+    Returns the 32-bit hash of each shingle of shingle_size consecutive words,
+    given the hashes of the words of a text. Texts shorter than a shingle are
+    a single shingle.
+    """
+
+    size = min(shingle_size, len(word_hashes))
+    count = len(word_hashes) - size + 1
+
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        words = word_hashes[offset:][:count]
+        hashes = hashes * np.uint64(0x01000193) + words
+
+    return hashes & np.uint64(0xFFFFFFFF)
+
+
+###############################################################################
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """
+    Returns a 64-bit key for each band of each signature, an array with one
+    row of bands keys per signature. Each band has its own offset, so equal
+    rows in different bands do not give the same key.
+    """
+
+    rows = signatures.astype(np.uint64) * _band_multipliers
+    keys = rows.reshape(len(signatures), bands, -1).sum(axis=2, dtype=np.uint64)
+    return keys + _band_offsets
+
+
+###############################################################################
+
+
+class DuplicateIndex:
+    """
+    A persistent index of the content hashes, MinHash signatures and LSH band
+    keys of the articles kept so far.
+
+    Parameters
+    ----------
+    path: str
+        The .npz file the index is stored in. If the file does not exist the
+        index starts out empty.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.lock = threading.Lock()
+
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.signatures = np.empty((0, permutations), dtype=np.uint32)
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.owners = np.empty(0, dtype=np.int64)
+
+        if path is not None and os.path.exists(path):
+            with np.load(path) as data:
+                self.hashes = data["hashes"]
+                self.signatures = data["signatures"]
+                self.keys = data["keys"]
+                self.owners = data["owners"]
+
+        self.pending_hashes = set()
+        self.pending_signatures = []
+        self.pending_keys = {}
+
+    def __len__(self) -> int:
+        return len(self.signatures) + len(self.pending_signatures)
+
+    def contains_hash(self, value: int) -> bool:
+        """
+        Returns whether an article with the provided content hash was added.
+        """
+
+        position = np.searchsorted(self.hashes, np.uint64(value))
+        if position < len(self.hashes) and self.hashes[position] == value:
+            return True
+        return int(value) in self.pending_hashes
+
+    def candidates(self, keys: np.ndarray) -> list[int]:
+        """
+        Returns the positions of the added articles that share at least one
+        band key with the provided band keys.
+        """
+
+        left = np.searchsorted(self.keys, keys, side="left")
+        right = np.searchsorted(self.keys, keys, side="right")
+        found = [
+            self.owners[start:end] for start, end in zip(left, right) if end > start
+        ]
+
+        positions = set(np.concatenate(found).tolist()) if found else set()
+        for key in keys.tolist():
+            positions.update(self.pending_keys.get(key, ()))
+
+        return sorted(positions)
+
+    def signature(self, position: int) -> np.ndarray:
+        """
+        Returns the signature of the article added at the provided position.
+        """
+
+        if position < len(self.signatures):
+            return self.signatures[position]
+        return self.pending_signatures[position - len(self.signatures)]
+
+    def add(self, content_hash: int, signature: np.ndarray, keys: np.ndarray):
+        """
+        Add an article to the index. It is only written to disk when save()
+        is called.
+        """
+
+        with self.lock:
+            position = len(self)
+            self.pending_hashes.add(int(content_hash))
+            self.pending_signatures.append(signature)
+            for key in keys.tolist():
+                self.pending_keys.setdefault(key, []).append(position)
+
+    def save(self):
+        """
+        Merge the articles added since the index was loaded into the sorted
+        arrays and write them to disk.
+        """
+
+        with self.lock:
+            if not self.pending_signatures:
+                return
+
+            pending_keys = np.fromiter(
+                (
+                    key
+                    for key, positions in self.pending_keys.items()
+                    for _ in positions
+                ),
+                dtype=np.uint64,
+            )
+            pending_owners = np.fromiter(
+                (
+                    position
+                    for positions in self.pending_keys.values()
+                    for position in positions
+                ),
+                dtype=np.int64,
+            )
+
+            keys = np.concatenate([self.keys, pending_keys])
+            owners = np.concatenate([self.owners, pending_owners])
+            order = np.argsort(keys, kind="stable")
+
+            self.keys, self.owners = keys[order], owners[order]
+            self.hashes = np.union1d(
+                self.hashes, np.fromiter(self.pending_hashes, dtype=np.uint64)
+            )
+            self.signatures = np.concatenate(
+                [self.signatures, np.array(self.pending_signatures, dtype=np.uint32)]
+            )
+
+            self.pending_hashes = set()
+            self.pending_signatures = []
+            self.pending_keys = {}
+
+            if self.path is None:
+                return
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            # np.savez appends .npz to names that do not already end with it.
+            temporary_file = self.path + ".tmp.npz"
+            np.savez(
+                temporary_file,
+                hashes=self.hashes,
+                signatures=self.signatures,
+                keys=self.keys,
+                owners=self.owners,
+            )
+            os.replace(temporary_file, self.path)
+
+
+###############################################################################
+
+
+def deduplicate(
+    df: pd.DataFrame,
+    index: DuplicateIndex = None,
+    threshold: float = similarity_threshold,
+    logger: logging.Logger = None,
+) -> pd.DataFrame:
+    """
+    Remove the articles that duplicate an earlier article in the dataframe or
+    an article in the index, and add the articles that are kept to the index.
+    Canonical URLs are only compared within the dataframe.
+
+    Parameters
+    ----------
+    df: DataFrame
+        A pandas dataframe containing the prepared article data.
+
+    index: DuplicateIndex, optional
+        The index of the articles kept in earlier runs. If no index is
+        provided only duplicates within the dataframe are removed.
+
+    threshold: float, optional
+        The estimated Jaccard similarity of the title and intro shingles above
+        which two articles are duplicates.
+
+    logger: Logger, optional
+        The logger the number of duplicates removed is logged to. If no logger
+        is provided it is printed instead.
+
+    Returns
+    -------
+    DataFrame:
+        A pandas dataframe without the duplicate articles.
+    """
+
+    if not len(df):
+        return df
+
+    if index is None:
+        index = DuplicateIndex()
+
+    urls = df["url"].astype(str).map(canonicalize_url)
+    url_duplicates = urls.duplicated().to_numpy()
+
+    texts = content_text(df)
+    hashes = content_hashes(texts)
+    signatures = minhash_signatures(texts)
+    keys = band_keys(signatures)
+    minimum_matches = int(np.ceil(threshold * permutations))
+
+    keep = np.zeros(len(df), dtype=bool)
+    counts = {"url": int(url_duplicates.sum()), "content": 0, "near": 0}
+
+    for position in np.flatnonzero(~url_duplicates):
+        if index.contains_hash(hashes[position]):
+            counts["content"] += 1
+            continue
+
+        # Articles without any text cannot be compared by their content.
+        if texts.iat[position]:
+            matches = [
+                int(
+                    np.count_nonzero(index.signature(candidate) == signatures[position])
+                )
+                for candidate in index.candidates(keys[position])
+            ]
+            if matches and max(matches) >= minimum_matches:
+                counts["near"] += 1
+                continue
+
+            index.add(hashes[position], signatures[position], keys[position])
+
+        keep[position] = True
+
+    message = (
+        f"Removed {len(df) - keep.sum()} duplicate articles: {counts['url']} by "
+        f"URL, {counts['content']} by content and {counts['near']} near "
+        f"duplicates."
+    )
+    if logger is not None:
+        logger.info(message, extra={"stage": "dedup"})
+    else:
+        print(message)
+
+    return df[keep].reset_index(drop=True)
@@ -0,0 +1,354 @@
+"""
+
+    features.py
+
+    Description:
+
+        This module contains the feature store of the article recommender.
+        The prepared title, subtitle and article intro of each article are
+        turned into sparse TF-IDF vectors of hashed unigrams and bigrams.
+
+        With the hashing trick each term is mapped to a column by its hash, so
+        there is no vocabulary to fit and the articles of each run can be
+        vectorized on their own. The term frequencies of each run are stored
+        as a sparse matrix shard, and the number of articles each column
+        appears in is kept as running totals. The inverse document
+        frequencies are computed from the totals when the features are
+        loaded, so adding a run never requires refitting or rewriting the
+        shards of earlier runs.
+
+    Variables:
+
+        n_features
+        feature_columns
+
+    Classes:
+
+        FeatureStore
+
+    Functions:
+
+        hash_term_frequencies(texts, n_features)
+        vectorize(df, n_features)
+
+"""
+
+###############################################################################
+
+import glob
+import json
+import os
+import time
+import uuid
+import zlib
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+
+from seen_index import canonicalize_url, hash_urls
+
+###############################################################################
+
+# The number of hashed columns of each text column.
+n_features = 2**18
+
+# The text columns that are vectorized, each into its own block of columns.
+feature_columns = ["title", "subtitle", "article_intro"]
+
+###############################################################################
+
+
+def hash_term_frequencies(texts: pd.Series, n_features: int = n_features):
+    """
+    Returns the sublinear term frequencies, 1 + log(count), of the hashed
+    unigrams and bigrams of each text as a sparse matrix with one row per
+    text and n_features columns.
+
+    Each distinct word is hashed once, and the hash of each bigram is
+    combined from the hashes of its two words.
+
+    Parameters
+    ----------
+    texts: Series
+        A pandas series of prepared text.
+
+    n_features: int, optional
+        The number of columns terms are hashed into.
+
+    Returns
+    -------
+    csr_matrix:
+        The term frequencies of each text.
+    """
+
+    words = [text.split() if isinstance(text, str) else [] for text in texts]
+    lengths = np.array([len(text) for text in words], dtype=np.int64)
+
+    codes, vocabulary = pd.factorize(
+        np.array([word for text in words for word in text], dtype=object)
+    )
+    hashes = np.array(
+        [zlib.crc32(word.encode("utf-8")) for word in vocabulary], dtype=np.uint64
+    )[codes]
+
+    # A bigram is made of each word and the next one in the same text.
+    rows = np.repeat(np.arange(len(words)), lengths)
+    follows = np.flatnonzero(rows[1:] == rows[:-1]) if len(rows) else rows
+    bigrams = (hashes[follows] * np.uint64(0x01000193) + hashes[follows + 1]) ^ (
+        np.uint64(0x9E3779B9)
+    )
+
+    columns = np.concatenate([hashes, bigrams]) % np.uint64(n_features)
+    rows = np.concatenate([rows, rows[follows]])
+
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns.astype(np.int64))),
+        shape=(len(words), n_features),
+    )
+    counts.sum_duplicates()
+    counts.data = 1 + np.log(counts.data)
+    return counts
+
+
+###############################################################################
+
+
+def vectorize(df: pd.DataFrame, n_features: int = n_features):
+    """
+    Returns the hashed term frequencies of the text columns of the provided
+    articles side by side, one block of n_features columns per column in
+    feature_columns.
+    """
+
+    return sparse.hstack(
+        [
+            hash_term_frequencies(
+                df[column] if column in df else pd.Series([""] * len(df)),
+                n_features,
+            )
+            for column in feature_columns
+        ],
+        format="csr",
+    )
+
+
+###############################################################################
+
+
+class FeatureStore:
+    """
+    An on-disk store of the hashed term frequencies of every article, kept as
+    one sparse matrix shard per run, and of the document frequencies of every
+    column.
+
+    Parameters
+    ----------
+    directory: str
+        The directory the store is kept in. It is created if it does not
+        exist.
+
+    n_features: int, optional
+        The number of hashed columns of each text column. It must match the
+        number the store was created with.
+    """
+
+    def __init__(self, directory: str, n_features: int = n_features):
+        self.directory = directory
+        self.n_features = n_features
+        self.frequency_file = os.path.join(directory, "document-frequency.npy")
+        self.metadata_file = os.path.join(directory, "metadata.json")
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.documents = 0
+        self.document_frequency = np.zeros(
+            len(feature_columns) * n_features, dtype=np.int64
+        )
+
+        if os.path.exists(self.metadata_file):
+            with open(self.metadata_file, "r") as file:
+                metadata = json.load(file)
+
+            if metadata["n_features"] != n_features:
+                raise ValueError(
+                    f"The feature store in {directory} was created with "
+                    f"{metadata['n_features']} features per column, not {n_features}."
+                )
+
+            self.documents = metadata["documents"]
+            self.document_frequency = np.load(self.frequency_file)
+
+    def __len__(self) -> int:
+        return self.documents
+
+    def shards(self) -> list[str]:
+        """
+        Returns the paths of the shards in the order they were added.
+        """
+
+        return sorted(glob.glob(os.path.join(self.directory, "shard-*.npz")))
+
+    def add(self, df: pd.DataFrame) -> str:
+        """
+        Vectorize the provided articles, store their term frequencies as a
+        new shard and add them to the document frequencies.
+
+        Parameters
+        ----------
+        df: DataFrame
+            The prepared article data of the new articles.
+
+        Returns
+        -------
+        str:
+            The path of the shard written, or None if there were no articles.
+        """
+
+        if not len(df):
+            return None
+
+        frequencies = vectorize(df, self.n_features)
+        urls = df["url"].astype(str).map(canonicalize_url)
+        ids = hash_urls(urls)
+
+        # Shards are named by the time they were added so they sort in order.
+        name = f"shard-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        shard = os.path.join(self.directory, name + ".npz")
+        np.save(os.path.join(self.directory, name + ".ids.npy"), ids)
+        np.save(os.path.join(self.directory, name + ".urls.npy"), urls.to_numpy(str))
+        sparse.save_npz(shard, frequencies)
+
+        self.document_frequency += np.bincount(
+            frequencies.indices, minlength=len(self.document_frequency)
+        )
+        self.documents += len(df)
+        self._save()
+
+        return shard
+
+    def _save(self):
+        temporary_file = self.frequency_file + ".tmp.npy"
+        np.save(temporary_file, self.document_frequency)
+        os.replace(temporary_file, self.frequency_file)
+
+        temporary_file = self.metadata_file + ".tmp"
+        with open(temporary_file, "w") as file:
+            json.dump(
+                {"n_features": self.n_features, "documents": self.documents}, file
+            )
+        os.replace(temporary_file, self.metadata_file)
+
+    def urls(self, shards: list[str] = None) -> np.ndarray:
+        """
+        Returns the canonical URL of each article in the provided shards,
+        defaults to every shard, in the order load() returns the articles.
+        """
+
+        if shards is None:
+            shards = self.shards()
+
+        return np.concatenate(
+            [np.load(os.path.splitext(shard)[0] + ".urls.npy") for shard in shards]
+            or [np.empty(0, dtype=str)]
+        )
+
+    def idf(self) -> np.ndarray:
+        """
+        Returns the smoothed inverse document frequency of every column,
+        log((1 + n) / (1 + df)) + 1, from the articles added so far.
+        """
+
+        return (
+            np.log((1 + self.documents) / (1 + self.document_frequency)) + 1
+        ).astype(np.float32)
+
+    def load(self, shards: list[str] = None) -> tuple:
+        """
+        Load the TF-IDF vectors of the stored articles. The term frequencies
+        are weighted by the current inverse document frequencies and each row
+        is scaled to unit length.
+
+        Parameters
+        ----------
+        shards: list[str], optional
+            The shards to load, defaults to every shard.
+
+        Returns
+        -------
+        tuple[csr_matrix, ndarray]:
+            The TF-IDF vectors, one row per article, and the 64-bit hash of
+            the canonical URL of each article as computed by
+            seen_index.hash_urls().
+        """
+
+        if shards is None:
+            shards = self.shards()
+
+        if not shards:
+            return (
+                sparse.csr_matrix((0, len(self.document_frequency)), dtype=np.float32),
+                np.empty(0, dtype=np.uint64),
+            )
+
+        frequencies = sparse.vstack(
+            [sparse.load_npz(shard) for shard in shards], format="csr"
+        )
+        ids = np.concatenate(
+            [np.load(os.path.splitext(shard)[0] + ".ids.npy") for shard in shards]
+        )
+
+        return self._tfidf(frequencies), ids
+
+    def _tfidf(self, frequencies):
+        features = frequencies.multiply(self.idf()).tocsr()
+        norms = np.sqrt(np.asarray(features.multiply(features).sum(axis=1))).ravel()
+        norms[norms == 0] = 1
+        features = sparse.diags(1 / norms).dot(features).tocsr()
+
+        return features.astype(np.float32)
+
+    def select(self, ids: np.ndarray) -> tuple:
+        """
+        Load the TF-IDF vectors of the articles with the provided ids. Only
+        the shards holding at least one of the articles are read.
+
+        Parameters
+        ----------
+        ids: ndarray
+            The 64-bit hashes of the canonical URLs of the articles.
+
+        Returns
+        -------
+        tuple[csr_matrix, ndarray]:
+            The TF-IDF vectors of the articles found, in the order of ids, and
+            a boolean array marking which of the ids were found. Articles
+            stored more than once use their most recent vector.
+        """
+
+        ids = np.asarray(ids, dtype=np.uint64)
+        rows = []
+        found_ids = []
+
+        for shard in self.shards():
+            shard_ids = np.load(os.path.splitext(shard)[0] + ".ids.npy")
+            positions = np.flatnonzero(np.isin(shard_ids, ids))
+            if len(positions):
+                rows.append(sparse.load_npz(shard)[positions])
+                found_ids.append(shard_ids[positions])
+
+        if not rows:
+            return (
+                sparse.csr_matrix((0, len(self.document_frequency)), dtype=np.float32),
+                np.zeros(len(ids), dtype=bool),
+            )
+
+        frequencies = sparse.vstack(rows, format="csr")
+        found_ids = np.concatenate(found_ids)
+
+        # Later shards come last, so the last row of each id is kept.
+        row_of = {article: row for row, article in enumerate(found_ids)}
+        found = np.array([article in row_of for article in ids.tolist()], dtype=bool)
+        selected = [row_of[article] for article in ids[found].tolist()]
+
+        return self._tfidf(frequencies[selected]), found
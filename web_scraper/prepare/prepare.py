@@ -9,46 +9,217 @@
 
     Functions:
 
-        prepare_article_data(df)
+        prepare_article_data(df, reference_date, stages, stats)
+        article_data_stages(reference_date)
+        prepare_article_data_file(source, destination, chunksize,
+            reference_date, logger)
+        log_stage_throughput(stats, logger)
         prepare_text_data(df)
+        clean_text(string)
         replace_dash(string)
         replace_newline(string)
         remove_special_characters(string)
-        normalize_dates(df)
+        normalize_dates(df, reference_date)
         modify_date_string(date)
+        count_words(text)
         prepare_read_time(df)
 
 """
 
 ###############################################################################
 
-# import numpy as np
+import numpy as np
 import pandas as pd
 
 import unicodedata
 import re
 import datetime
+import logging
+import os
+import time
+from functools import partial
 
 ###############################################################################
 
+# The text columns prepared by prepare_text_data().
+text_columns = ["title", "subtitle", "article_intro"]
+
+# Every character that is not a lowercase letter, digit, whitespace, + or # is
+# removed from the text columns, after replacing dashes and newlines with
+# spaces. Once the text is normalized to ascii both steps are done at once by
+# bytes.translate(), with the bytes to delete taken from the same pattern
+# remove_special_characters() uses.
+special_characters = re.compile(r"[^a-z0-9\s\+\#]")
+dash_and_newline_table = bytes.maketrans(b"-\n", b"  ")
+special_character_bytes = bytes(
+    byte
+    for byte in range(128)
+    if byte != ord("-") and special_characters.match(chr(byte))
+)
+
+# The reading speed used to estimate the read time of articles without one,
+# and the average number of characters per word used to convert the number of
+# characters the News API truncated from an article into words.
+words_per_minute = 265
+characters_per_word = 6
+
+# A lookup table of the code points str.split() treats as whitespace. The
+# last is U+3000, the ideographic space, and the table ends with a False entry
+# for U+3001 that every higher code point is looked up as.
+is_whitespace = np.array([chr(code).isspace() for code in range(0x3002)])
 
-def prepare_article_data(df: pd.DataFrame) -> pd.DataFrame:
+###############################################################################
+
+
+def prepare_article_data(
+    df: pd.DataFrame,
+    reference_date: datetime.date = None,
+    stages: list = None,
+    stats: dict = None,
+) -> pd.DataFrame:
     """
     Perform all transformations necessary to prepare the article data
     for analysis and modeling.
 
+    The transformations are the stages returned by article_data_stages(),
+    applied in order. The same stages are applied to each chunk by
+    prepare_article_data_file(), so a whole dataframe and a file streamed in
+    chunks are prepared identically.
+
     Parameters
     ----------
     df: DataFrame
         A pandas dataframe containing all the collected article data.
 
+    reference_date: date, optional
+        The date the articles were scraped on, passed to normalize_dates().
+
+    stages: list, optional
+        The (name, function) pairs to apply, defaults to
+        article_data_stages(reference_date).
+
+    stats: dict, optional
+        If provided, the number of rows and seconds spent in each stage are
+        added to it, keyed by stage name.
+
     Returns
     -------
     DataFrame:
         A pandas dataframe containing the transformed article data.
     """
 
-    pass
+    if stages is None:
+        stages = article_data_stages(reference_date)
+
+    for name, function in stages:
+        start = time.perf_counter()
+        df = function(df)
+        if stats is not None:
+            rows, seconds = stats.get(name, (0, 0.0))
+            stats[name] = (rows + len(df), seconds + time.perf_counter() - start)
+
+    return df
+
+
+###############################################################################
+
+
+def article_data_stages(reference_date: datetime.date = None) -> list:
+    """
+    Returns the stages of prepare_article_data() as (name, function) pairs.
+    The read time is prepared first since it is estimated from the length of
+    the article, including the News API truncation marker, e.g. "[+794
+    chars]", which the text stage strips the brackets of.
+    """
+
+    return [
+        ("read_time", prepare_read_time),
+        ("text", prepare_text_data),
+        ("dates", partial(normalize_dates, reference_date=reference_date)),
+    ]
+
+
+###############################################################################
+
+
+def prepare_article_data_file(
+    source: str,
+    destination: str,
+    chunksize: int = 100000,
+    reference_date: datetime.date = None,
+    logger: logging.Logger = None,
+) -> int:
+    """
+    Prepare the article data stored in a CSV file, reading and writing it in
+    chunks so that the memory used stays bounded however large the file is.
+    Each prepared chunk is appended to a temporary file which replaces the
+    destination once every chunk is written, so the destination may be the
+    source file itself.
+
+    Parameters
+    ----------
+    source: str
+        The CSV file containing the collected article data.
+
+    destination: str
+        The CSV file the prepared article data is written to.
+
+    chunksize: int, optional
+        The number of rows prepared at a time.
+
+    reference_date: date, optional
+        The date the articles were scraped on, passed to normalize_dates().
+
+    logger: Logger, optional
+        The logger the throughput of each stage is logged to. If no logger is
+        provided it is printed instead.
+
+    Returns
+    -------
+    int:
+        The number of rows written.
+    """
+
+    stages = article_data_stages(reference_date)
+    stats = {}
+    rows = 0
+    temporary_file = destination + ".tmp"
+
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        chunk = prepare_article_data(chunk, stages=stages, stats=stats)
+        chunk.to_csv(
+            temporary_file,
+            mode="w" if rows == 0 else "a",
+            header=rows == 0,
+            index=False,
+        )
+        rows += len(chunk)
+
+    if rows:
+        os.replace(temporary_file, destination)
+
+    log_stage_throughput(stats, logger)
+    return rows
+
+
+###############################################################################
+
+
+def log_stage_throughput(stats: dict, logger: logging.Logger = None):
+    """
+    Log the number of rows each stage prepared per second, as collected by
+    prepare_article_data().
+    """
+
+    for name, (rows, seconds) in stats.items():
+        message = (
+            f"Prepare stage {name}: {rows} rows in {seconds:.2f} s "
+            f"({rows / max(seconds, 1e-9):,.0f} rows/s)."
+        )
+        if logger is not None:
+            logger.info(message, extra={"stage": name})
+        else:
+            print(message)
 
 
 ###############################################################################
@@ -70,47 +241,47 @@ def prepare_text_data(df: pd.DataFrame) -> pd.DataFrame:
         A pandas dataframe with all text columns transformed.
     """
 
-    # Replace any nulls with an empty string.
-    df["title"] = df["title"].fillna("")
-    df["subtitle"] = df["subtitle"].fillna("")
-    df["article_intro"] = df["article_intro"].fillna("")
+    # Replace any nulls with an empty string and clean all three columns in a
+    # single pass over their values.
+    values = df[text_columns].fillna("").to_numpy().ravel()
+    cleaned = np.array([clean_text(value) for value in values], dtype=object)
+    df[text_columns] = cleaned.reshape(-1, len(text_columns))
 
-    # Convert everything to lowercase.
-    df["title"] = df["title"].apply(str.lower)
-    df["subtitle"] = df["subtitle"].apply(str.lower)
-    df["article_intro"] = df["article_intro"].apply(str.lower)
+    return df
 
-    # Normalize all characters to utf-8.
-    normalize = (
-        lambda column: unicodedata.normalize("NFKD", column)
-        .encode("ascii", "ignore")
-        .decode("utf-8", "ignore")
-    )
-    df["title"] = df["title"].apply(normalize)
-    df["subtitle"] = df["subtitle"].apply(normalize)
-    df["article_intro"] = df["article_intro"].apply(normalize)
-
-    # Remove punctuation and special characters.
-    df["title"] = (
-        df["title"]
-        .apply(replace_dash)
-        .apply(replace_newline)
-        .apply(remove_special_characters)
-    )
-    df["subtitle"] = (
-        df["subtitle"]
-        .apply(replace_dash)
-        .apply(replace_newline)
-        .apply(remove_special_characters)
-    )
-    df["article_intro"] = (
-        df["article_intro"]
-        .apply(replace_dash)
-        .apply(replace_newline)
-        .apply(remove_special_characters)
-    )
 
-    return df
+###############################################################################
+
+
+def clean_text(string: str) -> str:
+    """
+    Prepare a single text value. The value is converted to lowercase,
+    normalized to ascii, dashes and newlines are replaced with spaces and
+    punctuation and special characters are removed. This gives the same result
+    as applying each of those steps separately.
+
+    Parameters
+    ----------
+    string: str
+        The text to prepare.
+
+    Returns
+    -------
+    str:
+        The prepared text.
+    """
+
+    string = string.lower()
+
+    # Normalizing ascii text leaves it unchanged so it can be skipped.
+    if string.isascii():
+        data = string.encode("ascii")
+    else:
+        data = unicodedata.normalize("NFKD", string).encode("ascii", "ignore")
+
+    return data.translate(dash_and_newline_table, special_character_bytes).decode(
+        "ascii"
+    )
 
 
 ###############################################################################
@@ -131,29 +302,85 @@ def replace_newline(string: str) -> str:
 
 
 def remove_special_characters(string: str) -> str:
-    return re.sub(r"[^a-z0-9\s\+\#]", "", string)
+    return special_characters.sub("", string)
 
 
 ###############################################################################
 
 
-def normalize_dates(df: pd.DataFrame) -> pd.DataFrame:
+def normalize_dates(
+    df: pd.DataFrame, reference_date: datetime.date = None
+) -> pd.DataFrame:
     """
     Converts all dates in the article dataset into a uniform format.
 
+    The dates are classified by format with vectorized string operations and
+    each format is parsed with an explicit format string. The following
+    formats are recognized, any other format is parsed by pandas inference:
+
+        2022-07-27T17:45:30Z    ISO 8601 in UTC, as returned by the News API
+        2022-07-27T17:45:30     ISO 8601
+        Jul 6, 2021             Month and day with a year, as shown by Medium
+                                for articles from previous years
+        Jul 6                   Month and day, as shown by Medium for
+                                articles from the current year
+
+    Dates without a year are given the year of the reference date, or the
+    previous year if that would place them after the reference date, so that
+    December articles scraped in January get the right year.
+
     Parameters
     ----------
     df: DataFrame
         A pandas dataframe containing all the collected article data.
 
+    reference_date: date, optional
+        The date the articles were scraped on, defaults to today.
+
     Returns
     -------
     DataFrame:
         A pandas dataframe with all dates normalized.
     """
 
-    df["date"] = df["date"].apply(modify_date_string)
-    df["date"] = pd.to_datetime(df["date"]).dt.date
+    reference = pd.Timestamp(reference_date or datetime.date.today())
+    dates = df["date"].fillna("").astype(str).str.strip()
+    parsed = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+
+    iso = dates.str.match(r"\d{4}-\d{2}-\d{2}T")
+    month_day_year = dates.str.fullmatch(r"[a-zA-Z]{3}\s[0-9]{1,2},\s[0-9]{4}")
+    month_day = dates.str.fullmatch(r"[a-zA-Z]{3}\s[0-9]{1,2}")
+
+    parsed[iso] = pd.to_datetime(
+        dates[iso].str.replace("Z", "", regex=False),
+        format="%Y-%m-%dT%H:%M:%S",
+        errors="coerce",
+    )
+    parsed[month_day_year] = pd.to_datetime(
+        dates[month_day_year], format="%b %d, %Y", errors="coerce"
+    )
+
+    # Dates without a year get the year of the reference date, unless that
+    # places them more than a day after the reference date.
+    for year in (reference.year, reference.year - 1):
+        missing = month_day & parsed.isna()
+        if not missing.any():
+            break
+        candidates = pd.to_datetime(
+            dates[missing] + f", {year}", format="%b %d, %Y", errors="coerce"
+        )
+        parsed[missing] = candidates.where(
+            candidates <= reference + pd.Timedelta(days=1)
+        )
+
+    # Anything that was not recognized is left to pandas to infer.
+    other = parsed.isna() & (dates != "")
+    if other.any():
+        parsed[other] = pd.to_datetime(
+            dates[other], errors="coerce", utc=True
+        ).dt.tz_localize(None)
+
+    df["date"] = parsed.dt.date
     return df
 
 
@@ -186,12 +413,57 @@ def modify_date_string(date: str) -> str:
 ###############################################################################
 
 
+def count_words(text: pd.Series) -> np.ndarray:
+    """
+    Returns the number of whitespace separated words in each string of the
+    provided series, as str.split() would count them.
+
+    Rather than splitting each string, the strings are joined into a single
+    array of code points in which the start of every word is found at once.
+
+    Parameters
+    ----------
+    text: Series
+        A pandas series of strings.
+
+    Returns
+    -------
+    ndarray:
+        The number of words in each string.
+    """
+
+    if text.empty:
+        return np.zeros(0, dtype=np.int64)
+
+    # Each string is followed by a newline so no word spans two strings.
+    joined = "\n".join(text.tolist()) + "\n"
+    characters = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+    is_word = ~is_whitespace[np.minimum(characters, len(is_whitespace) - 1)]
+
+    starts = is_word.copy()
+    starts[1:] &= ~is_word[:-1]
+    words = np.concatenate(([0], np.cumsum(starts)))
+
+    ends = np.cumsum(text.str.len().to_numpy() + 1)
+    return np.diff(words[np.concatenate(([0], ends))])
+
+
+###############################################################################
+
+
 def prepare_read_time(df: pd.DataFrame) -> pd.DataFrame:
     """
     For articles with a read time, the read time is converted into an
-    value. For articles with no read time, the read time is calculated
+    integer value. For articles with no read time, the read time is calculated
     based on the length of the article.
 
+    Read times such as "7 min read" are parsed with a vectorized extract. The
+    read time of articles without one, such as those collected with the News
+    API, is estimated from the number of words in the text columns at
+    words_per_minute. The News API truncates the article content and appends
+    the number of characters removed, e.g. "[+794 chars]", which is counted
+    as well. The read time is stored as an int16 number of minutes.
+
     Parameters
     ----------
     df: DataFrame
@@ -203,4 +475,27 @@ def prepare_read_time(df: pd.DataFrame) -> pd.DataFrame:
         A pandas dataframe with read time prepared/estimated.
     """
 
-    pass
+    # There are only a few distinct read times, so each is parsed once.
+    codes, read_times = pd.factorize(df["read_time"].astype(str))
+    parsed = pd.to_numeric(
+        read_times.str.extract(r"(\d+)", expand=False), errors="coerce"
+    )
+    minutes = pd.Series(np.asarray(parsed, dtype=float)[codes], index=df.index)
+
+    missing = minutes.isna()
+    if missing.any():
+        words = pd.Series(0.0, index=df.index[missing])
+        for column in text_columns:
+            if column not in df:
+                continue
+            text = df.loc[missing, column].fillna("").astype(str)
+            words += count_words(text)
+            text = text[text.str.contains("[+", regex=False)]
+            truncated = text.str.extract(r"\[\+(\d+) chars\]", expand=False)
+            truncated = pd.to_numeric(truncated).fillna(0) / characters_per_word
+            words = words.add(truncated, fill_value=0)
+
+        minutes[missing] = np.ceil(words / words_per_minute).clip(lower=1)
+
+    df["read_time"] = minutes.astype("int16")
+    return df
@@ -0,0 +1,285 @@
+"""
+
+    database.py
+
+    Description:
+
+        This module contains the SQLite database the prepared article data is
+        stored in for the article recommender. Articles are kept in a single
+        table keyed by their canonical URL, so collecting an article again
+        updates it instead of adding a duplicate.
+
+        Writes are batched into a single transaction of executemany upserts
+        and the database is opened in WAL mode, so the recommender can read
+        while the web scraper writes. The table is indexed on date,
+        publication and topic, so queries such as "articles since a date for
+        some topics" are index lookups rather than scans of the whole table.
+
+    Variables:
+
+        columns
+        schema
+
+    Classes:
+
+        ArticleDatabase
+
+"""
+
+###############################################################################
+
+import datetime
+import itertools
+import os
+import sqlite3
+
+import pandas as pd
+
+from seen_index import canonicalize_url
+
+###############################################################################
+
+# The columns of the articles table, in order. url holds the canonical URL.
+columns = [
+    "url",
+    "author",
+    "publication",
+    "topic",
+    "source",
+    "title",
+    "subtitle",
+    "article_intro",
+    "date",
+    "read_time",
+    "scrape_date",
+]
+
+schema = """
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,
+    author TEXT,
+    publication TEXT,
+    topic TEXT,
+    source TEXT,
+    title TEXT,
+    subtitle TEXT,
+    article_intro TEXT,
+    date TEXT,
+    read_time INTEGER,
+    scrape_date TEXT
+);
+
+CREATE INDEX IF NOT EXISTS articles_date ON articles (date);
+CREATE INDEX IF NOT EXISTS articles_publication_date ON articles (publication, date);
+CREATE INDEX IF NOT EXISTS articles_topic_date ON articles (topic, date);
+"""
+
+###############################################################################
+
+
+class ArticleDatabase:
+    """
+    A SQLite database of article data.
+
+    Parameters
+    ----------
+    path: str, optional
+        The database file, created along with its directory if it does not
+        exist. Defaults to an in memory database.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path)
+
+        # WAL lets readers and the writer work at the same time, and with WAL
+        # a commit only has to sync the log when it is checkpointed.
+        if path != ":memory:":
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        self.connection.executescript(schema)
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self):
+        """
+        Close the connection to the database.
+        """
+
+        self.connection.close()
+
+    def upsert(
+        self,
+        df: pd.DataFrame,
+        scrape_date: datetime.date = None,
+        batch_size: int = 10000,
+    ) -> int:
+        """
+        Insert the provided articles, or update them if an article with the
+        same canonical URL is already stored. The scrape date of an updated
+        article is left as the date it was first collected on. All batches
+        are written in a single transaction.
+
+        Parameters
+        ----------
+        df: DataFrame
+            The prepared article data. Columns of the table that are missing
+            are stored as nulls.
+
+        scrape_date: date, optional
+            The date the articles were scraped on, defaults to today.
+
+        batch_size: int, optional
+            The number of rows passed to each executemany call.
+
+        Returns
+        -------
+        int:
+            The number of articles written.
+        """
+
+        if not len(df):
+            return 0
+
+        data = pd.DataFrame(
+            {
+                column: df[column] if column in df else None
+                for column in columns
+                if column != "scrape_date"
+            },
+            index=df.index,
+        )
+        data["url"] = data["url"].map(canonicalize_url)
+        data["date"] = pd.to_datetime(data["date"], errors="coerce").dt.strftime(
+            "%Y-%m-%d"
+        )
+        data["read_time"] = pd.to_numeric(data["read_time"], errors="coerce")
+        data["scrape_date"] = (scrape_date or datetime.date.today()).isoformat()
+
+        # Nulls of any kind are stored as NULL and numbers as Python ints.
+        data = data.astype(object).where(data.notna(), None)
+        data["read_time"] = [
+            None if value is None else int(value) for value in data["read_time"]
+        ]
+        rows = list(data.itertuples(index=False, name=None))
+
+        updates = ", ".join(
+            f"{column} = excluded.{column}"
+            for column in columns
+            if column not in ("url", "scrape_date")
+        )
+        statement = (
+            f"INSERT INTO articles ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (url) DO UPDATE SET {updates}"
+        )
+
+        with self.connection:
+            batches = iter(rows)
+            while batch := list(itertools.islice(batches, batch_size)):
+                self.connection.executemany(statement, batch)
+
+        return len(rows)
+
+    def articles_by_url(
+        self, urls: list[str], columns: list[str] = None, batch_size: int = 500
+    ) -> pd.DataFrame:
+        """
+        Returns the stored articles with the provided URLs, looked up by their
+        canonical form through the primary key. URLs that are not stored are
+        left out.
+
+        Parameters
+        ----------
+        urls: list[str]
+            The URLs of the articles.
+
+        columns: list[str], optional
+            The columns returned, defaults to every column. The url column is
+            always returned.
+
+        batch_size: int, optional
+            The number of URLs looked up per query.
+
+        Returns
+        -------
+        DataFrame:
+            The selected articles.
+        """
+
+        selected = "*"
+        if columns:
+            selected = ", ".join(["url"] + [c for c in columns if c != "url"])
+
+        urls = list(dict.fromkeys(canonicalize_url(url) for url in urls))
+        query = f"SELECT {selected} FROM articles WHERE url IN "
+
+        frames = []
+        batches = iter(urls)
+        while batch := list(itertools.islice(batches, batch_size)):
+            placeholders = f"({', '.join('?' * len(batch))})"
+            frames.append(
+                pd.read_sql_query(query + placeholders, self.connection, params=batch)
+            )
+
+        if not frames:
+            frames.append(pd.read_sql_query(query + "()", self.connection))
+
+        return pd.concat(frames, ignore_index=True)
+
+    def articles_since_query(
+        self,
+        since: datetime.date,
+        topics: list[str] = None,
+        columns: list[str] = None,
+    ) -> tuple[str, list]:
+        """
+        Returns the SQL query and parameters used by articles_since().
+        """
+
+        selected = ", ".join(columns) if columns else "*"
+        query = f"SELECT {selected} FROM articles WHERE date >= ?"
+        parameters = [pd.Timestamp(since).strftime("%Y-%m-%d")]
+
+        if topics is not None:
+            query += f" AND topic IN ({', '.join('?' * len(topics))})"
+            parameters += list(topics)
+
+        return query + " ORDER BY date DESC", parameters
+
+    def articles_since(
+        self,
+        since: datetime.date,
+        topics: list[str] = None,
+        columns: list[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Returns the articles published on or after the provided date,
+        optionally only those of the provided topics, newest first.
+
+        Parameters
+        ----------
+        since: date
+            The earliest publish date of the articles returned.
+
+        topics: list[str], optional
+            The topics of the articles returned, defaults to every topic.
+
+        columns: list[str], optional
+            The columns returned, defaults to every column.
+
+        Returns
+        -------
+        DataFrame:
+            The selected articles.
+        """
+
+        query, parameters = self.articles_since_query(since, topics, columns)
+        return pd.read_sql_query(query, self.connection, params=parameters)
@@ -0,0 +1,221 @@
+"""
+
+    parquet_store.py
+
+    Description:
+
+        This module contains the columnar store the prepared article data is
+        kept in. Each run of the web scraper is appended to the store as a
+        set of Parquet files, partitioned by the date the articles were
+        scraped on and the source that collected them, in the hive layout:
+
+            articles/scrape_date=2022-08-11/source=medium/part-<run>-0.parquet
+
+        The columns are stored with their types, so publication and topic are
+        read back as categoricals, date as a date and read_time as an int16,
+        instead of every consumer re-parsing text. Readers can select columns
+        and filter on any column; filters on scrape_date and source skip whole
+        partitions, and filters on other columns skip the row groups whose
+        statistics rule them out.
+
+    Variables:
+
+        schema
+        partitioning
+
+    Classes:
+
+        ArticleStore
+
+    Functions:
+
+        to_arrow(values, field, length)
+
+"""
+
+###############################################################################
+
+import datetime
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+###############################################################################
+
+# The columns of the prepared article data and the types they are stored as.
+schema = pa.schema(
+    [
+        ("author", pa.string()),
+        ("publication", pa.dictionary(pa.int32(), pa.string())),
+        ("title", pa.string()),
+        ("article_intro", pa.string()),
+        ("date", pa.date32()),
+        ("read_time", pa.int16()),
+        ("url", pa.string()),
+        ("subtitle", pa.string()),
+        ("topic", pa.dictionary(pa.int32(), pa.string())),
+    ]
+)
+
+# The columns the store is partitioned by. They are encoded in the directory
+# names rather than stored in the files.
+partitioning = ds.partitioning(
+    pa.schema([("scrape_date", pa.date32()), ("source", pa.string())]),
+    flavor="hive",
+)
+
+###############################################################################
+
+
+class ArticleStore:
+    """
+    A Parquet dataset of article data, appended to once per run.
+
+    Parameters
+    ----------
+    directory: str
+        The directory the dataset is stored in. It is created when the first
+        run is appended.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def __len__(self) -> int:
+        if not self._has_data():
+            return 0
+        return self._dataset().count_rows()
+
+    def _has_data(self) -> bool:
+        return os.path.isdir(self.directory) and any(os.scandir(self.directory))
+
+    def _dataset(self) -> ds.Dataset:
+        return ds.dataset(
+            self.directory,
+            schema=pa.unify_schemas([schema, partitioning.schema]),
+            format="parquet",
+            partitioning=partitioning,
+        )
+
+    def append(
+        self,
+        df: pd.DataFrame,
+        scrape_date: datetime.date = None,
+        source: str = None,
+    ) -> list[str]:
+        """
+        Append the article data of a run to the store.
+
+        Parameters
+        ----------
+        df: DataFrame
+            The prepared article data. Columns of the schema that are missing
+            are stored as nulls. The articles are partitioned by the source
+            column, unless a source is provided for all of them.
+
+        scrape_date: date, optional
+            The date the articles were scraped on, defaults to today.
+
+        source: str, optional
+            The source that collected all of the articles.
+
+        Returns
+        -------
+        list[str]:
+            The paths of the files written.
+        """
+
+        if not len(df):
+            return []
+
+        arrays = [
+            to_arrow(df[field.name] if field.name in df else None, field, len(df))
+            for field in schema
+        ]
+        table = pa.Table.from_arrays(arrays, schema=schema)
+
+        if source is None:
+            source = df["source"].astype(str).to_numpy()
+        else:
+            source = [source] * len(df)
+
+        table = table.append_column(
+            "scrape_date",
+            pa.array([scrape_date or datetime.date.today()] * len(df), pa.date32()),
+        ).append_column("source", pa.array(source, pa.string()))
+
+        # Each run writes files with a name of its own so appending never
+        # overwrites the files of an earlier run on the same day.
+        written = []
+        ds.write_dataset(
+            table,
+            self.directory,
+            format="parquet",
+            partitioning=partitioning,
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_visitor=lambda file: written.append(file.path),
+        )
+        return written
+
+    def read(self, columns: list[str] = None, filters=None) -> pd.DataFrame:
+        """
+        Read article data from the store.
+
+        Parameters
+        ----------
+        columns: list[str], optional
+            The columns to read, defaults to every column including
+            scrape_date and source. Only the selected columns are read from
+            disk.
+
+        filters: optional
+            The rows to read, either as a pyarrow.dataset expression or in the
+            list of (column, op, value) tuples format used by
+            pyarrow.parquet.read_table(), e.g.
+            [("source", "=", "news"), ("date", ">=", datetime.date(2022, 8, 1))].
+
+        Returns
+        -------
+        DataFrame:
+            The selected article data.
+        """
+
+        if not self._has_data():
+            names = columns or schema.names + partitioning.schema.names
+            return pd.DataFrame(columns=names)
+
+        if filters is not None and not isinstance(filters, ds.Expression):
+            filters = pq.filters_to_expression(filters)
+
+        table = self._dataset().to_table(columns=columns, filter=filters)
+        return table.to_pandas()
+
+
+###############################################################################
+
+
+def to_arrow(values: pd.Series, field: pa.Field, length: int) -> pa.Array:
+    """
+    Returns the values of a column converted to the type of the provided
+    schema field, or an array of nulls of the provided length if the column
+    is missing. Dates may be given as dates, timestamps or date strings.
+    """
+
+    if values is None:
+        return pa.nulls(length, field.type)
+
+    if pa.types.is_dictionary(field.type):
+        array = pa.array(values.astype("string"), pa.string(), from_pandas=True)
+        return array.dictionary_encode().cast(field.type)
+
+    if pa.types.is_date(field.type):
+        values = pd.to_datetime(values, errors="coerce")
+    elif pa.types.is_integer(field.type):
+        values = pd.to_numeric(values, errors="coerce")
+
+    return pa.array(values, from_pandas=True).cast(field.type)
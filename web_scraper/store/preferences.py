@@ -0,0 +1,189 @@
+"""
+
+    preferences.py
+
+    Description:
+
+        This module contains the SQLite store of the users' settings and
+        preferences, as sent in by email: whether each user is subscribed, the
+        topics each user follows and the articles each user liked or disliked.
+
+        The store does not commit on its own. Changes are applied with
+        executemany, one statement per kind of change, on the connection, and
+        the caller commits them, so they can be made in the same transaction
+        as other changes of the same batch of emails.
+
+    Variables:
+
+        schema
+
+    Classes:
+
+        PreferenceStore
+
+"""
+
+###############################################################################
+
+import datetime
+import os
+import sqlite3
+
+import pandas as pd
+
+###############################################################################
+
+schema = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    subscribed INTEGER NOT NULL,
+    updated TEXT
+);
+
+CREATE TABLE IF NOT EXISTS topics (
+    email TEXT,
+    topic TEXT,
+    PRIMARY KEY (email, topic)
+);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    email TEXT,
+    url TEXT,
+    label INTEGER NOT NULL,
+    date TEXT,
+    PRIMARY KEY (email, url)
+);
+
+CREATE INDEX IF NOT EXISTS feedback_date ON feedback (date);
+"""
+
+###############################################################################
+
+
+class PreferenceStore:
+    """
+    A SQLite store of user settings and preferences.
+
+    Parameters
+    ----------
+    path: str, optional
+        The database file, created along with its directory if it does not
+        exist. Defaults to an in memory database.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(schema)
+
+    def close(self):
+        """
+        Close the connection to the store.
+        """
+
+        self.connection.close()
+
+    def set_subscriptions(self, rows: list[tuple], date: datetime.date = None):
+        """
+        Subscribe or unsubscribe users, given (email, subscribed) rows.
+        """
+
+        date = (date or datetime.date.today()).isoformat()
+        self.connection.executemany(
+            """
+            INSERT INTO users (email, subscribed, updated) VALUES (?, ?, ?)
+            ON CONFLICT (email) DO UPDATE SET
+                subscribed = excluded.subscribed, updated = excluded.updated
+            """,
+            [(email, int(subscribed), date) for email, subscribed in rows],
+        )
+
+    def set_topics(self, rows: list[tuple]):
+        """
+        Follow or unfollow topics, given (email, topic, followed) rows.
+        """
+
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO topics (email, topic) VALUES (?, ?)",
+            [(email, topic) for email, topic, followed in rows if followed],
+        )
+        self.connection.executemany(
+            "DELETE FROM topics WHERE email = ? AND topic = ?",
+            [(email, topic) for email, topic, followed in rows if not followed],
+        )
+
+    def set_feedback(self, rows: list[tuple], date: datetime.date = None):
+        """
+        Record whether users liked articles, given (email, url, label) rows. A
+        new label for the same article replaces the earlier one and moves it
+        after every other label, so the row of each label only increases when
+        it changes.
+        """
+
+        date = (date or datetime.date.today()).isoformat()
+        self.connection.executemany(
+            """
+            INSERT INTO feedback (email, url, label, date) VALUES (?, ?, ?, ?)
+            ON CONFLICT (email, url) DO UPDATE SET
+                label = excluded.label,
+                date = excluded.date,
+                rowid = (SELECT MAX(rowid) FROM feedback) + 1
+            """,
+            [(email, url, int(label), date) for email, url, label in rows],
+        )
+
+    def subscribers(self) -> list[str]:
+        """
+        Returns the email addresses of the subscribed users.
+        """
+
+        return [
+            email
+            for (email,) in self.connection.execute(
+                "SELECT email FROM users WHERE subscribed = 1 ORDER BY email"
+            )
+        ]
+
+    def topics(self) -> pd.DataFrame:
+        """
+        Returns the topics each user follows, with email and topic columns.
+        """
+
+        return pd.read_sql_query(
+            "SELECT email, topic FROM topics ORDER BY email, topic", self.connection
+        )
+
+    def feedback(self, date: datetime.date = None) -> pd.DataFrame:
+        """
+        Returns the feedback labels, with user, url and label columns. If a
+        date is provided only the labels received on that date are returned.
+        """
+
+        query = "SELECT email AS user, url, label FROM feedback"
+        parameters = ()
+        if date is not None:
+            query += " WHERE date = ?"
+            parameters = (date.isoformat(),)
+
+        return pd.read_sql_query(query, self.connection, params=parameters)
+
+    def feedback_after(self, row: int = 0) -> pd.DataFrame:
+        """
+        Returns the feedback labels recorded or changed after the provided
+        row, with user, url, label and row columns, in the order they were
+        recorded.
+        """
+
+        return pd.read_sql_query(
+            """
+            SELECT email AS user, url, label, rowid AS row FROM feedback
+            WHERE rowid > ? ORDER BY rowid
+            """,
+            self.connection,
+            params=(row,),
+        )